@@ -1,70 +1,343 @@
 import gradio as gr
 import logging
-from core.engine import WgetEngine
+import os
+import re
+import secrets
+import socket
+import time
+from typing import Optional
+from core import available_engines, parse_engine_rules, resolve_engine_name
+from core.budget import CrawlBudget
 from core.zipper import ZipEngine
-from utils.parser import LogParser
+from core.streaming import StreamRegistry
+from core.cache import ResultCache
+from core.jobs import JobRegistry, make_job_key
+from core.worker import crawl_and_package, run_in_process, stream_zip
+from core.scheduler import PRIORITIES, AdmissionError, JobScheduler
+from core.settings import (
+    BUDGET_CEILING, MAX_JOBS, MIN_FREE_DISK_MB, MIN_FREE_MEMORY_MB, QUEUE_DB, ZIP_TEXT_LEVEL, job_settings,
+)
+from core.fleet import FINAL_STATES, SQLiteJobQueue
 from utils.file_manager import FileManager
+from utils.log_buffer import LogBuffer
+from utils.progress import ProgressAggregator
+from utils.throughput import format_throughput
 
 # --- 配置部分 ---
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("App")
 
+# 引擎选择: WD_ENGINE 为默认后端；WD_ENGINE_RULES 按站点指定后端，如 "docs.python.org=wget2,*.aidoczh.com=native"
+DEFAULT_ENGINE = os.environ.get("WD_ENGINE", "wget")
+ENGINE_RULES = parse_engine_rules(os.environ.get("WD_ENGINE_RULES", ""))
+# 流式下载链接的有效期（秒），过期后回收站点目录
+STREAM_TTL = int(os.environ.get("WD_STREAM_TTL", 1800))
+# 结果缓存: 相同 URL 与选项在有效期内直接返回已有归档；总大小超过上限按 LRU 淘汰；
+# 被替换或淘汰的归档保留 WD_CACHE_GRACE 秒再删除，刚命中缓存的下载不会中断
+CACHE_TTL = int(os.environ.get("WD_CACHE_TTL", 3600))
+CACHE_MAX_MB = int(os.environ.get("WD_CACHE_MAX_MB", 2048))
+CACHE_GRACE = int(os.environ.get("WD_CACHE_GRACE", 600))
+# 调度: 超过同时运行数（WD_MAX_JOBS）的任务按优先级排队；排队数量上限，超过直接拒绝
+MAX_QUEUE = int(os.environ.get("WD_MAX_QUEUE", 50))
+# 界面日志只保留最近的行数，完整日志写入 storage/logs/<job_id>.log，可通过 /logs/<job_id> 下载
+LOG_TAIL_LINES = int(os.environ.get("WD_LOG_TAIL_LINES", 500))
+# 界面更新频率上限（次/秒）：日志行先累积再批量发送，阶段切换与最终结果立即发送
+UI_UPDATES_PER_SEC = float(os.environ.get("WD_UI_UPDATES_PER_SEC", 4))
+# 同时连接的页面数量（排队中的页面只等待进度，不占用抓取资源）
+UI_CONCURRENCY = int(os.environ.get("WD_UI_CONCURRENCY", 64))
+# 分布式模式: WD_MODE=distributed 时本节点只提交与跟踪任务，由 worker_node.py 节点认领执行
+# 各节点需共享 storage 目录（任务队列数据库 WD_QUEUE_DB、工作目录与归档都在其中）
+DISTRIBUTED = os.environ.get("WD_MODE", "local") == "distributed"
+QUEUE_POLL_INTERVAL = float(os.environ.get("WD_QUEUE_POLL_INTERVAL", 0.5))
+# 吞吐统计: 超过 WD_STALL_SECONDS 秒没有完成文件视为停滞
+STALL_SECONDS = float(os.environ.get("WD_STALL_SECONDS", 30))
+# 与 worker_node.py 共用的配置（压缩、调度与准入、请求节奏、爬虫陷阱、抓取前沿、预算上限）见 core/settings.py
+# 登录账号: Gradio 界面与 /stream、/logs 路由共用
+AUTH = ("admin", "password")
+
 # 初始化全局资源管理器
 global_fm = FileManager()
 global_fm.initialize()
-global_fm.cleanup_old_files(max_age_minutes=60)
+result_cache = ResultCache(
+    os.path.join(global_fm.get_paths()['root'], "result_cache.json"),
+    ttl_seconds=CACHE_TTL,
+    max_bytes=CACHE_MAX_MB * 1024 * 1024,
+    grace_seconds=CACHE_GRACE,
+)
+global_fm.cleanup_old_files(max_age_minutes=60, exclude=result_cache.paths())
+global_fm.cleanup_stale_checkpoints(max_age_hours=24)
+global_fm.cleanup_old_logs(max_age_hours=24)
+if not DISTRIBUTED:
+    # 分布式模式下工作目录属于各 worker 节点，不能按本进程的登记判断是否遗留
+    global_fm.cleanup_orphan_workspaces(max_age_hours=24)
+stream_registry = StreamRegistry(ttl_seconds=STREAM_TTL)
+# 没有新的下载请求时也按时回收过期的流式链接
+stream_registry.start()
+
+
+def publish_queue_position(job, position: int, reason: str):
+    """把排队位置写入任务状态，显示在状态标签上"""
+    note = f"Waiting for resources: {reason}" if reason else "Waiting for a free worker"
+    job.publish((f"⏳ Job {job.id} is queued at position {position}. {note}...\n", 0, 0, None,
+                 f"⏳ Queued (position {position})", None, None))
+
+
+# 本 UI 节点的标识：分布式模式下各节点分别登记流式下载，最后一个过期的节点回收站点目录
+NODE_ID = f"{socket.gethostname()}-{os.getpid()}"
+if DISTRIBUTED:
+    job_queue = SQLiteJobQueue(QUEUE_DB)
+    job_queue.purge(max_age_hours=24)
+    job_registry = JobRegistry()
+else:
+    job_queue = None
+    scheduler = JobScheduler(
+        workers=MAX_JOBS,
+        max_queue=MAX_QUEUE,
+        storage_path=global_fm.get_paths()['root'],
+        min_free_disk_mb=MIN_FREE_DISK_MB,
+        min_free_memory_mb=MIN_FREE_MEMORY_MB,
+        on_position=publish_queue_position,
+    )
+    job_registry = JobRegistry(scheduler=scheduler)
 
 # --- 核心逻辑 ---
-def process_download(url: str):
+def process_download(url: str, engine_name: str = "auto", archive_format: str = "zip",
+                     stream_archive: bool = False, force_refresh: bool = False, priority: str = "normal",
+                     max_files: float = 0, max_mb: float = 0, max_depth: float = 0, max_minutes: float = 0):
     """
-    核心处理函数：保持原逻辑不变
+    核心处理函数：保持原逻辑不变，引擎按任务或配置选择
+    stream_archive 为 True 时不在磁盘上生成 ZIP，而是返回一个边生成边下载的链接
+    force_refresh 为 True 时忽略结果缓存，重新抓取
+    priority 为调度优先级（high / normal / low），空闲 worker 不足时按优先级排队
+    max_files / max_mb / max_depth / max_minutes 为任务预算（0 为不限），受服务器上限约束
     """
     if not url.startswith("http"):
-        yield "❌ Error: Please enter a valid URL (http/https).", 0, 0, None, "Invalid URL"
+        yield "❌ Error: Please enter a valid URL (http/https).", 0, 0, None, "Invalid URL", None, None
+        return
+
+    engine_name = resolve_engine_name(url, engine_name, DEFAULT_ENGINE, ENGINE_RULES)
+    budget = CrawlBudget(max_files=max_files, max_bytes=int((max_mb or 0) * 1024 * 1024), max_depth=max_depth,
+                         max_seconds=(max_minutes or 0) * 60).capped(BUDGET_CEILING)
+
+    # 结果缓存：同一站点在有效期内已经打包过则直接返回（预算不同的结果分开缓存）
+    cache_options = {"engine": engine_name, "format": archive_format}
+    if budget:
+        cache_options["budget"] = budget.to_dict()
+    if force_refresh:
+        result_cache.invalidate(url, cache_options)
+    elif not stream_archive:
+        cached_path = result_cache.lookup(url, cache_options)
+        if cached_path:
+            yield f"⚡ Served from cache: {cached_path}\n(Tick \"Force refresh\" to crawl again.)\n", 0, 0, cached_path, "✅ Done (cached)", None, None
+            return
+
+    # 请求合并：相同 URL 与选项的任务正在运行时直接订阅它，共享日志与结果
+    job_key = make_job_key(url, engine_name, archive_format, stream_archive, budget.to_dict())
+    priority_value = PRIORITIES.get(priority, PRIORITIES["normal"])
+    if DISTRIBUTED:
+        params = {"url": url, "engine": engine_name, "format": archive_format,
+                  "stream": bool(stream_archive), "cache_options": cache_options, "budget": budget.to_dict()}
+        runner = lambda job: follow_remote_job(job_queue.enqueue(job_key, params, priority_value)[0])
+    else:
+        runner = lambda job: run_job(job.id, url, engine_name, archive_format, stream_archive, cache_options,
+                                     budget.to_dict())
+    try:
+        job, created = job_registry.submit(job_key, runner, priority=priority_value)
+    except AdmissionError as e:
+        yield f"❌ Server busy: {str(e)}\n", 0, 0, None, "❌ Rejected (server busy)", None, None
+        return
+    if not created:
+        yield f"🔗 Same site is already being downloaded (job {job.id}), attaching to it...\n", 0, 0, None, "🔗 Joined running job", None, None
+    yield from job.follow(job_registry.leave)
+
+
+def attach_job(job_id: str):
+    """按任务 ID 跟踪一个已有任务（分布式模式下可以是任何节点提交的任务）"""
+    job_id = (job_id or "").strip()
+    if DISTRIBUTED:
+        yield from follow_remote_job(job_id)
         return
+    job = job_registry.find(job_id)
+    if job is None:
+        yield f"❌ Job {job_id} is not running on this server.\n", 0, 0, None, "❌ Not found", None, None
+        return
+    yield from job.follow(job_registry.leave)
+
 
+def job_log_path(job_id: str) -> str:
+    return os.path.join(global_fm.get_paths()['log'], f"{job_id}.log")
+
+
+def register_stream(job_id: str, folder: str, incremental: bool):
+    """
+    把站点目录登记为流式下载，链接过期后保留镜像并释放工作目录；返回 (文件名, 链接)
+    同一任务的所有跟踪者共用一个链接；分布式模式下多个 UI 节点可能同时提供同一目录，
+    只有最后一个过期的节点回收目录
+    """
     fm = FileManager()
-    engine = WgetEngine(fm)
-    zipper = ZipEngine(fm)
-    parser = LogParser()
 
-    full_log = ""
-    yield "🚀 Initializing download engine...\n", 0, 0, None, "Starting..."
+    def release_folder():
+        if DISTRIBUTED and not job_queue.release_stream(job_id, NODE_ID):
+            return
+        if incremental:
+            fm.retain_mirror(folder)
+        fm.release_job(job_id)
+
+    if DISTRIBUTED:
+        job_queue.hold_stream(job_id, NODE_ID)
+    filename = os.path.basename(os.path.normpath(folder)) + ".zip"
+    token = stream_registry.register(folder, filename, on_expire=release_folder, key=job_id)
+    return filename, f"### [⬇️ Download {filename}](/stream/{token})"
+
+
+def run_job(job_id: str, url: str, engine_name: str, archive_format: str, stream_archive: bool,
+            cache_options: dict, budget: dict):
+    """
+    执行一次下载与打包，产出完整状态更新
+    由 JobRegistry 在调度线程中运行，所有订阅者共享；
+    抓取与压缩在独立的 worker 进程中进行，本进程只汇总进度并处理结果
+    每个任务在 temp_sites/<job_id>/ 中工作，归档以 job_id 命名；budget 为 CrawlBudget.to_dict()
+    """
+    fm = FileManager()
+    # 在 Web 进程中登记工作目录，避免被孤儿目录清理误删
+    fm.create_job_workspace(job_id)
+    settings = job_settings()
 
+    log = LogBuffer(tail_lines=LOG_TAIL_LINES, spool_path=job_log_path(job_id))
+    log.append(f"🆔 Job ID: {job_id}\n")
+    log_link = f"[📄 Full log](/logs/{job_id})"
+    files = errors = 0
+    status = None
+    throughput = None
+    metrics = None
+    metrics_at = 0.0
+    result = None
+    aggregator = ProgressAggregator(max_rate=UI_UPDATES_PER_SEC)
+    # 流式模式下工作目录交给 StreamRegistry，在链接过期后再释放
+    handed_off = False
     try:
-        # 阶段 1: 下载
-        downloaded_folder = None
-        for raw_line, folder_path in engine.download(url):
-            clean_line, stats = parser.process_line(raw_line)
-            if clean_line:
-                full_log += clean_line
-            if folder_path:
-                downloaded_folder = folder_path
-            
-            yield (full_log, stats['files'], stats['errors'], None, "⬇️ Downloading...")
-
-        # 阶段 2: 压缩
-        if downloaded_folder:
-            full_log += "\n📦 Compressing files... This may take a moment.\n"
-            yield full_log, stats['files'], stats['errors'], None, "📦 Compressing..."
-            
-            try:
-                zip_path = zipper.compress(downloaded_folder)
-                full_log += f"\n✅ Compression Complete! File ready: {zip_path}\n"
-                fm.clear_temp_folder(downloaded_folder)
-                yield (full_log, stats['files'], stats['errors'], zip_path, "✅ Done!")
-            except Exception as z_err:
-                full_log += f"\n❌ Compression Error: {str(z_err)}\n"
-                yield full_log, stats['files'], stats['errors'], None, "❌ Error"
-        else:
-            full_log += "\n❌ Download failed or directory empty.\n"
-            yield full_log, stats['files'], stats['errors'], None, "❌ Failed"
+        for message in run_in_process(crawl_and_package, job_id, url, engine_name, archive_format,
+                                      stream_archive, settings, budget, idle_timeout=aggregator.interval or None):
+            if message is None:
+                # worker 暂时没有输出：把积压的日志发出去；长时间没有输出时显示停滞
+                if metrics and status == "⬇️ Downloading...":
+                    stalled = dict(metrics, idle=metrics["idle"] + time.monotonic() - metrics_at)
+                    if format_throughput(stalled, STALL_SECONDS) != throughput:
+                        throughput = format_throughput(stalled, STALL_SECONDS)
+                        aggregator.pending = True
+                if aggregator.due():
+                    yield (log.text(), files, errors, None, status, log_link, throughput)
+                continue
+            if message[0] == "result":
+                result = message[1]
+                continue
+            _, text, files, errors, status, metrics = message
+            metrics_at = time.monotonic()
+            throughput = format_throughput(metrics, STALL_SECONDS) if metrics else throughput
+            log.append(text)
+            if aggregator.offer(status):
+                yield (log.text(), files, errors, None, status, log_link, throughput)
+        if aggregator.pending:
+            yield (log.text(), files, errors, None, status, log_link, throughput)
+
+        if result is None:
+            log.append("\n❌ Worker process exited unexpectedly.\n")
+            yield log.text(), files, errors, None, "❌ Error", log_link, throughput
+            return
+
+        # 预算用完时结果只包含部分站点
+        done = "✅ Done (budget reached)" if result.get("budget") else "✅ Done!"
+        if result["folder"] and stream_archive:
+            filename, link = register_stream(job_id, result["folder"], result["incremental"])
+            handed_off = True
+            log.append(f"\n🔗 Streaming archive ready: {filename} (link valid for {STREAM_TTL // 60} min)\n")
+            yield (log.text(), files, errors, None, done, link + "\n\n" + log_link, throughput)
+
+        elif result["archive"]:
+            zip_path = result["archive"]
+            log.append(f"\n✅ Compression Complete! File ready: {zip_path}\n")
+            result_cache.store(url, cache_options, zip_path)
+            if result["incremental"]:
+                # 保留为镜像，下一次同域名任务只需拉取变化的内容
+                fm.retain_mirror(result["folder"])
+            else:
+                fm.clear_temp_folder(result["folder"])
+            yield (log.text(), files, errors, zip_path, done, log_link, throughput)
 
     except Exception as e:
-        full_log += f"\n❌ Critical Application Error: {str(e)}\n"
-        yield full_log, 0, 0, None, "❌ Error"
+        log.append(f"\n❌ Critical Application Error: {str(e)}\n")
+        yield log.text(), 0, 0, None, "❌ Error", log_link, throughput
+    finally:
+        log.close()
+        if not handed_off:
+            fm.release_job(job_id, keep_files=result["keep_files"] if result else True)
+
+
+def follow_remote_job(job_id: str):
+    """
+    分布式模式：跟踪共享队列中的任务，产出与 run_job 相同的状态更新
+    进度事件由 worker 节点批量写入，这里按固定间隔轮询；离开时减少跟踪者计数
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        yield f"❌ Job {job_id} not found in the shared queue.\n", 0, 0, None, "❌ Not found", None, None
+        return
+
+    job_queue.attach(job_id)
+    # 完整日志由 worker 节点写入共享的 storage/logs，这里只保留界面显示的尾部
+    log = LogBuffer(tail_lines=LOG_TAIL_LINES)
+    log.append(f"🆔 Job ID: {job_id}\n")
+    log_link = f"[📄 Full log](/logs/{job_id})"
+    files = errors = 0
+    throughput = None
+    last_event = 0
+    last_position = None
+    try:
+        while True:
+            # 先读状态再读事件：任务结束前写入的事件都能读到
+            job = job_queue.get(job_id)
+            events = job_queue.events_since(job_id, last_event)
+            if events:
+                last_event = events[-1][0]
+                for _, (text, files, errors, status, metrics) in events:
+                    log.append(text)
+                    if metrics:
+                        throughput = format_throughput(metrics, STALL_SECONDS)
+                yield log.text(), files, errors, None, status, log_link, throughput
+            if job["state"] in FINAL_STATES:
+                break
+            if job["state"] == "queued":
+                position = job_queue.position(job_id)
+                if position != last_position:
+                    last_position = position
+                    yield (log.text() + f"⏳ Job {job_id} is queued at position {position}. Waiting for a worker node...\n",
+                           0, 0, None, f"⏳ Queued (position {position})", None, None)
+            time.sleep(QUEUE_POLL_INTERVAL)
+
+        result = job["result"] or {}
+        params = job["params"]
+        done = "✅ Done (budget reached)" if result.get("budget") else "✅ Done!"
+        if job["state"] == "done" and result.get("archive"):
+            zip_path = result["archive"]
+            log.append(f"\n✅ Compression Complete! File ready: {zip_path}\n")
+            if os.path.exists(zip_path):
+                result_cache.store(params["url"], params["cache_options"], zip_path)
+            yield (log.text(), files, errors, zip_path, done, log_link, throughput)
+        elif job["state"] == "done" and result.get("folder") and not os.path.isdir(result["folder"]):
+            log.append("\n⌛ The streaming link for this job has expired. Start the download again.\n")
+            yield log.text(), files, errors, None, "⌛ Expired", log_link, throughput
+        elif job["state"] == "done" and result.get("folder"):
+            filename, link = register_stream(job_id, result["folder"], result["incremental"])
+            log.append(f"\n🔗 Streaming archive ready: {filename} (link valid for {STREAM_TTL // 60} min)\n")
+            yield (log.text(), files, errors, None, done, link + "\n\n" + log_link, throughput)
+        elif job["state"] == "cancelled":
+            log.append("\n🛑 Job was cancelled.\n")
+            yield log.text(), files, errors, None, "🛑 Cancelled", log_link, throughput
+        elif job["state"] == "failed":
+            log.append(f"\n❌ Job failed on worker {job['worker']}.\n")
+            yield log.text(), files, errors, None, "❌ Failed", log_link, throughput
     finally:
-        engine.stop()
+        job_queue.detach(job_id)
 
 # --- 前端设计 (UI/UX) ---
 
@@ -151,9 +424,43 @@ with gr.Blocks(title="Website Downloader Pro", css=custom_css, theme=theme) as a
                     max_lines=1,
                     show_label=True
                 )
+                with gr.Row():
+                    engine_input = gr.Dropdown(
+                        choices=["auto"] + available_engines(),
+                        value="auto",
+                        label="Download Engine"
+                    )
+                    format_input = gr.Dropdown(
+                        choices=ZipEngine.available_formats(),
+                        value="zip",
+                        label="Archive Format"
+                    )
+                    stream_input = gr.Checkbox(
+                        value=False,
+                        label="Stream ZIP (no server-side archive)"
+                    )
+                    refresh_input = gr.Checkbox(
+                        value=False,
+                        label="Force refresh (ignore cache)"
+                    )
+                    priority_input = gr.Dropdown(
+                        choices=list(PRIORITIES),
+                        value="normal",
+                        label="Priority"
+                    )
             with gr.Column(scale=1):
                 start_btn = gr.Button("🚀 Start Download", variant="primary", scale=1, size='lg')
                 stop_btn = gr.Button("🛑 Stop", variant="stop", scale=1, size='lg')
+        with gr.Accordion("Crawl budget (0 = unlimited)", open=False):
+            with gr.Row():
+                max_files_input = gr.Number(value=0, minimum=0, precision=0, label="Max files")
+                max_mb_input = gr.Number(value=0, minimum=0, label="Max size (MB)")
+                max_depth_input = gr.Number(value=0, minimum=0, precision=0, label="Max link depth")
+                max_minutes_input = gr.Number(value=0, minimum=0, label="Max duration (minutes)")
+        with gr.Accordion("Follow an existing job", open=False):
+            with gr.Row():
+                job_id_input = gr.Textbox(label="Job ID", placeholder="e.g. 3f9c2a1b7d4e", max_lines=1, scale=4)
+                attach_btn = gr.Button("👀 Follow", scale=1)
 
     # 状态仪表盘 (使用 Group 增加视觉聚合感)
     with gr.Row(elem_classes="stat-row"):
@@ -163,6 +470,8 @@ with gr.Blocks(title="Website Downloader Pro", css=custom_css, theme=theme) as a
             file_count = gr.Number(value=0, label="Files Downloaded", show_label=True)
         with gr.Column(scale=1, elem_classes="stat-card"):
             error_count = gr.Number(value=0, label="Errors (404/Fail)", show_label=True)
+        with gr.Column(scale=2, elem_classes="stat-card"):
+            throughput_box = gr.Textbox(value="-", label="Throughput / ETA", show_label=True, interactive=False)
 
     # 日志与下载区
     with gr.Row():
@@ -179,26 +488,99 @@ with gr.Blocks(title="Website Downloader Pro", css=custom_css, theme=theme) as a
         with gr.Column(scale=1):
             with gr.Group(elem_classes="download-area"):
                 gr.Markdown("### 📥 Output")
-                download_file = gr.File(label="Download ZIP", interactive=False, file_count="single")
+                download_file = gr.File(label="Download Archive", interactive=False, file_count="single")
+                stream_link = gr.Markdown()
 
     # --- 事件绑定 ---
 
     # 1. 启动下载
     download_event = start_btn.click(
         fn=process_download,
-        inputs=[url_input],
-        outputs=[log_box, file_count, error_count, download_file, status_label],
-        concurrency_limit=2
+        inputs=[url_input, engine_input, format_input, stream_input, refresh_input, priority_input,
+                max_files_input, max_mb_input, max_depth_input, max_minutes_input],
+        outputs=[log_box, file_count, error_count, download_file, status_label, stream_link, throughput_box],
+        concurrency_limit=UI_CONCURRENCY
+    )
+
+    # 2. 跟踪已有任务（停止按钮只断开跟踪；没有其他订阅者时任务会被取消）
+    attach_event = attach_btn.click(
+        fn=attach_job,
+        inputs=[job_id_input],
+        outputs=[log_box, file_count, error_count, download_file, status_label, stream_link, throughput_box],
+        concurrency_limit=UI_CONCURRENCY
     )
 
-    # 2. 停止下载
-    stop_btn.click(fn=None, cancels=[download_event])
+    # 3. 停止下载
+    stop_btn.click(fn=None, cancels=[download_event, attach_event])
 
-    # 3. **关键修改**: 监听日志框的变化，触发 JS 滚动到底部
+    # 4. **关键修改**: 监听日志框的变化，触发 JS 滚动到底部
     log_box.change(fn=None, js=scroll_js)
 
     gr.Markdown("---")
     gr.Markdown("*Note: This tool respects `robots.txt` effectively but uses `wget` user-agent. Please use responsibly.*")
 
+def create_server():
+    """
+    把 Gradio 挂载到 FastAPI 上，并增加流式下载与完整日志下载路由
+    （两个路由与界面使用同一账号：浏览器沿用 Gradio 的登录会话，其他客户端可用 HTTP Basic 认证）
+    """
+    from fastapi import Depends, FastAPI, HTTPException, Request
+    from fastapi.responses import FileResponse, StreamingResponse
+    from fastapi.security import HTTPBasic, HTTPBasicCredentials
+
+    server = FastAPI()
+    basic = HTTPBasic(auto_error=False)
+    mounted = {}
+
+    def require_login(request: Request, credentials: Optional[HTTPBasicCredentials] = Depends(basic)):
+        # 1. Gradio 登录后写入的会话 Cookie
+        gradio_app = mounted.get("gradio")
+        if gradio_app is not None:
+            for name in (f"access-token-{gradio_app.cookie_id}", f"access-token-unsecure-{gradio_app.cookie_id}"):
+                token = request.cookies.get(name)
+                if token and token in gradio_app.tokens:
+                    return
+        # 2. HTTP Basic 认证
+        if credentials is not None:
+            user_ok = secrets.compare_digest(credentials.username.encode(), AUTH[0].encode())
+            password_ok = secrets.compare_digest(credentials.password.encode(), AUTH[1].encode())
+            if user_ok and password_ok:
+                return
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Basic"})
+
+    @server.get("/stream/{token}", dependencies=[Depends(require_login)])
+    def stream_archive_route(token: str):
+        entry = stream_registry.acquire(token)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Stream link expired or not found")
+
+        def body():
+            try:
+                # ZIP 在 worker 进程中生成，Web 进程只转发数据块
+                yield from run_in_process(stream_zip, entry["source_dir"], ZIP_TEXT_LEVEL)
+            finally:
+                stream_registry.release(token)
+
+        return StreamingResponse(
+            body(),
+            media_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{entry["filename"]}"'},
+        )
+
+    @server.get("/logs/{job_id}", dependencies=[Depends(require_login)])
+    def job_log_route(job_id: str):
+        path = job_log_path(job_id)
+        if not re.fullmatch(r"[0-9a-f]{12}", job_id) or not os.path.exists(path):
+            raise HTTPException(status_code=404, detail="Log not found")
+        return FileResponse(path, media_type="text/plain; charset=utf-8", filename=f"{job_id}.log")
+
+    server = gr.mount_gradio_app(server, app, path="/", auth=AUTH)
+    # mount_gradio_app 返回外层 FastAPI，Gradio 应用挂在刚追加的根路由上；
+    # 它保存着登录会话，供 require_login 校验 Cookie
+    mounted["gradio"] = server.routes[-1].app
+    return server
+
+
 if __name__ == "__main__":
-    app.launch(server_name="0.0.0.0", server_port=7860, auth=("admin", "password"))
+    import uvicorn
+    uvicorn.run(create_server(), host="0.0.0.0", port=7860)
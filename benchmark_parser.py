@@ -0,0 +1,208 @@
+"""
+日志解析性能基准
+基线是改造前逐行依次尝试多个正则的 LogParser.process_line（原样副本）：从 wget stderr 直接得到界面日志与统计；
+与之对比的是现在的流水线：WgetEventParser 解析事件（逐行 parse / 整段 parse_chunk），LogParser.process_event 渲染。
+另外单独测量两种事件解析，并校验逐行与整段的结果一致
+
+用法:
+    python benchmark_parser.py                      # 生成 100 万行模拟的 wget 日志
+    python benchmark_parser.py --log wget.log       # 使用录制的 wget stderr（wget -m ... 2> wget.log）
+    python benchmark_parser.py --lines 3000000 --chunk-lines 200
+"""
+import argparse
+import gc
+import re
+import time
+from typing import Tuple
+
+from core.events import WgetEventParser
+from utils.parser import LogParser
+
+# 模拟日志的模板：一次成功下载、一次 304、一次 404、一次重定向、一次连接失败
+SAMPLE_LOG = """--2024-05-01 10:00:00--  https://example.com/docs/page{n}.html
+Resolving example.com (example.com)... 93.184.216.34
+Connecting to example.com (example.com)|93.184.216.34|:443... connected.
+HTTP request sent, awaiting response... 200 OK
+Length: 18234 (18K) [text/html]
+Saving to: ‘example.com/docs/page{n}.html’
+
+     0K .......... .......                                   100%  512K=0.03s
+
+2024-05-01 10:00:00 (512 KB/s) - ‘example.com/docs/page{n}.html’ saved [18234/18234]
+
+--2024-05-01 10:00:01--  https://example.com/static/app{n}.css
+Reusing existing connection to example.com:443.
+HTTP request sent, awaiting response... 304 Not Modified
+File ‘example.com/static/app{n}.css’ not modified on server. Omitting download.
+Server file no newer than local file ‘example.com/static/app{n}.css’ -- not retrieving.
+
+--2024-05-01 10:00:01--  https://example.com/missing{n}.png
+Reusing existing connection to example.com:443.
+HTTP request sent, awaiting response... 404 Not Found
+2024-05-01 10:00:01 ERROR 404: Not Found.
+
+--2024-05-01 10:00:02--  https://example.com/old{n}
+Reusing existing connection to example.com:443.
+HTTP request sent, awaiting response... 301 Moved Permanently
+Location: https://example.com/new{n} [following]
+--2024-05-01 10:00:02--  https://cdn.example.net/lib{n}.js
+Resolving cdn.example.net (cdn.example.net)... failed: Temporary failure in name resolution.
+wget: unable to resolve host address ‘cdn.example.net’
+"""
+
+
+class OriginalLogParser:
+    """
+    基线：改造前的 LogParser（基线提交中 utils/parser.py 的原样副本，只改了类名）
+    对每一行原始 stderr 依次尝试多个正则与 startswith / in，直接产出界面日志与统计
+    """
+
+    def __init__(self):
+        self.downloaded_count = 0
+        self.error_count = 0
+        
+        # 预编译正则提高性能
+        # 匹配成功保存：... ‘filename’ saved [size/size]
+        self.saved_pattern = re.compile(r"‘.+’ saved \[\d+/\d+\]")
+        # 匹配 200 OK (另一种成功标志)
+        self.ok_pattern = re.compile(r"\s200 OK$")
+        # 匹配常见错误
+        self.error_pattern = re.compile(r"(ERROR \d+|failed:|Not Found)", re.IGNORECASE)
+
+    def process_line(self, line: str) -> Tuple[str, dict]:
+        """
+        处理一行原始日志
+        
+        Args:
+            line: wget 输出的一行原始文本
+            
+        Returns:
+            Tuple[str, dict]: 
+                - clean_log: 清理后适合展示的日志行（如果是无关紧要的空行则为空字符串）
+                - stats: 当前的统计数据字典 {'files': int, 'errors': int}
+        """
+        line = line.strip()
+        if not line:
+            return "", self._get_stats()
+
+        # 1. 检测文件下载成功
+        # wget 输出通常包含 "saved [bytes/bytes]" 表示写入磁盘完成
+        if self.saved_pattern.search(line):
+            self.downloaded_count += 1
+            # 可以给这行日志加个高亮标记（在 Gradio Markdown 中显示）
+            clean_log = f"✅ FILE SAVED: {self._extract_filename(line)}"
+        
+        # 2. 检测错误
+        elif self.error_pattern.search(line):
+            self.error_count += 1
+            clean_log = f"❌ ERROR: {line}"
+            
+        # 3. 过滤/格式化其他常见状态
+        elif line.startswith("Resolving "):
+            clean_log = f"🔄 {line}"
+        elif line.startswith("Connecting to "):
+            clean_log = f"🔗 {line}"
+        elif "200 OK" in line:
+            # 200 OK 有时出现在 saved 之前，作为进度提示
+            clean_log = f"⬇️  Response: 200 OK" 
+        elif line.startswith("Saving to:"):
+            # 简化显示，去掉冗长的路径
+            filename = self._extract_filename(line)
+            clean_log = f"💾 Saving: {filename}..."
+        else:
+            # 其他日志保持原样，或者选择忽略以减少刷屏
+            # 这里我们选择保留，但缩进一下区分
+            clean_log = f"   {line}"
+
+        return f"{clean_log}\n", self._get_stats()
+
+    def _extract_filename(self, line: str) -> str:
+        """从日志行中尝试提取文件名，仅用于展示"""
+        try:
+            # 尝试查找引号中的内容 ‘path/to/file’
+            start = line.find("‘")
+            end = line.find("’")
+            if start != -1 and end != -1:
+                full_path = line[start+1:end]
+                # 只返回文件名，不显示长路径
+                return full_path.split('/')[-1]
+            return "file"
+        except:
+            return "file"
+
+    def _get_stats(self) -> dict:
+        return {
+            "files": self.downloaded_count,
+            "errors": self.error_count
+        }
+
+
+def load_lines(log_path, total):
+    """读取录制的日志（或生成模拟日志），重复到至少 total 行"""
+    if log_path:
+        with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+            sample = f.read().splitlines(keepends=True)
+    else:
+        sample = [line for n in range(50) for line in SAMPLE_LOG.format(n=n).splitlines(keepends=True)]
+    if not sample:
+        raise SystemExit("Empty log file.")
+    repeat = -(-total // len(sample))
+    return (sample * repeat)[:max(total, len(sample))]
+
+
+def timed(label, lines, func):
+    # 前面测量保留的事件对象很多，循环垃圾回收会拖慢后面的测量；计时期间关闭
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+    finally:
+        gc.enable()
+    print(f"{label:<36} {elapsed:8.3f}s  {len(lines) / elapsed / 1e6:6.2f} M lines/s")
+    return elapsed, result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark the wget log parsers.")
+    arg_parser.add_argument("--log", help="recorded wget stderr; a synthetic log is generated when omitted")
+    arg_parser.add_argument("--lines", type=int, default=1_000_000, help="number of lines to parse")
+    arg_parser.add_argument("--chunk-lines", type=int, default=100, help="lines per chunk passed to parse_chunk")
+    args = arg_parser.parse_args()
+
+    lines = load_lines(args.log, args.lines)
+    chunks = ["".join(lines[i:i + args.chunk_lines]) for i in range(0, len(lines), args.chunk_lines)]
+    print(f"Parsing {len(lines):,} lines ({len(chunks):,} chunks of {args.chunk_lines})\n")
+
+    # 1. 从 stderr 到界面日志与统计：基线 vs 事件解析 + 渲染
+    original = OriginalLogParser()
+    base_time, _ = timed("LogParser.process_line (original)", lines,
+                         lambda: [original.process_line(line) for line in lines])
+
+    def per_line():
+        events, renderer = WgetEventParser(), LogParser()
+        return [renderer.process_event(events.parse(line)) for line in lines]
+
+    def per_chunk():
+        events, renderer = WgetEventParser(), LogParser()
+        return [renderer.process_event(event) for chunk in chunks for event in events.parse_chunk(chunk)]
+
+    line_time, _ = timed("parse + process_event", lines, per_line)
+    chunk_time, _ = timed("parse_chunk + process_event", lines, per_chunk)
+    print(f"{'':<36} speedup x{base_time / line_time:.2f} (per line), x{base_time / chunk_time:.2f} (chunk)\n")
+
+    # 2. 只看事件解析：逐行 vs 整段，结果必须一致
+    line_events, chunk_events = WgetEventParser(), WgetEventParser()
+    line_time, line_out = timed("WgetEventParser.parse", lines,
+                                lambda: [line_events.parse(line) for line in lines])
+    chunk_time, chunk_out = timed("WgetEventParser.parse_chunk", lines,
+                                  lambda: [event for chunk in chunks for event in chunk_events.parse_chunk(chunk)])
+    # 时间戳在构造时生成，比较时忽略
+    fields = lambda e: (type(e), {k: v for k, v in vars(e).items() if k != "timestamp"})
+    assert len(line_out) == len(chunk_out), "event parsers disagree on the event count"
+    assert all(fields(a) == fields(b) for a, b in zip(line_out, chunk_out)), "event parsers disagree"
+    print(f"{'':<36} ratio x{line_time / chunk_time:.2f} (chunk vs per line)")
+
+if __name__ == "__main__":
+    main()
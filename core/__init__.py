@@ -0,0 +1,12 @@
+# 导入各后端模块，使其注册到引擎注册表
+from core.base import (
+    DownloadEngine,
+    ENGINE_REGISTRY,
+    available_engines,
+    create_engine,
+    parse_engine_rules,
+    register_engine,
+    resolve_engine_name,
+)
+from core.engine import WgetEngine, Wget2Engine
+from core.crawler import AsyncCrawlEngine
@@ -0,0 +1,224 @@
+import fnmatch
+import inspect
+import os
+import shutil
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Generator, List, Optional, Tuple, Type
+from urllib.parse import urlparse
+from utils.file_manager import FileManager
+from core.checkpoint import CrawlCheckpoint
+from core.pacing import PacingPolicy
+from core.traps import TrapPolicy
+from core.budget import CrawlBudget
+from core.events import CrawlEvent, LogMessage, PhaseChanged, PHASE_FINISHED, PHASE_PREPARING
+
+
+class DownloadEngine(ABC):
+    """
+    下载引擎抽象接口
+    所有后端都实现 events(url) 生成器，产出结构化的 CrawlEvent，
+    以 PhaseChanged(PHASE_FINISHED, folder=站点目录) 表示成功完成；
+    download(url) 保留旧协议 Yields: (log_line, completed_folder_path)
+    """
+
+    # 注册表中使用的名字
+    name: str = ""
+    # 后端依赖的外部可执行文件（如 wget），为空表示纯 Python 实现
+    binary: Optional[str] = None
+
+    def __init__(self, file_manager: FileManager, incremental: bool = True, resumable: bool = True,
+                 job_id: Optional[str] = None, pacing: Optional[PacingPolicy] = None,
+                 traps: Optional[TrapPolicy] = None, budget: Optional[CrawlBudget] = None,
+                 checkpoint_key: Optional[str] = None):
+        """
+        Args:
+            file_manager: 初始化的 FileManager 实例
+            incremental: 是否基于上一次镜像做增量下载
+            resumable: 失败或停止时是否保留已下载内容与断点，供下一次任务继续
+            job_id: 任务 ID；指定时在独立的工作目录 temp_sites/<job_id>/ 中下载
+            pacing: 每个主机的请求节奏（速率、并发、退让），默认使用 PacingPolicy()
+            traps: 爬虫陷阱的识别阈值，默认使用 TrapPolicy()
+            budget: 任务预算（文件数、字节数、深度、时长），默认不限
+            checkpoint_key: 断点的键（任务键），选项不同的同站任务使用各自的断点；默认按 URL
+        """
+        self.fm = file_manager
+        self.paths = self.fm.get_paths()
+        self.job_id = job_id
+        if job_id:
+            self.base_dir = str(self.fm.create_job_workspace(job_id))
+        else:
+            self.base_dir = self.paths['temp']
+        self.incremental = incremental
+        self.resumable = resumable
+        self.pacing = pacing or PacingPolicy()
+        self.traps = traps or TrapPolicy()
+        self.budget = budget or CrawlBudget()
+        self.checkpoint_key = checkpoint_key
+        self.current_website_dir: Optional[str] = None
+        self._checkpoint: Optional[CrawlCheckpoint] = None
+        self._resumed = False
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """当前主机是否可以使用该后端"""
+        return cls.binary is None or shutil.which(cls.binary) is not None
+
+    def _get_domain_from_url(self, url: str) -> str:
+        """从 URL 解析域名"""
+        parsed = urlparse(url)
+        domain = parsed.netloc or parsed.path.split('/')[0]
+        return domain.split(':')[0]
+
+    def _prepare_website_dir(self, domain: str, url: str) -> Generator[CrawlEvent, None, None]:
+        """
+        准备站点目录：
+        存在同一 URL 的断点时直接沿用上次的目录继续；
+        否则清理旧的临时目录，增量模式下用保留的镜像重新填充
+        """
+        self._resumed = False
+        self._checkpoint = CrawlCheckpoint(self.paths['checkpoint'], url, self.checkpoint_key)
+        if self.resumable and self._checkpoint.load():
+            if self._checkpoint_owner_active():
+                yield LogMessage(text=f"[Engine] Checkpoint of {domain} belongs to a running job, starting a fresh crawl\n")
+            elif self._adopt_checkpoint_dir():
+                self._resumed = True
+                yield PhaseChanged(phase=PHASE_PREPARING, message=f"[Engine] Resuming interrupted crawl of {domain} from checkpoint\n")
+                return
+
+        if os.path.exists(self.current_website_dir):
+            yield PhaseChanged(phase=PHASE_PREPARING, message=f"[Engine] Cleaning old directory: {domain}...\n")
+            self.fm.clear_temp_folder(self.current_website_dir)
+        if self.incremental and self.fm.seed_from_mirror(domain, self.current_website_dir):
+            yield LogMessage(text=f"[Engine] Incremental mode: reusing previous mirror of {domain}\n")
+
+    def _checkpoint_owner_active(self) -> bool:
+        """断点所在的工作目录是否属于另一个仍在运行的任务（不能移走其正在写入的目录）"""
+        owner = os.path.basename(os.path.dirname(os.path.abspath(self._checkpoint.website_dir)))
+        return owner != self.job_id and self.fm.is_job_active(owner)
+
+    def _adopt_checkpoint_dir(self) -> bool:
+        """把断点所在的（上一个任务的）站点目录移动到本任务的工作目录中"""
+        previous = os.path.abspath(self._checkpoint.website_dir)
+        current = os.path.abspath(self.current_website_dir)
+        if previous == current:
+            return True
+        if os.path.exists(current):
+            return False
+        try:
+            os.replace(previous, current)
+        except OSError:
+            return False
+        # 上一个任务的工作目录已空，顺便删除
+        try:
+            os.rmdir(os.path.dirname(previous))
+        except OSError:
+            pass
+        return True
+
+    @property
+    def keeps_partial_files(self) -> bool:
+        """失败或停止后是否保留了可续传的部分下载"""
+        return bool(self.resumable and self._checkpoint and self._checkpoint.exists())
+
+    def _finish(self):
+        """任务成功：断点不再需要"""
+        if self._checkpoint:
+            self._checkpoint.delete()
+
+    def _abandon(self):
+        """任务失败或被停止：可恢复时保留已下载内容，否则清理"""
+        if self.keeps_partial_files:
+            return
+        self.cleanup_partial_files()
+
+    @abstractmethod
+    def events(self, url: str) -> Generator[CrawlEvent, None, None]:
+        """执行下载，产出结构化事件；成功时最后一个事件为带站点目录的 PHASE_FINISHED"""
+
+    def download(self, url: str) -> Generator[Tuple[str, Optional[str]], None, None]:
+        """
+        旧协议：把事件渲染为 wget 风格的日志行
+        Yields: (log_line, completed_folder_path)
+        """
+        events = self.events(url)
+        try:
+            for event in events:
+                folder = event.folder if isinstance(event, PhaseChanged) and event.phase == PHASE_FINISHED else None
+                yield event.line(), folder
+        finally:
+            events.close()
+
+    @abstractmethod
+    def stop(self):
+        """强制停止并清理"""
+
+    @abstractmethod
+    def cleanup_partial_files(self):
+        """清理未完成的下载"""
+
+
+# --- 引擎注册表 ---
+ENGINE_REGISTRY: Dict[str, Type[DownloadEngine]] = {}
+
+
+def register_engine(name: str) -> Callable[[Type[DownloadEngine]], Type[DownloadEngine]]:
+    """类装饰器：把引擎登记到注册表"""
+    def decorator(cls: Type[DownloadEngine]) -> Type[DownloadEngine]:
+        cls.name = name
+        ENGINE_REGISTRY[name] = cls
+        return cls
+    return decorator
+
+
+def available_engines() -> List[str]:
+    """返回当前主机可用的引擎名"""
+    return [name for name, cls in ENGINE_REGISTRY.items() if cls.is_available()]
+
+
+def create_engine(name: str, file_manager: FileManager, **kwargs) -> DownloadEngine:
+    """按名字实例化引擎；引擎不支持的参数（如只有原生引擎才有的抓取前沿设置）会被忽略"""
+    if name not in ENGINE_REGISTRY:
+        raise ValueError(f"Unknown engine: {name} (available: {', '.join(ENGINE_REGISTRY)})")
+    cls = ENGINE_REGISTRY[name]
+    if not cls.is_available():
+        raise RuntimeError(f"Engine '{name}' is not available on this host (missing {cls.binary})")
+    accepted = inspect.signature(cls.__init__).parameters
+    return cls(file_manager, **{k: v for k, v in kwargs.items() if k in accepted})
+
+
+def parse_engine_rules(spec: str) -> List[Tuple[str, str]]:
+    """
+    解析按站点选择引擎的规则
+    格式: "docs.python.org=wget2,*.aidoczh.com=native"
+    """
+    rules = []
+    for item in (spec or "").split(','):
+        if '=' not in item:
+            continue
+        pattern, engine = item.split('=', 1)
+        if pattern.strip() and engine.strip():
+            rules.append((pattern.strip().lower(), engine.strip()))
+    return rules
+
+
+def resolve_engine_name(url: str, requested: Optional[str], default: str,
+                        rules: Optional[List[Tuple[str, str]]] = None) -> str:
+    """
+    决定本次任务使用的引擎
+    优先级: 任务显式指定 > 站点规则 > 默认配置；不可用的后端回退到默认
+    """
+    candidates = []
+    if requested and requested != "auto":
+        candidates.append(requested)
+    host = (urlparse(url).hostname or "").lower()
+    for pattern, engine in rules or []:
+        if fnmatch.fnmatch(host, pattern):
+            candidates.append(engine)
+            break
+    candidates.append(default)
+
+    for name in candidates:
+        cls = ENGINE_REGISTRY.get(name)
+        if cls is not None and cls.is_available():
+            return name
+    return default
@@ -0,0 +1,110 @@
+import time
+from typing import Optional
+
+from utils.throughput import format_duration, format_size
+
+# 预算的种类
+BUDGET_FILES = "files"
+BUDGET_BYTES = "bytes"
+BUDGET_DEPTH = "depth"
+BUDGET_DURATION = "duration"
+
+
+class CrawlBudget:
+    """
+    单个任务的抓取预算
+    文件数、下载字节数、链接深度与运行时长；文件数 / 字节数 / 时长任意一项用完即结束抓取，
+    已下载的部分照常打包。各项 0 表示不限
+    """
+
+    def __init__(self, max_files: int = 0, max_bytes: int = 0, max_depth: int = 0, max_seconds: float = 0.0):
+        """
+        Args:
+            max_files: 最多完成的文件数（包括沿用本地副本的文件）
+            max_bytes: 最多下载的字节数
+            max_depth: 页面链接的最大深度（起始页为 0，等价 wget -l）
+            max_seconds: 抓取阶段的最长运行时间（秒）
+        """
+        self.max_files = max(0, int(max_files or 0))
+        self.max_bytes = max(0, int(max_bytes or 0))
+        self.max_depth = max(0, int(max_depth or 0))
+        self.max_seconds = max(0.0, float(max_seconds or 0))
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> "CrawlBudget":
+        return cls(**(data or {}))
+
+    def to_dict(self) -> dict:
+        return {"max_files": self.max_files, "max_bytes": self.max_bytes,
+                "max_depth": self.max_depth, "max_seconds": self.max_seconds}
+
+    def __bool__(self) -> bool:
+        return bool(self.max_files or self.max_bytes or self.max_depth or self.max_seconds)
+
+    def capped(self, ceiling: Optional["CrawlBudget"]) -> "CrawlBudget":
+        """受服务器上限约束后的预算：取两者中较小的非零值"""
+        if not ceiling:
+            return self
+
+        def cap(value, limit):
+            return min(value, limit) if value and limit else value or limit
+
+        return CrawlBudget(
+            max_files=cap(self.max_files, ceiling.max_files),
+            max_bytes=cap(self.max_bytes, ceiling.max_bytes),
+            max_depth=cap(self.max_depth, ceiling.max_depth),
+            max_seconds=cap(self.max_seconds, ceiling.max_seconds),
+        )
+
+    def describe(self) -> str:
+        parts = []
+        if self.max_files:
+            parts.append(f"{self.max_files} files")
+        if self.max_bytes:
+            parts.append(format_size(self.max_bytes))
+        if self.max_depth:
+            parts.append(f"depth {self.max_depth}")
+        if self.max_seconds:
+            parts.append(format_duration(self.max_seconds))
+        return " · ".join(parts) or "unlimited"
+
+
+class BudgetMeter:
+    """累计一次抓取的用量，判断文件数 / 字节数 / 时长预算是否用完"""
+
+    def __init__(self, budget: CrawlBudget):
+        self.budget = budget
+        self.files = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+
+    def record(self, size: int = 0, files: int = 1):
+        self.files += files
+        self.bytes += size
+
+    @property
+    def deadline(self) -> Optional[float]:
+        """时长预算的截止时间（time.monotonic()），不限时为 None"""
+        return self.started + self.budget.max_seconds if self.budget.max_seconds else None
+
+    def exhausted(self, now: Optional[float] = None) -> Optional[str]:
+        """已用完的预算种类（BUDGET_*），都未用完返回 None"""
+        budget = self.budget
+        if budget.max_files and self.files >= budget.max_files:
+            return BUDGET_FILES
+        if budget.max_bytes and self.bytes >= budget.max_bytes:
+            return BUDGET_BYTES
+        deadline = self.deadline
+        if deadline is not None and (now if now is not None else time.monotonic()) >= deadline:
+            return BUDGET_DURATION
+        return None
+
+    def explain(self, kind: str) -> str:
+        """预算用完时显示的说明"""
+        if kind == BUDGET_FILES:
+            return f"file budget of {self.budget.max_files} reached"
+        if kind == BUDGET_BYTES:
+            return f"size budget of {format_size(self.budget.max_bytes)} reached ({format_size(self.bytes)} downloaded)"
+        if kind == BUDGET_DEPTH:
+            return f"links deeper than {self.budget.max_depth} levels were not followed"
+        return f"time budget of {format_duration(self.budget.max_seconds)} reached"
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+try:
+    import fcntl
+except ImportError:  # Windows 下只有进程内的线程锁
+    fcntl = None
+
+
+def normalize_url(url: str) -> str:
+    """
+    归一化 URL 作为缓存键的一部分：
+    协议与主机小写、去掉默认端口与片段、查询参数排序、空路径补 "/"
+    """
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or "").lower()
+    port = parsed.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return urlunparse((scheme, host, parsed.path or "/", "", query, ""))
+
+
+class ResultCache:
+    """
+    跨任务结果缓存
+    以 "归一化 URL + 抓取选项" 为键记录已生成的归档，
+    在有效期内重复请求直接返回现有文件；总大小超过上限时按 LRU 淘汰
+    索引文件可能由多个进程 / 共享 storage 的多个节点同时使用，每次读写都在文件锁内重新读取后再修改；
+    被替换、过期或淘汰的归档可能仍在被刚命中缓存的用户下载，先移出索引，宽限期过后再删除文件
+    """
+
+    def __init__(self, index_path: str, ttl_seconds: int = 3600, max_bytes: int = 2 * 1024 ** 3,
+                 grace_seconds: int = 600):
+        """
+        Args:
+            index_path: 缓存索引文件路径（JSON）
+            ttl_seconds: 缓存有效期（秒）
+            max_bytes: 缓存归档的总大小上限（字节）
+            grace_seconds: 移出索引的归档保留多久再删除（秒）
+        """
+        self.index_path = index_path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.grace_seconds = grace_seconds
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}
+        # 等待删除的归档: {"path": 路径, "retired_at": 移出索引的时间}
+        self._retired: List[dict] = []
+        self._load()
+
+    def make_key(self, url: str, options: Optional[dict] = None) -> str:
+        payload = json.dumps({"url": normalize_url(url), "options": options or {}}, sort_keys=True)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        if "entries" in data:
+            self._entries = data["entries"]
+            self._retired = data.get("retired", [])
+        else:
+            # 旧格式的索引只有条目
+            self._entries = data
+            self._retired = []
+
+    @contextmanager
+    def _locked(self):
+        """索引的读-改-写：持有文件锁期间重新读取索引，写回时不会覆盖其他节点刚登记的条目"""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+            with open(self.index_path + ".lock", 'a') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    self._load()
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _save(self):
+        self._reap(time.time())
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"entries": self._entries, "retired": self._retired}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def lookup(self, url: str, options: Optional[dict] = None) -> Optional[str]:
+        """命中且未过期时返回归档路径，并刷新其 LRU 时间"""
+        key = self.make_key(url, options)
+        with self._locked():
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry["created_at"] > self.ttl_seconds or not os.path.exists(entry["path"]):
+                self._drop(key)
+                self._save()
+                return None
+            entry["last_access"] = time.time()
+            self._save()
+            return entry["path"]
+
+    def store(self, url: str, options: Optional[dict], archive_path: str):
+        """登记新生成的归档，并按需淘汰最久未使用的条目"""
+        key = self.make_key(url, options)
+        with self._locked():
+            if key in self._entries and self._entries[key]["path"] != archive_path:
+                self._drop(key)
+            now = time.time()
+            self._entries[key] = {
+                "url": normalize_url(url),
+                "options": options or {},
+                "path": archive_path,
+                "size": os.path.getsize(archive_path),
+                "created_at": now,
+                "last_access": now,
+            }
+            self._evict()
+            self._save()
+
+    def invalidate(self, url: str, options: Optional[dict] = None):
+        """强制刷新时丢弃旧的缓存条目"""
+        key = self.make_key(url, options)
+        with self._locked():
+            if key in self._entries:
+                self._drop(key)
+                self._save()
+
+    def paths(self) -> set:
+        """当前缓存中与等待删除的归档路径（清理过期文件时跳过它们）"""
+        with self._locked():
+            return {os.path.abspath(e["path"]) for e in [*self._entries.values(), *self._retired]}
+
+    def _evict(self):
+        now = time.time()
+        for key in [k for k, e in self._entries.items() if now - e["created_at"] > self.ttl_seconds]:
+            self._drop(key)
+        total = sum(e["size"] for e in self._entries.values())
+        for key, entry in sorted(self._entries.items(), key=lambda kv: kv[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            total -= entry["size"]
+            self._drop(key)
+
+    def _drop(self, key: str):
+        """移出索引；文件在宽限期过后由 _reap 删除"""
+        entry = self._entries.pop(key, None)
+        if entry and os.path.exists(entry["path"]):
+            self._retired.append({"path": entry["path"], "retired_at": time.time()})
+
+    def _reap(self, now: float):
+        """删除宽限期已过的归档（同一路径重新登记为缓存时不删除）"""
+        live = {e["path"] for e in self._entries.values()}
+        kept = []
+        for item in self._retired:
+            if item["path"] in live:
+                continue
+            if now - item["retired_at"] < self.grace_seconds:
+                kept.append(item)
+                continue
+            try:
+                os.remove(item["path"])
+            except OSError:
+                pass
+        self._retired = kept
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List, Optional, Union
+
+
+class CrawlCheckpoint:
+    """
+    抓取断点
+    周期性记录待抓取队列、已访问集合与已完成文件，
+    任务失败或被停止后，同一 URL 的新任务可以从断点继续；
+    已访问集合可以以 64 位指纹的形式存放在旁边的 .visited 文件中，每次保存只追加新增的指纹；
+    待抓取队列的每项为 [url, depth]（旧版本的断点只有 url），
+    溢出到旁边 .pending 文件中的部分按偏移引用（pending），不写入 JSON
+    """
+
+    VERSION = 1
+
+    def __init__(self, checkpoint_dir: str, url: str, job_key: Optional[str] = None):
+        """
+        Args:
+            checkpoint_dir: 断点存放目录（FileManager 的 checkpoint 路径）
+            url: 任务的起始 URL
+            job_key: 任务键（归一化 URL + 任务选项），同一任务键共用一个断点；为空时按 URL 区分
+        """
+        self.url = url
+        key = hashlib.sha1((job_key or url.strip()).encode('utf-8')).hexdigest()[:16]
+        self.path = os.path.join(checkpoint_dir, f"{key}.json")
+        self.visited_path = os.path.join(checkpoint_dir, f"{key}.visited")
+        # 抓取前沿的溢出文件，由 Frontier 直接读写
+        self.pending_path = os.path.join(checkpoint_dir, f"{key}.pending")
+
+        self.engine: str = ""
+        self.website_dir: str = ""
+        self.frontier: List[Union[str, list]] = []
+        # 溢出文件的引用：未读部分的偏移、文件长度与行数；为空表示全部待抓取 URL 都在 frontier 中
+        self.pending: Dict[str, int] = {}
+        self.visited: List[str] = []
+        self.fingerprints: bytes = b""
+        # 指纹文件中属于本断点的指纹数量，下一次保存从这里追加
+        self.visited_count = 0
+        self.completed: Dict[str, str] = {}
+        # 需要改写链接的文件（相对路径 -> 字符集）；旧版本的断点为路径列表
+        self.convertible: Union[Dict[str, str], List[str]] = {}
+        self.updated_at: float = 0.0
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self) -> bool:
+        """读取断点，返回是否可以用于恢复"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != self.VERSION or data.get("url") != self.url:
+            return False
+        self.engine = data.get("engine", "")
+        self.website_dir = data.get("website_dir", "")
+        self.frontier = data.get("frontier", [])
+        self.pending = data.get("pending", {})
+        self.visited = data.get("visited", [])
+        self.completed = data.get("completed", {})
+        self.convertible = data.get("convertible", {})
+        self.updated_at = data.get("updated_at", 0.0)
+        # 旧版本的断点没有 visited_count，整个文件都属于它；上次保存之后追加的部分不读取
+        count = data.get("visited_count")
+        try:
+            with open(self.visited_path, 'rb') as f:
+                self.fingerprints = f.read() if count is None else f.read(count * 8)
+        except OSError:
+            self.fingerprints = b""
+        self.visited_count = len(self.fingerprints) // 8
+        return bool(self.website_dir) and os.path.isdir(self.website_dir)
+
+    def save(self, engine: str, website_dir: str, frontier: Optional[List[Union[str, list]]] = None,
+             visited: Optional[List[str]] = None, completed: Optional[Dict[str, str]] = None,
+             convertible: Optional[Dict[str, str]] = None, fingerprints: Optional[bytes] = None,
+             pending: Optional[Dict[str, int]] = None):
+        """
+        写入断点，JSON 原子替换
+        fingerprints 为上次保存之后新增的指纹，追加到指纹文件中（此时 visited 可以为空），None 表示不使用指纹文件；
+        pending 为 .pending 溢出文件的引用
+        """
+        self.engine = engine
+        self.website_dir = website_dir
+        self.frontier = frontier or []
+        self.pending = pending or {}
+        self.visited = visited or []
+        self.completed = completed or {}
+        self.convertible = convertible or {}
+        self.updated_at = time.time()
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if fingerprints is not None:
+            # 先追加指纹再替换 JSON：文件中超出 visited_count 的部分在读取时忽略
+            with open(self.visited_path, 'r+b' if os.path.exists(self.visited_path) else 'wb') as f:
+                f.seek(self.visited_count * 8)
+                f.write(fingerprints)
+                f.truncate()
+            self.visited_count += len(fingerprints) // 8
+        else:
+            self.discard_visited()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "version": self.VERSION,
+                "url": self.url,
+                "engine": self.engine,
+                "website_dir": self.website_dir,
+                "frontier": self.frontier,
+                "pending": self.pending,
+                "visited": self.visited,
+                "visited_count": self.visited_count,
+                "completed": self.completed,
+                "convertible": self.convertible,
+                "updated_at": self.updated_at,
+            }, f)
+        os.replace(tmp_path, self.path)
+
+    def discard_visited(self):
+        """不沿用已有的指纹文件（重新开始的抓取），下一次保存从头写入"""
+        self.visited_count = 0
+        self.fingerprints = b""
+        if os.path.exists(self.visited_path):
+            os.remove(self.visited_path)
+
+    def delete(self):
+        """任务成功完成后删除断点"""
+        for path in (self.path, self.visited_path, self.pending_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,742 @@
+import asyncio
+import hashlib
+import os
+import queue
+import re
+import socket
+import threading
+import time
+from typing import Dict, Generator, List, Optional, Set
+from urllib.parse import urljoin, urlparse, unquote
+from urllib.robotparser import RobotFileParser
+
+import aiohttp
+
+from utils.file_manager import FileManager
+from core.base import DownloadEngine, register_engine
+from core.manifest import CrawlManifest
+from core.frontier import Frontier, UrlCanonicalizer
+from core.traps import TrapDetector, TrapPolicy
+from core.budget import BUDGET_DEPTH, BUDGET_DURATION, BudgetMeter, CrawlBudget
+from core.pacing import OVERLOAD_STATUSES, HostScheduler, PacingPolicy, parse_crawl_delay, parse_retry_after
+from core.events import (
+    BudgetExhausted, CrawlError, CrawlEvent, FileReused, FileSaved, LogMessage, PhaseChanged, Redirect,
+    RequestStarted, ResponseStatus, UrlPruned, classify_failure, ERROR_DNS, ERROR_HTTP, ERROR_NETWORK, ERROR_TIMEOUT,
+    PHASE_CONVERTING, PHASE_CRAWLING, PHASE_FAILED, PHASE_FINISHED, PHASE_STOPPED,
+)
+
+# 抓取链接用的正则：<a href> 视为页面链接，其余 src/href 视为页面资源 (等价 wget -p)
+TAG_LINK_PATTERN = re.compile(
+    r"""<(?P<tag>[a-zA-Z][a-zA-Z0-9]*)\b[^>]*?\b(?P<attr>href|src)\s*=\s*(?P<q>["']?)(?P<url>[^"'\s>]+)(?P=q)""",
+    re.IGNORECASE,
+)
+# CSS 中的 url(...) 引用
+CSS_URL_PATTERN = re.compile(r"""url\(\s*(?P<q>["']?)(?P<url>[^"')\s]+)(?P=q)\s*\)""", re.IGNORECASE)
+
+# 会被改写链接的文本类型 (等价 wget -k)
+CONVERTIBLE_TYPES = ("text/html", "application/xhtml+xml", "text/css")
+
+# 流式写盘时每次读取的正文块大小
+CHUNK_SIZE = 64 * 1024
+
+# 匹配 robots.txt 分组时使用的名字（aiohttp 默认的 User-Agent 为 "Python/3.x aiohttp/3.x"）
+ROBOTS_USER_AGENT = "Python aiohttp"
+
+
+@register_engine("native")
+class AsyncCrawlEngine(DownloadEngine):
+    """
+    原生 asyncio 爬虫引擎
+    与 WgetEngine 产出相同的事件流（直接构造事件，不经过文本解析），
+    但每个主机可以同时保持多个请求在途，适合大量小文件的站点；
+    每个主机的请求速率与在途数量由 HostPacer 按源站的响应自适应调整；
+    待抓取队列与已访问集合由 Frontier 管理（URL 规范化、指纹去重，过大时溢出到磁盘）；
+    预算用完时不再取新 URL，等在途请求结束后照常改写链接并完成
+    """
+
+    def __init__(self, file_manager: FileManager, incremental: bool = True, resumable: bool = True,
+                 job_id: Optional[str] = None, pacing: Optional[PacingPolicy] = None,
+                 traps: Optional[TrapPolicy] = None, budget: Optional[CrawlBudget] = None,
+                 checkpoint_key: Optional[str] = None, per_host_limit: int = 8, timeout: int = 30,
+                 checkpoint_interval: float = 15.0,
+                 url_param_blacklist: Optional[List[str]] = None, frontier_memory: int = 100_000,
+                 visited_memory: int = 2_000_000, bloom: bool = True):
+        """
+        Args:
+            file_manager: 初始化的 FileManager 实例
+            incremental: 是否基于上一次镜像和清单发送条件请求
+            resumable: 失败或停止时是否保留已下载内容与断点，供下一次任务继续
+            job_id: 任务 ID，指定时在独立的工作目录中下载
+            pacing: 每个主机的请求节奏；未指定时以 per_host_limit 为并发上限
+            traps: 爬虫陷阱的识别阈值，新发现的链接入队前检查
+            budget: 任务预算；深度只限制页面链接，页面资源 (-p) 不受限
+            checkpoint_key: 断点的键（任务键）
+            per_host_limit: 每个主机同时在途的最大请求数（pacing 未指定时使用）
+            timeout: 单个请求的超时时间（秒）
+            checkpoint_interval: 写入断点的间隔（秒）
+            url_param_blacklist: 规范化时丢弃的查询参数（支持 * 通配），默认丢弃 utm_* 与常见会话 ID
+            frontier_memory: 内存中待抓取 URL 的上限，超出部分写入溢出文件（可恢复时位于断点旁边）
+            visited_memory: 内存中已访问指纹的上限，超出部分写入磁盘
+            bloom: 磁盘上的已访问指纹是否使用布隆过滤器加速
+        """
+        super().__init__(file_manager, incremental, resumable, job_id,
+                         pacing or PacingPolicy(max_concurrency=per_host_limit), traps, budget, checkpoint_key)
+        self.per_host_limit = self.pacing.max_concurrency
+        self.timeout = timeout
+        self.checkpoint_interval = checkpoint_interval
+        self.canonicalizer = UrlCanonicalizer(url_param_blacklist)
+        self.frontier_memory = frontier_memory
+        self.visited_memory = visited_memory
+        self.bloom = bloom
+
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._main_task: Optional[asyncio.Task] = None
+        self._stop_event = threading.Event()
+
+        # 单次任务的抓取状态
+        self._hosts: Optional[HostScheduler] = None
+        # 过载 / 超时后等待重试的 URL 与已重试次数
+        self._attempts: Dict[str, int] = {}
+        self._retrying: Set[str] = set()
+        self._frontier: Optional[Frontier] = None
+        # 在途的 URL 及其链接深度
+        self._in_flight: Dict[str, int] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._trap_detector: Optional[TrapDetector] = None
+        self._meter: Optional[BudgetMeter] = None
+        # 已用完的预算种类，None 表示未用完
+        self._exhausted: Optional[str] = None
+        self._depth_limited = False
+        # 起始主机的 robots.txt 规则（与 wget -m 一样遵守 Disallow），没有 robots.txt 时为 None
+        self._robots: Optional[RobotFileParser] = None
+        self._robots_blocked = 0
+        self._url_to_path: Dict[str, str] = {}
+        # 需要改写链接的文件及其响应的字符集
+        self._convertible: Dict[str, str] = {}
+        self._saved_count = 0
+        self._manifest: Optional[CrawlManifest] = None
+
+    def events(self, url: str) -> Generator[CrawlEvent, None, None]:
+        """
+        执行原生抓取
+        Yields: CrawlEvent
+        """
+
+        # 1. 确定目标路径
+        domain = self._get_domain_from_url(url)
+        self.current_website_dir = os.path.join(self.base_dir, domain)
+
+        # 2. 清理旧数据，增量模式下复用上次镜像与清单；有断点时直接续传
+        yield from self._prepare_website_dir(domain, url)
+        self._manifest = CrawlManifest(self.paths['manifest'], domain)
+        if self.incremental or self._resumed:
+            self._manifest.load()
+
+        yield PhaseChanged(phase=PHASE_CRAWLING, message=f"[Engine] Starting download for: {domain}\n")
+        yield LogMessage(text=f"[Engine] Native crawler, {self.per_host_limit} requests in flight per host\n")
+
+        # 3. 在后台线程中运行事件循环，通过队列把事件送回生成器
+        # 可恢复时待抓取 URL 溢出到断点旁边的文件，断点按偏移引用它，不复制整个队列
+        self._frontier = Frontier(self.canonicalizer, memory_urls=self.frontier_memory,
+                                  visited_memory=self.visited_memory,
+                                  spill_dir=os.path.join(self.base_dir, f".frontier-{domain}"), bloom=self.bloom,
+                                  pending_path=self._checkpoint.pending_path if self.resumable else None)
+        lines: "queue.Queue[Optional[CrawlEvent]]" = queue.Queue()
+        result: Dict[str, Optional[BaseException]] = {"error": None}
+        self._stop_event.clear()
+
+        def runner():
+            try:
+                asyncio.run(self._run(url, lines))
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                result["error"] = e
+            finally:
+                lines.put(None)
+
+        self._thread = threading.Thread(target=runner, name=f"crawler-{domain}", daemon=True)
+        self._thread.start()
+
+        try:
+            # 4. 实时流式输出
+            while True:
+                event = lines.get()
+                if event is None:
+                    break
+                yield event
+
+            self._thread.join()
+
+            # 5. 处理结果
+            if result["error"] is not None:
+                yield PhaseChanged(phase=PHASE_FAILED, message=f"\n[Engine] Critical Exception: {str(result['error'])}\n")
+                self._save_checkpoint()
+                self._abandon()
+            elif self._stop_event.is_set():
+                yield PhaseChanged(phase=PHASE_STOPPED, message="\n[Engine] Download stopped.\n")
+                self._save_checkpoint()
+                self._abandon()
+            elif self._saved_count > 0 and os.path.exists(self.current_website_dir):
+                # 预算提前结束的目录不完整，不会替换上一次的镜像，清单也保持与该镜像一致
+                if self._exhausted is None:
+                    self._manifest.save(prune=True)
+                self._finish()
+                message = ("\n[Engine] Crawl budget reached, partial download completed.\n" if self._exhausted
+                           else "\n[Engine] Download completed successfully.\n")
+                yield PhaseChanged(phase=PHASE_FINISHED, message=message, folder=self.current_website_dir)
+            else:
+                yield PhaseChanged(phase=PHASE_FAILED, message="\n[Engine] Error: No files were downloaded.\n")
+                self._save_checkpoint()
+                self._abandon()
+        finally:
+            # 消费方提前关闭生成器（如 UI 取消任务）时同样停止后台抓取
+            self.stop()
+            self._thread = None
+            self._frontier.close()
+            # 没有留下断点时，断点引用的溢出文件也不再需要
+            if not self.keeps_partial_files:
+                self._checkpoint.delete()
+
+    async def _run(self, start_url: str, lines: "queue.Queue[Optional[CrawlEvent]]"):
+        """事件循环入口：调度抓取任务，结束后改写链接"""
+        self._loop = asyncio.get_running_loop()
+        self._main_task = asyncio.current_task()
+        self._hosts = HostScheduler(self.pacing)
+        self._attempts = {}
+        self._retrying = set()
+        self._in_flight = {}
+        self._wakeup = asyncio.Event()
+        self._trap_detector = TrapDetector(self.traps)
+        self._meter = BudgetMeter(self.budget)
+        self._exhausted = None
+        self._depth_limited = False
+        self._robots = None
+        self._robots_blocked = 0
+        self._url_to_path = {}
+        self._convertible = {}
+        self._saved_count = 0
+
+        start_url = self.canonicalizer(start_url)
+        parsed = urlparse(start_url)
+        # -np: 页面递归不超出起始目录
+        start_dir = parsed.path if parsed.path.endswith('/') else parsed.path.rsplit('/', 1)[0] + '/'
+        scope = (parsed.netloc, start_dir)
+
+        # 断点只追加新增的指纹
+        self._frontier.visited.track_new()
+        # 其他引擎留下的断点只有已下载的文件，没有待抓取队列，从起始 URL 重新抓取
+        if self._resumed and self._checkpoint.engine == self.name:
+            pending = self._restore_checkpoint()
+            lines.put(LogMessage(text=f"Restored {self._saved_count} completed files, {pending} URLs pending.\n"))
+            # 断点中已完成的文件同样计入文件数预算
+            self._record(0, lines, files=self._saved_count)
+        else:
+            self._checkpoint.discard_visited()
+            self._frontier.add_canonical(start_url)
+        if self.budget.max_seconds:
+            self._loop.call_later(self.budget.max_seconds, self._exhaust, BUDGET_DURATION, lines)
+
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        connector = aiohttp.TCPConnector(limit_per_host=self.per_host_limit)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            robots_txt = await self._load_robots(session, start_url)
+            if robots_txt is not None:
+                self._robots = RobotFileParser()
+                self._robots.parse(robots_txt.splitlines())
+            if robots_txt and self.pacing.respect_crawl_delay:
+                delay = parse_crawl_delay(robots_txt, user_agent=ROBOTS_USER_AGENT)
+                if delay:
+                    self._hosts.pacer(parsed.netloc).apply_crawl_delay(delay)
+                    lines.put(LogMessage(text=f"robots.txt asks for {delay:g}s between requests to {parsed.netloc}.\n"))
+            workers = [
+                asyncio.create_task(self._worker(session, scope, lines))
+                for _ in range(self.per_host_limit)
+            ]
+            tasks = list(workers)
+            if self.resumable:
+                tasks.append(asyncio.create_task(self._checkpoint_loop()))
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                for t in tasks:
+                    t.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        for line in self._trap_detector.summary():
+            lines.put(LogMessage(text=f"Trap pruned - {line}\n"))
+        if self._robots_blocked:
+            lines.put(LogMessage(text=f"Skipped {self._robots_blocked} URLs disallowed by robots.txt.\n"))
+
+        if self._saved_count > 0 and not self._stop_event.is_set():
+            removed = await asyncio.to_thread(self._prune_stale_files)
+            if removed and self._exhausted is None:
+                lines.put(LogMessage(text=f"Removed {removed} files no longer linked from the site.\n"))
+            elif removed:
+                # 归档只包含本次预算内抓取的文件；上一次的镜像与清单保持不变，下一次抓取仍可发送条件请求
+                lines.put(LogMessage(text=f"Left {removed} files of the previous mirror beyond the budget "
+                                          f"out of the archive (the mirror itself is kept).\n"))
+            lines.put(PhaseChanged(phase=PHASE_CONVERTING, message="Converting links in downloaded files...\n"))
+            converted = await asyncio.to_thread(self._convert_links)
+            lines.put(LogMessage(text=f"Converted links in {converted} files.\n"))
+
+    async def _worker(self, session: aiohttp.ClientSession, scope, lines):
+        """工作协程：不断从抓取前沿取 URL 抓取，前沿为空且没有在途请求、或预算用完时结束"""
+        max_files = self.budget.max_files
+        while not self._stop_event.is_set() and self._exhausted is None:
+            # 在途请求已足以用完文件数预算时先不取新 URL，避免超出
+            full = max_files and self._meter.files + len(self._in_flight) >= max_files
+            item = None if full else self._frontier.pop()
+            if item is None:
+                if not self._in_flight:
+                    # 唤醒其他空闲的工作协程一起结束
+                    self._wakeup.set()
+                    return
+                # 等待在途请求完成（可能带来新链接）
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            url, depth = item
+            self._in_flight[url] = depth
+            try:
+                await self._fetch(session, url, depth, scope, lines)
+            except asyncio.CancelledError:
+                # 被停止时请求没有完成，放回队列，最后写入的断点仍包含它
+                self._retrying.add(url)
+                raise
+            except Exception as e:
+                lines.put(CrawlError(url=url, kind=self._classify_error(e), message=str(e) or e.__class__.__name__))
+            finally:
+                self._in_flight.pop(url, None)
+                # 过载 / 超时的 URL 在请求结束后重新排队（主机的退让期结束后才会再次请求）
+                if url in self._retrying:
+                    self._retrying.discard(url)
+                    self._frontier.requeue(url, depth)
+                self._wakeup.set()
+
+    def _record(self, size: int, lines, files: int = 1):
+        """计入完成的文件，检查文件数 / 字节数 / 时长预算"""
+        self._meter.record(size, files)
+        kind = self._meter.exhausted()
+        if kind:
+            self._exhaust(kind, lines)
+
+    def _exhaust(self, kind: str, lines):
+        """预算用完：工作协程不再取新 URL，在途请求照常完成"""
+        if self._exhausted is not None:
+            return
+        self._exhausted = kind
+        lines.put(BudgetExhausted(budget=kind, message=self._meter.explain(kind)))
+        self._wakeup.set()
+
+    async def _load_robots(self, session: aiohttp.ClientSession, start_url: str) -> Optional[str]:
+        """读取起始主机的 robots.txt，不存在或获取失败返回 None（与 wget 一样视为不限制）"""
+        parsed = urlparse(start_url)
+        try:
+            async with session.get(f"{parsed.scheme}://{parsed.netloc}/robots.txt") as resp:
+                if resp.status != 200:
+                    return None
+                return await resp.text(errors='replace')
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None
+
+    def _retry(self, url: str, lines, reason: str, pause: float) -> bool:
+        """过载或超时：在重试次数内标记为重试，由工作协程重新排队"""
+        attempts = self._attempts.get(url, 0) + 1
+        if attempts > self.pacing.max_retries:
+            return False
+        self._attempts[url] = attempts
+        self._retrying.add(url)
+        lines.put(LogMessage(text=f"{reason}: backing off {pause:.1f}s, retry {attempts}/{self.pacing.max_retries} for {url}\n"))
+        return True
+
+    async def _checkpoint_loop(self):
+        """周期性写入断点，进程意外退出时也能续传"""
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            state = self._snapshot()
+            await asyncio.to_thread(self._write_checkpoint, state)
+
+    def _snapshot(self) -> dict:
+        """
+        在事件循环线程中复制抓取状态，避免写盘时被并发修改
+        只复制内存中的部分：溢出文件中的待抓取 URL 按偏移引用，已访问集合只取上次以来新增的指纹
+        """
+        head, pending = self._frontier.checkpoint_state()
+        # 在途与等待重试的请求同样属于待抓取队列，排在队列头部之前
+        return {
+            "frontier": [[u, d] for u, d in dict([*self._in_flight.items(), *head]).items()],
+            "pending": pending,
+            "fingerprints": self._frontier.visited.take_new(),
+            "completed": {
+                u: os.path.relpath(p, self.current_website_dir) for u, p in self._url_to_path.items()
+            },
+            "convertible": {
+                os.path.relpath(p, self.current_website_dir): charset for p, charset in self._convertible.items()
+            },
+        }
+
+    def _write_checkpoint(self, state: dict):
+        if not self._checkpoint:
+            return
+        self._checkpoint.save(self.name, self.current_website_dir, **state)
+        if self._manifest:
+            self._manifest.save()
+
+    def _save_checkpoint(self):
+        """事件循环结束后（失败或停止）写入最终断点"""
+        if self.resumable and self._saved_count > 0:
+            self._write_checkpoint(self._snapshot())
+
+    def _restore_checkpoint(self) -> int:
+        """从断点恢复已访问集合、待抓取队列与已完成文件，返回待抓取的 URL 数量"""
+        cp = self._checkpoint
+        if cp.fingerprints:
+            self._frontier.visited.update_from_bytes(cp.fingerprints)
+            # 这些指纹已在指纹文件中，不再追加
+            self._frontier.visited.take_new()
+            cp.fingerprints = b""
+        else:
+            # 旧格式的断点直接记录 URL
+            for u in cp.visited:
+                self._frontier.mark_seen(u)
+        self._url_to_path = {
+            u: os.path.join(self.current_website_dir, rel) for u, rel in cp.completed.items()
+        }
+        # 旧格式的断点只记录路径，按 UTF-8 改写
+        convertible = cp.convertible if isinstance(cp.convertible, dict) else dict.fromkeys(cp.convertible, 'utf-8')
+        self._convertible = {os.path.join(self.current_website_dir, rel): cs for rel, cs in convertible.items()}
+        self._saved_count = len(set(self._url_to_path.values()))
+        for u in self._url_to_path:
+            self._frontier.mark_seen(u)
+            self._manifest.touch(u)
+        head = [(item, 0) if isinstance(item, str) else tuple(item) for item in cp.frontier]
+        for u, _ in head:
+            self._frontier.mark_seen(u)
+        return self._frontier.restore(head, **cp.pending)
+
+    async def _fetch(self, session: aiohttp.ClientSession, url: str, depth: int, scope, lines):
+        """抓取单个 URL，保存到磁盘并把新链接加入队列；depth 为该 URL 的链接深度"""
+        pacer = self._hosts.pacer(urlparse(url).netloc)
+
+        # 增量模式：本地副本存在时发送条件请求
+        entry = self._manifest.get(url) if self._manifest else None
+        headers = {}
+        if entry and os.path.exists(os.path.join(self.current_website_dir, entry["path"])):
+            headers = self._manifest.conditional_headers(url)
+
+        async with pacer.slot():
+            lines.put(RequestStarted(url=url))
+            start = time.monotonic()
+            try:
+                async with session.get(url, headers=headers) as resp:
+                    if resp.status in OVERLOAD_STATUSES:
+                        # 源站过载：减半并发，按 Retry-After 暂停该主机后重试
+                        pause = pacer.on_overload(parse_retry_after(resp.headers.get("Retry-After")))
+                        if not self._retry(url, lines, f"HTTP {resp.status}", pause):
+                            lines.put(CrawlError(url=url, kind=ERROR_HTTP, message=resp.reason or "", status=resp.status))
+                        return
+                    pacer.on_success()
+                    if resp.status == 304 and entry:
+                        lines.put(ResponseStatus(url=url, status=304, reason="Not Modified"))
+                        self._reuse_entry(url, entry, depth, scope, lines)
+                        return
+                    if resp.status >= 400:
+                        lines.put(CrawlError(url=url, kind=ERROR_HTTP, message=resp.reason or "", status=resp.status))
+                        return
+                    content_type = resp.headers.get("Content-Type", "").split(';')[0].strip().lower()
+                    charset = resp.charset or 'utf-8'
+                    etag = resp.headers.get("ETag")
+                    last_modified = resp.headers.get("Last-Modified")
+                    final_url = self.canonicalizer(str(resp.url))
+                    if resp.history:
+                        lines.put(Redirect(url=url, location=final_url, status=resp.history[0].status))
+                    lines.put(ResponseStatus(url=final_url, status=resp.status, reason=resp.reason or ""))
+
+                    # 重定向后的地址同样登记，避免重复抓取（已抓过的不再下载正文）
+                    if final_url != url:
+                        if final_url in self._url_to_path:
+                            self._url_to_path[url] = self._url_to_path[final_url]
+                            return
+                        self._frontier.mark_seen(final_url)
+
+                    # 正文边接收边写盘并计算哈希，只有 HTML/CSS 需要留在内存里解析链接
+                    local_path = self._local_path(final_url, content_type)
+                    size, digest, body, local_path = await self._save_body(
+                        resp, local_path, content_type in CONVERTIBLE_TYPES)
+            except asyncio.TimeoutError:
+                # 超时同样视为过载信号
+                pause = pacer.on_overload()
+                if self._retry(url, lines, "Timeout", pause):
+                    return
+                raise
+
+        self._url_to_path[url] = local_path
+        self._url_to_path[final_url] = local_path
+        self._saved_count += 1
+
+        lines.put(FileSaved(url=final_url, path=local_path, size=size, elapsed=time.monotonic() - start))
+        self._record(size, lines)
+
+        # 只有 HTML/CSS 需要继续解析链接
+        links = None
+        if body is not None:
+            self._convertible[local_path] = charset
+            text = body.decode(charset, errors='replace')
+            links = []
+            for link, is_page in self._extract_links(text, content_type):
+                target = self._resolve(final_url, link)
+                if target:
+                    links.append((target, is_page))
+            self._follow_links(links, depth, scope, lines)
+
+        self._manifest.record(
+            url, os.path.relpath(local_path, self.current_website_dir), size, digest,
+            etag=etag, last_modified=last_modified, content_type=content_type, links=links,
+        )
+
+    def _reuse_entry(self, url: str, entry: dict, depth: int, scope, lines):
+        """304 未修改：沿用本地副本，并按清单中记录的链接继续抓取"""
+        local_path = os.path.join(self.current_website_dir, entry["path"])
+        self._url_to_path[url] = local_path
+        self._saved_count += 1
+        self._manifest.touch(url)
+        lines.put(FileReused(url=url, path=local_path))
+        self._record(0, lines)
+        if entry.get("links"):
+            # 清单可能由规范化规则不同的旧版本写入
+            self._follow_links([(self.canonicalizer(target), is_page) for target, is_page in entry["links"]],
+                               depth, scope, lines)
+
+    def _follow_links(self, links, depth: int, scope, lines):
+        """
+        把范围内的链接（已规范化）加入抓取前沿，robots.txt 禁止的链接被跳过，属于疑似陷阱的新链接被剪除
+        超出深度预算的页面链接不登记为已访问，经由更短的路径发现时仍会抓取
+        """
+        max_depth = self.budget.max_depth
+        for target, is_page in links:
+            if not self._in_scope(target, scope, is_page):
+                continue
+            if self._robots is not None and not self._robots.can_fetch(ROBOTS_USER_AGENT, target):
+                if self._frontier.mark_seen(target):
+                    self._robots_blocked += 1
+                continue
+            if is_page and max_depth and depth >= max_depth:
+                if not self._depth_limited:
+                    self._depth_limited = True
+                    lines.put(LogMessage(text=f"Depth budget: {self._meter.explain(BUDGET_DEPTH)}.\n"))
+                continue
+            if not self._frontier.mark_seen(target):
+                continue
+            rule = self._trap_detector.check(target)
+            if rule is not None:
+                lines.put(UrlPruned(url=target, rule=rule.kind, key=rule.key, reason=rule.description))
+                continue
+            self._frontier.requeue(target, depth + 1)
+            self._wakeup.set()
+
+    def _prune_stale_files(self) -> int:
+        """删除镜像中本次抓取没有再引用到的旧文件"""
+        claimed = set(self._url_to_path.values())
+        removed = 0
+        for root, _, files in os.walk(self.current_website_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                if path not in claimed:
+                    try:
+                        os.remove(path)
+                        removed += 1
+                    except OSError:
+                        pass
+        return removed
+
+    def _extract_links(self, text: str, content_type: str):
+        """提取链接，返回 (url, 是否为页面链接)"""
+        if content_type != "text/css":
+            for m in TAG_LINK_PATTERN.finditer(text):
+                is_page = m.group('tag').lower() == 'a'
+                yield m.group('url'), is_page
+        for m in CSS_URL_PATTERN.finditer(text):
+            yield m.group('url'), False
+
+    def _resolve(self, base_url: str, link: str) -> Optional[str]:
+        """把相对链接解析为绝对地址，过滤非 http 协议"""
+        link = link.strip()
+        if not link or link.startswith(('#', 'javascript:', 'mailto:', 'data:', 'tel:')):
+            return None
+        absolute = urljoin(base_url, link)
+        if urlparse(absolute).scheme not in ('http', 'https'):
+            return None
+        return self.canonicalizer(absolute)
+
+    def _in_scope(self, url: str, scope, is_page: bool) -> bool:
+        """同主机；页面链接还需位于起始目录之下 (等价 wget -np)"""
+        netloc, start_dir = scope
+        parsed = urlparse(url)
+        if parsed.netloc != netloc:
+            return False
+        return not is_page or parsed.path.startswith(start_dir)
+
+    def _local_path(self, url: str, content_type: str) -> str:
+        """
+        按照 wget 的目录布局把 URL 映射为本地路径
+        /foo 与 /foo/bar 需要同名的文件与目录：已保存的文件 foo 移动为 foo/index.html，
+        foo 已经是目录时 /foo 直接保存为 foo/index.html
+        """
+        parsed = urlparse(url)
+        path = unquote(parsed.path)
+        if path.endswith('/'):
+            path += 'index.html'
+        if parsed.query:
+            path += '?' + parsed.query
+        # -E: HTML 页面补全 .html 后缀
+        if content_type in ("text/html", "application/xhtml+xml") and not re.search(r"\.html?$", path, re.IGNORECASE):
+            path += '.html'
+        parts = [p for p in path.split('/') if p not in ('', '.', '..')]
+        for i in range(1, len(parts)):
+            parent = os.path.join(self.current_website_dir, *parts[:i])
+            if os.path.isfile(parent):
+                self._move_into_directory(parent)
+        local_path = os.path.join(self.current_website_dir, *parts)
+        if os.path.isdir(local_path):
+            local_path = os.path.join(local_path, 'index.html')
+        return local_path
+
+    def _move_into_directory(self, path: str):
+        """把文件 path 移动为 path/index.html，并更新指向它的 URL、待改写集合与清单"""
+        moved = os.path.join(path, 'index.html')
+        tmp_path = path + ".move"
+        os.replace(path, tmp_path)
+        os.makedirs(path, exist_ok=True)
+        os.replace(tmp_path, moved)
+        for u, p in self._url_to_path.items():
+            if p == path:
+                self._url_to_path[u] = moved
+        if path in self._convertible:
+            self._convertible[moved] = self._convertible.pop(path)
+        if self._manifest:
+            old_rel = os.path.relpath(path, self.current_website_dir)
+            new_rel = os.path.relpath(moved, self.current_website_dir)
+            for entry in self._manifest.entries.values():
+                if entry.get("path") == old_rel:
+                    entry["path"] = new_rel
+
+    async def _save_body(self, resp: aiohttp.ClientResponse, local_path: str, keep_body: bool):
+        """
+        分块接收正文写入临时文件，同时计算 SHA-256；接收完整后再替换正式文件，
+        中途失败不会留下半截文件，也不会覆盖上一次的镜像副本
+
+        Args:
+            keep_body: 是否同时返回完整正文（HTML/CSS 需要解析链接）
+
+        Returns:
+            (字节数, SHA-256, 正文或 None, 实际保存的路径)
+        """
+        part_path = local_path + ".part"
+        f = await asyncio.to_thread(self._open_part, part_path)
+        digest = hashlib.sha256()
+        size = 0
+        chunks: Optional[List[bytes]] = [] if keep_body else None
+        try:
+            async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                digest.update(chunk)
+                size += len(chunk)
+                if chunks is not None:
+                    chunks.append(chunk)
+                await asyncio.to_thread(f.write, chunk)
+        except BaseException:
+            f.close()
+            os.remove(part_path)
+            raise
+        local_path = await asyncio.to_thread(self._commit_part, f, part_path, local_path)
+        return size, digest.hexdigest(), b"".join(chunks) if chunks is not None else None, local_path
+
+    @staticmethod
+    def _open_part(part_path: str):
+        os.makedirs(os.path.dirname(part_path), exist_ok=True)
+        return open(part_path, 'wb')
+
+    @staticmethod
+    def _commit_part(f, part_path: str, local_path: str) -> str:
+        """替换正式文件；下载期间同名路径已被子 URL 建成目录时保存为其中的 index.html"""
+        f.close()
+        if os.path.isdir(local_path):
+            local_path = os.path.join(local_path, 'index.html')
+        os.replace(part_path, local_path)
+        return local_path
+
+    def _convert_links(self) -> int:
+        """把已下载文件中的链接改写为本地相对路径 (等价 wget -k)"""
+        path_to_url = {}
+        for u, p in self._url_to_path.items():
+            path_to_url.setdefault(p, u)
+
+        converted = 0
+        for local_path, charset in self._convertible.items():
+            page_url = path_to_url.get(local_path)
+            if not page_url:
+                continue
+            page_dir = os.path.dirname(local_path)
+
+            def replace(m):
+                link = m.group('url')
+                target = self._resolve(page_url, link)
+                if not target or target not in self._url_to_path:
+                    return m.group(0)
+                fragment = urlparse(urljoin(page_url, link)).fragment
+                rel = os.path.relpath(self._url_to_path[target], page_dir).replace(os.sep, '/')
+                rel = rel.replace('?', '%3F')
+                if fragment:
+                    rel += '#' + fragment
+                start, end = m.span('url')
+                offset = m.start()
+                whole = m.group(0)
+                return whole[:start - offset] + rel + whole[end - offset:]
+
+            # 按响应的字符集读写，无法解码的字节原样保留
+            try:
+                with open(local_path, 'rb') as f:
+                    data = f.read()
+                try:
+                    text = data.decode(charset, errors='surrogateescape')
+                except (LookupError, UnicodeDecodeError):
+                    charset = 'utf-8'
+                    text = data.decode(charset, errors='surrogateescape')
+                new_text = TAG_LINK_PATTERN.sub(replace, text)
+                new_text = CSS_URL_PATTERN.sub(replace, new_text)
+                if new_text != text:
+                    with open(local_path, 'wb') as f:
+                        f.write(new_text.encode(charset, errors='surrogateescape'))
+                    converted += 1
+            except OSError:
+                continue
+        return converted
+
+    def _classify_error(self, error: BaseException) -> str:
+        """按异常类型归类抓取错误"""
+        if isinstance(error, asyncio.TimeoutError):
+            return ERROR_TIMEOUT
+        if isinstance(error, aiohttp.ClientConnectorError) and isinstance(error.os_error, socket.gaierror):
+            return ERROR_DNS
+        if isinstance(error, (aiohttp.ClientError, ConnectionError)):
+            return ERROR_NETWORK
+        return classify_failure(str(error))
+
+    def stop(self):
+        """强制停止；可恢复时保留已下载内容与断点"""
+        if self._thread and self._thread.is_alive():
+            self._stop_event.set()
+            if self._loop and self._main_task and not self._loop.is_closed():
+                try:
+                    self._loop.call_soon_threadsafe(self._main_task.cancel)
+                except RuntimeError:
+                    pass
+            self._thread.join(timeout=5)
+            self._save_checkpoint()
+            self._abandon()
+
+    def cleanup_partial_files(self):
+        """调用 FileManager 进行安全清理"""
+        if self.current_website_dir:
+            self.fm.clear_temp_folder(self.current_website_dir)
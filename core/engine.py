@@ -1,102 +1,241 @@
 import subprocess
 import os
 import signal
-from typing import Generator, Tuple, Optional
-from urllib.parse import urlparse
+import threading
+import time
+from typing import Generator, List, Optional
 from utils.file_manager import FileManager
+from core.base import DownloadEngine, register_engine
+from core.pacing import OVERLOAD_STATUSES, PacingPolicy, fetch_crawl_delay
+from core.pump import ProcessPump
+from core.frontier import FingerprintSet, fingerprint
+from core.traps import TrapDetector, TrapPolicy
+from core.budget import BUDGET_DURATION, BUDGET_FILES, BudgetMeter, CrawlBudget
+from core.events import (
+    BudgetExhausted, CrawlEvent, FileReused, FileSaved, LogMessage, PhaseChanged, RequestStarted, UrlPruned,
+    WgetEventParser,
+    PHASE_CRAWLING, PHASE_FAILED, PHASE_FINISHED,
+)
 
-class WgetEngine:
+@register_engine("wget")
+class WgetEngine(DownloadEngine):
     """
     核心下载引擎 (更新版)
     集成 FileManager 进行路径管理和清理
     """
+
+    binary = "wget"
     
-    def __init__(self, file_manager: FileManager):
+    def __init__(self, file_manager: FileManager, incremental: bool = True, resumable: bool = True,
+                 job_id: Optional[str] = None, pacing: Optional[PacingPolicy] = None,
+                 traps: Optional[TrapPolicy] = None, budget: Optional[CrawlBudget] = None,
+                 checkpoint_key: Optional[str] = None):
         """
         Args:
             file_manager: 初始化的 FileManager 实例
+            incremental: 是否基于上一次镜像做增量下载
+            resumable: 失败或停止时是否保留已下载内容，供下一次任务继续
+            job_id: 任务 ID，指定时在独立的工作目录中下载
+            pacing: 请求节奏；wget 只有一个连接，速率换算为 --wait 的请求间隔
+            traps: 爬虫陷阱的识别阈值；触发的规则通过 --reject-regex 交给 wget
+            budget: 任务预算；深度与字节数换算为 --level / --quota，文件数与时长用完时终止 wget
+            checkpoint_key: 断点的键（任务键）
         """
-        self.fm = file_manager
-        self.paths = self.fm.get_paths()
-        self.base_dir = self.paths['temp']
-        
+        super().__init__(file_manager, incremental, resumable, job_id, pacing, traps, budget, checkpoint_key)
         self.process: Optional[subprocess.Popen] = None
-        self.current_website_dir: Optional[str] = None
-
-    def _get_domain_from_url(self, url: str) -> str:
-        """从 URL 解析域名"""
-        parsed = urlparse(url)
-        domain = parsed.netloc or parsed.path.split('/')[0]
-        return domain.split(':')[0]
+        # robots.txt 中的 Crawl-delay / Request-rate 换算出的请求间隔（秒），启动前读取
+        self.crawl_delay: Optional[float] = None
 
-    def download(self, url: str) -> Generator[Tuple[str, Optional[str]], None, None]:
+    def _pacing_options(self) -> List[str]:
         """
-        执行 wget 下载
-        Yields: (log_line, completed_folder_path)
+        请求节奏对应的 wget 参数：
+        --wait 为请求间隔（显式设置的速率上限与 Crawl-delay 中较慢的一个，都没有时不等待），
+        --random-wait 在 0.5~1.5 倍之间随机化；
+        429/503 按 --waitretry 线性退避后重试
         """
-        
-        # 1. 确定目标路径
-        domain = self._get_domain_from_url(url)
-        self.current_website_dir = os.path.join(self.base_dir, domain)
+        wait = max(self.pacing.request_interval, self.crawl_delay or 0.0)
+        options = []
+        if wait > 0:
+            options += [f"--wait={wait:g}", "--random-wait"]
+        return options + [
+            f"--retry-on-http-error={','.join(str(s) for s in OVERLOAD_STATUSES)}",
+            f"--tries={self.pacing.max_retries + 1}",
+            f"--waitretry={min(60, int(self.pacing.max_backoff))}",
+        ]
 
-        # 2. 清理旧数据 (使用 FileManager 的安全清理)
-        if os.path.exists(self.current_website_dir):
-            yield f"[Engine] Cleaning old directory: {domain}...\n", None
-            self.fm.clear_temp_folder(self.current_website_dir)
+    def _budget_options(self) -> List[str]:
+        """
+        预算对应的 wget 参数（放在 -m 之后，覆盖其隐含的 -l inf）：
+        --quota 用完后 wget 自己结束下载，仍会改写链接
+        """
+        options = []
+        if self.budget.max_depth:
+            options.append(f"--level={self.budget.max_depth}")
+        if self.budget.max_bytes:
+            options.append(f"--quota={self.budget.max_bytes}")
+        return options
 
-        # 3. 构建 wget 命令
+    def _build_command(self, url: str, reject_regex: Optional[str] = None) -> List[str]:
+        """
+        构建下载命令
+        -m 隐含 -N：对已存在的本地文件发送 If-Modified-Since，未变化的资源不会重新下载
+        """
         cmd = [
-            "wget",
+            self.binary,
             "-m", "-k", "-E", "-p", "-np",
-            "--no-if-modified-since",
+        ]
+        if not self.incremental:
+            cmd.append("--no-if-modified-since")
+        if reject_regex:
+            cmd.append(f"--reject-regex={reject_regex}")
+        return cmd + self._budget_options() + self._pacing_options() + [
             "-P", self.base_dir,  # 使用 FileManager 提供的统一临时目录
             url
         ]
 
-        yield f"[Engine] Starting download for: {domain}\n", None
-        yield f"[Engine] Command: {' '.join(cmd)}\n", None
+    def events(self, url: str) -> Generator[CrawlEvent, None, None]:
+        """
+        执行 wget 下载，stderr 逐行解析为结构化事件
+        Yields: CrawlEvent
+        """
+        
+        # 1. 确定目标路径
+        domain = self._get_domain_from_url(url)
+        self.current_website_dir = os.path.join(self.base_dir, domain)
+
+        # 2. 清理旧数据 (使用 FileManager 的安全清理)，增量模式下复用上次镜像；有断点时直接续传
+        yield from self._prepare_website_dir(domain, url)
+        if self.resumable:
+            # wget 的抓取状态就是磁盘上的文件：记录目录即可，-N 会跳过已完成的文件
+            self._checkpoint.save(self.name, self.current_website_dir)
+
+        # 3. 构建 wget 命令（wget 自己遵守 robots.txt 的禁止规则，但不支持 Crawl-delay / Request-rate）
+        if self.pacing.respect_crawl_delay:
+            self.crawl_delay = fetch_crawl_delay(url, user_agent=self.binary)
+            if self.crawl_delay:
+                yield LogMessage(text=f"[Engine] robots.txt asks for {self.crawl_delay:g}s between requests\n")
+        yield PhaseChanged(phase=PHASE_CRAWLING, message=f"[Engine] Starting download for: {domain}\n")
+        parser = WgetEventParser()
+        traps = TrapDetector(self.traps)
+        # 已计数的请求与已计入预算的文件（-N 重启后 wget 会重新请求已完成的文件，不能重复计数）
+        requested = FingerprintSet()
+        counted = FingerprintSet()
+        restarts = 0
+        meter = BudgetMeter(self.budget)
+        # 已用完的预算种类；文件数与时长由这里终止 wget，字节数由 --quota 让 wget 自己结束
+        exhausted: Optional[str] = None
+        terminated = False
+        timer: Optional[threading.Timer] = None
 
         try:
-            # 4. 启动进程
-            self.process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                encoding='utf-8',
-                errors='replace'
-            )
-
-            # 5. 实时流式输出
             while True:
-                line = self.process.stderr.readline()
-                if line:
-                    yield line, None
-                
-                if self.process.poll() is not None:
-                    remaining = self.process.stderr.read()
-                    if remaining:
-                        yield remaining, None
+                # 4. 启动进程（二进制管道，由 ProcessPump 同时排空 stdout 与 stderr）
+                cmd = self._build_command(url, traps.reject_regex())
+                yield LogMessage(text=f"[Engine] Command: {' '.join(cmd)}\n")
+                process = self.process = subprocess.Popen(
+                    cmd,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    bufsize=0,
+                )
+                if meter.deadline is not None:
+                    timer = threading.Timer(max(0.0, meter.deadline - time.monotonic()), process.terminate)
+                    timer.daemon = True
+                    timer.start()
+
+                # 5. 实时流式输出：整块读取、按整行解析；新触发的陷阱规则需要重启 wget 才能生效
+                tripped = restart = False
+                pruned_urls = set()
+                # 正在写入的文件（"Saving to:" 之后、保存完成之前），被终止时是不完整的
+                saving: Optional[str] = None
+                for stream, text in ProcessPump(process):
+                    if stream != "stderr":
+                        yield LogMessage(text=text)
+                        continue
+                    for event in parser.parse_chunk(text):
+                        if isinstance(event, RequestStarted) and tripped and not restart:
+                            # 在下一个请求开始时终止：触发规则的页面已经结束（保存的文件在下面被删除），
+                            # 被打断的文件大小不符，重启后 -N 会重新下载
+                            restart = True
+                            process.terminate()
+                        if isinstance(event, RequestStarted) and event.url and requested.add(fingerprint(event.url)):
+                            rule = traps.check(event.url)
+                            if rule is not None:
+                                pruned_urls.add(event.url)
+                                yield UrlPruned(url=event.url, rule=rule.kind, key=rule.key, reason=rule.description)
+                                if rule.regex and rule.pruned == 1 and restarts < self.traps.max_restarts:
+                                    tripped = True
+                        elif isinstance(event, FileSaved) and event.url in pruned_urls:
+                            # 规则生效前 wget 已经下载的陷阱页面：删除，不计入结果
+                            try:
+                                os.remove(event.path)
+                            except OSError:
+                                pass
+                            continue
+                        if isinstance(event, LogMessage) and event.text.startswith("Saving to: ‘"):
+                            saving = event.text.strip()[len("Saving to: ‘"):-1]
+                        elif isinstance(event, (FileSaved, FileReused)):
+                            saving = None
+                            if event.url is None or counted.add(fingerprint(event.url)):
+                                meter.record(event.size if isinstance(event, FileSaved) else 0)
+                            kind = meter.exhausted()
+                            if kind and kind != exhausted:
+                                exhausted = kind
+                                yield event
+                                yield BudgetExhausted(budget=kind, message=meter.explain(kind))
+                                if kind == BUDGET_FILES:
+                                    process.terminate()
+                                continue
+                        yield event
+                return_code = process.wait()
+                if timer is not None:
+                    timer.cancel()
+                    if exhausted is None and meter.exhausted() == BUDGET_DURATION:
+                        exhausted = BUDGET_DURATION
+                        yield BudgetExhausted(budget=exhausted, message=meter.explain(exhausted))
+                terminated = exhausted in (BUDGET_FILES, BUDGET_DURATION)
+                if terminated and saving:
+                    # 被终止时正在下载的文件不完整，不计入结果
+                    try:
+                        os.remove(saving)
+                    except OSError:
+                        pass
+                if not restart or self.process is None or terminated:
                     break
+                restarts += 1
+                yield LogMessage(text=f"[Engine] Restarting wget to prune {len(traps.rules)} suspected crawler trap(s)\n")
 
             # 6. 处理结果
-            return_code = self.process.poll()
-            
+            for line in traps.summary():
+                yield LogMessage(text=f"[Engine] Trap pruned - {line}\n")
+
             if return_code == 0 and os.path.exists(self.current_website_dir):
-                yield f"\n[Engine] Download completed successfully.\n", self.current_website_dir
+                self._finish()
+                yield PhaseChanged(phase=PHASE_FINISHED, message="\n[Engine] Download completed successfully.\n",
+                                   folder=self.current_website_dir)
+            elif exhausted and self.process is not None and os.path.exists(self.current_website_dir):
+                # 预算用完：已下载的文件照常打包（wget 被终止时来不及改写链接）
+                self._finish()
+                note = " (links not converted)" if terminated else ""
+                yield PhaseChanged(phase=PHASE_FINISHED,
+                                   message=f"\n[Engine] Crawl budget reached, partial download completed{note}.\n",
+                                   folder=self.current_website_dir)
             else:
-                yield f"\n[Engine] Error: Process exited with code {return_code}.\n", None
-                self.cleanup_partial_files()
+                yield PhaseChanged(phase=PHASE_FAILED, message=f"\n[Engine] Error: Process exited with code {return_code}.\n")
+                self._abandon()
 
         except Exception as e:
-            yield f"\n[Engine] Critical Exception: {str(e)}\n", None
-            self.cleanup_partial_files()
+            yield PhaseChanged(phase=PHASE_FAILED, message=f"\n[Engine] Critical Exception: {str(e)}\n")
+            self._abandon()
         finally:
+            # 消费方提前关闭生成器（如 UI 取消任务）时同样终止 wget 进程
+            if timer is not None:
+                timer.cancel()
+            self.stop()
             self.process = None
 
     def stop(self):
-        """强制停止并清理"""
+        """强制停止；可恢复时保留已下载内容"""
         if self.process and self.process.poll() is None:
             try:
                 self.process.terminate()
@@ -105,9 +244,57 @@ class WgetEngine:
                 self.process.kill()
             finally:
                 self.process = None
-                self.cleanup_partial_files()
+                self._abandon()
 
     def cleanup_partial_files(self):
         """调用 FileManager 进行安全清理"""
         if self.current_website_dir:
-            self.fm.clear_temp_folder(self.current_website_dir)
\ No newline at end of file
+            self.fm.clear_temp_folder(self.current_website_dir)
+
+
+@register_engine("wget2")
+class Wget2Engine(WgetEngine):
+    """
+    wget2 后端
+    多线程下载并支持 HTTP/2，命令行与 wget 基本兼容
+    """
+
+    binary = "wget2"
+
+    def __init__(self, file_manager: FileManager, incremental: bool = True, resumable: bool = True,
+                 job_id: Optional[str] = None, pacing: Optional[PacingPolicy] = None,
+                 traps: Optional[TrapPolicy] = None, budget: Optional[CrawlBudget] = None,
+                 checkpoint_key: Optional[str] = None, max_threads: int = 8):
+        """
+        Args:
+            file_manager: 初始化的 FileManager 实例
+            incremental: 是否基于上一次镜像做增量下载
+            resumable: 失败或停止时是否保留已下载内容，供下一次任务继续
+            job_id: 任务 ID，指定时在独立的工作目录中下载
+            pacing: 请求节奏；线程数不超过每主机并发上限
+            traps: 爬虫陷阱的识别阈值
+            budget: 任务预算
+            checkpoint_key: 断点的键（任务键）
+            max_threads: wget2 的并发下载线程数
+        """
+        super().__init__(file_manager, incremental, resumable, job_id, pacing, traps, budget, checkpoint_key)
+        self.max_threads = max(1, min(max_threads, self.pacing.max_concurrency))
+
+    def _build_command(self, url: str, reject_regex: Optional[str] = None) -> List[str]:
+        cmd = [
+            self.binary,
+            "-m", "-k", "-E", "-p", "-np",
+        ]
+        if not self.incremental:
+            cmd.append("--no-if-modified-since")
+        if reject_regex:
+            cmd.append(f"--reject-regex={reject_regex}")
+        # 有 Crawl-delay 时逐个请求
+        threads = 1 if self.crawl_delay else self.max_threads
+        return cmd + self._budget_options() + self._pacing_options() + [
+            f"--max-threads={threads}",
+            "--http2",
+            "--progress=none",
+            "-P", self.base_dir,
+            url
+        ]
@@ -0,0 +1,416 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Tuple
+
+from utils.file_manager import FileManager
+from core.worker import crawl_and_package, run_in_process
+
+logger = logging.getLogger("Fleet")
+
+# 任务状态：排队 -> 运行 -> 完成 / 失败 / 取消
+FINAL_STATES = ("done", "failed", "cancelled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    params TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 1,
+    state TEXT NOT NULL DEFAULT 'queued',
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    followers INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    created_at REAL NOT NULL,
+    claimed_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (state, priority, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs (key, state);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_job ON events (job_id, id);
+CREATE TABLE IF NOT EXISTS stream_holders (
+    job_id TEXT NOT NULL,
+    node TEXT NOT NULL,
+    PRIMARY KEY (job_id, node)
+);
+"""
+
+
+class SQLiteJobQueue:
+    """
+    多节点共享的任务队列（SQLite，放在各节点共同挂载的 storage 目录中）
+    UI 节点写入任务并轮询进度事件，worker 节点认领任务、发送心跳、写入进度与结果；
+    所有状态都在数据库中，任何 UI 节点都可以跟踪任何任务
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: 数据库文件路径
+        """
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # 每次操作使用独立连接，可在任意线程中调用
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> dict:
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    # --- UI 节点 ---
+
+    def enqueue(self, key: str, params: dict, priority: int = 1) -> Tuple[str, bool]:
+        """
+        写入任务；相同键的任务仍在排队或运行时直接返回它（跨节点请求合并）
+
+        Returns:
+            Tuple[str, bool]: (任务 ID, 是否为新创建)
+        """
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE key = ? AND state IN ('queued', 'running') AND cancel_requested = 0",
+                (key,),
+            ).fetchone()
+            if row:
+                return row["id"], False
+            job_id = uuid.uuid4().hex[:12]
+            conn.execute(
+                "INSERT INTO jobs (id, key, params, priority, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, key, json.dumps(params), priority, time.time()),
+            )
+            return job_id, True
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def position(self, job_id: str) -> int:
+        """排队中的任务前面还有多少个任务（从 1 开始），不在排队时返回 0"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT priority, created_at FROM jobs WHERE id = ? AND state = 'queued'", (job_id,)
+            ).fetchone()
+            if row is None:
+                return 0
+            ahead = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE state = 'queued' AND cancel_requested = 0 "
+                "AND (priority < ? OR (priority = ? AND created_at < ?))",
+                (row["priority"], row["priority"], row["created_at"]),
+            ).fetchone()[0]
+        return ahead + 1
+
+    def attach(self, job_id: str):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET followers = followers + 1 WHERE id = ?", (job_id,))
+
+    def detach(self, job_id: str):
+        """跟踪者离开；没有跟踪者的任务被取消（排队中的直接取消，运行中的由 worker 停止）"""
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET followers = MAX(followers - 1, 0) WHERE id = ?", (job_id,))
+            conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND followers = 0 AND state IN ('queued', 'running')",
+                (job_id,),
+            )
+            conn.execute(
+                "UPDATE jobs SET state = 'cancelled', finished_at = ? WHERE id = ? AND state = 'queued' AND cancel_requested = 1",
+                (time.time(), job_id),
+            )
+
+    def hold_stream(self, job_id: str, node: str):
+        """UI 节点为任务的站点目录提供流式下载（同一节点重复登记只记一次）"""
+        with self._connect() as conn:
+            conn.execute("INSERT OR IGNORE INTO stream_holders (job_id, node) VALUES (?, ?)", (job_id, node))
+
+    def release_stream(self, job_id: str, node: str) -> bool:
+        """UI 节点的下载链接过期；返回是否已没有节点在提供该目录（由最后一个节点回收目录）"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM stream_holders WHERE job_id = ? AND node = ?", (job_id, node))
+            remaining = conn.execute("SELECT COUNT(*) FROM stream_holders WHERE job_id = ?", (job_id,)).fetchone()[0]
+        return remaining == 0
+
+    def events_since(self, job_id: str, after_id: int = 0) -> List[Tuple[int, tuple]]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, payload FROM events WHERE job_id = ? AND id > ? ORDER BY id", (job_id, after_id)
+            ).fetchall()
+        return [(row["id"], tuple(json.loads(row["payload"]))) for row in rows]
+
+    # --- worker 节点 ---
+
+    def claim(self, worker_id: str) -> Optional[dict]:
+        """按优先级认领一个排队中的任务"""
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE state = 'queued' AND cancel_requested = 0 "
+                "ORDER BY priority, created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET state = 'running', worker = ?, attempts = attempts + 1, "
+                "claimed_at = ?, heartbeat_at = ? WHERE id = ?",
+                (worker_id, now, now, row["id"]),
+            )
+            job = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+        return self._to_dict(job)
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """刷新心跳；任务已被取消或被其他 worker 接管时返回 False"""
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker = ? AND state = 'running' "
+                "AND cancel_requested = 0",
+                (time.time(), job_id, worker_id),
+            ).rowcount
+        return updated == 1
+
+    def append_events(self, job_id: str, payloads: List[tuple]):
+        if not payloads:
+            return
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO events (job_id, payload) VALUES (?, ?)",
+                [(job_id, json.dumps(payload)) for payload in payloads],
+            )
+
+    def complete(self, job_id: str, worker_id: str, state: str, result: Optional[dict] = None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = ?, result = ?, finished_at = ? WHERE id = ? AND worker = ?",
+                (state, json.dumps(result) if result is not None else None, time.time(), job_id, worker_id),
+            )
+
+    # --- 维护 ---
+
+    def requeue_stale(self, timeout_seconds: float, max_attempts: int = 3) -> int:
+        """
+        心跳超时的任务（worker 崩溃或断网）重新排队，超过重试次数则标记为失败；
+        重新认领的任务会从断点继续
+
+        Returns:
+            int: 重新排队的任务数量
+        """
+        deadline = time.time() - timeout_seconds
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = 'failed', finished_at = ? WHERE state = 'running' AND heartbeat_at < ? "
+                "AND (attempts >= ? OR cancel_requested = 1)",
+                (time.time(), deadline, max_attempts),
+            )
+            return conn.execute(
+                "UPDATE jobs SET state = 'queued', worker = NULL WHERE state = 'running' AND heartbeat_at < ?",
+                (deadline,),
+            ).rowcount
+
+    def purge(self, max_age_hours: int = 24):
+        """删除已结束任务及其进度事件"""
+        deadline = time.time() - max_age_hours * 3600
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM events WHERE job_id IN (SELECT id FROM jobs WHERE state IN ('done', 'failed', 'cancelled') "
+                "AND finished_at < ?)",
+                (deadline,),
+            )
+            conn.execute(
+                "DELETE FROM stream_holders WHERE job_id IN (SELECT id FROM jobs WHERE state IN ('done', 'failed', "
+                "'cancelled') AND finished_at < ?)",
+                (deadline,),
+            )
+            conn.execute(
+                "DELETE FROM jobs WHERE state IN ('done', 'failed', 'cancelled') AND finished_at < ?", (deadline,)
+            )
+
+
+class FleetWorker:
+    """
+    无状态的 worker 节点
+    从共享队列认领任务，在 worker 进程中下载并打包，批量写入进度事件，
+    归档发布到共享的 storage/output_zips；节点随时可以增加或下线
+    """
+
+    def __init__(self, job_queue: SQLiteJobQueue, settings: dict, workers: int = 1,
+                 heartbeat_interval: float = 10.0, stale_timeout: float = 60.0, poll_interval: float = 2.0,
+                 flush_interval: float = 0.5, resource_check: Optional[Callable[[], Optional[str]]] = None,
+                 node_id: Optional[str] = None):
+        """
+        Args:
+            job_queue: 共享任务队列
+            settings: 传给 crawl_and_package 的打包设置
+            workers: 本节点同时运行的任务数量
+            heartbeat_interval: 心跳间隔（秒）
+            stale_timeout: 心跳超过该时间未更新的任务被重新排队（秒）
+            poll_interval: 队列为空时的轮询间隔（秒）
+            flush_interval: 进度事件批量写入的间隔（秒）
+            resource_check: 认领前的准入检查，资源不足时返回原因
+            node_id: 节点标识，默认 "<主机名>-<pid>"
+        """
+        self.queue = job_queue
+        self.settings = settings
+        self.workers = max(1, workers)
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_timeout = stale_timeout
+        self.poll_interval = poll_interval
+        self.flush_interval = flush_interval
+        self.resource_check = resource_check
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self._stop = threading.Event()
+
+    def run_forever(self):
+        threads = [
+            threading.Thread(target=self._loop, args=(f"{self.node_id}-{i}",), name=f"fleet-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for t in threads:
+            t.start()
+        logger.info(f"Worker node {self.node_id} started with {self.workers} slots")
+        try:
+            while not self._stop.wait(self.heartbeat_interval):
+                requeued = self.queue.requeue_stale(self.stale_timeout)
+                if requeued:
+                    logger.warning(f"Requeued {requeued} jobs with expired heartbeats")
+        finally:
+            self._stop.set()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self, worker_id: str):
+        while not self._stop.is_set():
+            reason = self.resource_check() if self.resource_check else None
+            if reason:
+                logger.warning(f"[{worker_id}] Not claiming jobs: {reason}")
+                self._stop.wait(self.poll_interval * 5)
+                continue
+            try:
+                job = self.queue.claim(worker_id)
+            except sqlite3.Error as e:
+                logger.error(f"[{worker_id}] Failed to claim job: {e}")
+                job = None
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            self._run_job(job, worker_id)
+
+    def _run_job(self, job: dict, worker_id: str):
+        job_id = job["id"]
+        params = job["params"]
+        logger.info(f"[{worker_id}] Running job {job_id}: {params['url']}")
+
+        fm = FileManager()
+        fm.create_job_workspace(job_id)
+        done = threading.Event()
+        cancelled = threading.Event()
+
+        def keep_alive():
+            while not done.wait(self.heartbeat_interval):
+                if not self.queue.heartbeat(job_id, worker_id):
+                    cancelled.set()
+                    return
+
+        threading.Thread(target=keep_alive, name=f"heartbeat-{job_id}", daemon=True).start()
+
+        # 完整日志写入共享的 storage/logs，任何 UI 节点都可以提供下载
+        log_file = open(os.path.join(fm.get_paths()['log'], f"{job_id}.log"), 'a', encoding='utf-8')
+        result = None
+        pending: List[tuple] = []
+        last_flush = time.time()
+        last_status = None
+        # 子进程长时间没有产出（下载大文件、等待限速）时也定期醒来，及时响应取消
+        updates = run_in_process(crawl_and_package, job_id, params["url"], params["engine"],
+                                 params["format"], params["stream"], self.settings, params.get("budget"),
+                                 idle_timeout=self.flush_interval)
+        try:
+            for message in updates:
+                if message is None:
+                    if cancelled.is_set():
+                        break
+                    if pending:
+                        self.queue.append_events(job_id, pending)
+                        pending = []
+                        last_flush = time.time()
+                    continue
+                if message[0] == "result":
+                    result = message[1]
+                    continue
+                pending.append(message[1:])
+                log_file.write(message[1])
+                # 状态变化（如进入压缩阶段）立即写入，其余按间隔批量写入
+                status = message[4]
+                if status != last_status or time.time() - last_flush >= self.flush_interval:
+                    self.queue.append_events(job_id, pending)
+                    pending = []
+                    last_flush = time.time()
+                    last_status = status
+                if cancelled.is_set():
+                    break
+        except Exception as e:
+            logger.error(f"[{worker_id}] Job {job_id} crashed: {e}")
+        finally:
+            updates.close()
+            log_file.close()
+            done.set()
+            try:
+                self.queue.append_events(job_id, pending)
+            except sqlite3.Error:
+                pass
+
+        keep_for_stream = False
+        if cancelled.is_set():
+            state = "cancelled"
+        elif result and result["archive"]:
+            state = "done"
+            if result["incremental"]:
+                fm.retain_mirror(result["folder"])
+            else:
+                fm.clear_temp_folder(result["folder"])
+        elif result and result["folder"] and params["stream"]:
+            # 流式模式：站点目录留在共享存储中，由提供下载链接的 UI 节点在过期后回收
+            state = "done"
+            keep_for_stream = True
+        else:
+            state = "failed"
+        fm.release_job(job_id, keep_files=keep_for_stream or (result["keep_files"] if result else True))
+        self.queue.complete(job_id, worker_id, state, result)
+        logger.info(f"[{worker_id}] Job {job_id} finished: {state}")
@@ -0,0 +1,367 @@
+import fnmatch
+import hashlib
+import heapq
+import math
+import mmap
+import os
+import shutil
+from array import array
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+# 默认丢弃的查询参数：统计追踪与会话 ID，它们让同一页面出现无数个 URL
+DEFAULT_PARAM_BLACKLIST = (
+    "utm_*", "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "_ga", "_gl",
+    "sessionid", "session_id", "sid", "phpsessid", "jsessionid", "aspsessionid*", "cfid", "cftoken",
+)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+class UrlCanonicalizer:
+    """
+    URL 规范化
+    协议与主机名小写、去掉默认端口与片段、空路径补 "/"、去掉路径中的 ;jsessionid=...，
+    丢弃黑名单中的查询参数并按参数排序（不重新编码，原样保留每个参数）
+    """
+
+    def __init__(self, param_blacklist: Optional[Iterable[str]] = None, sort_query: bool = True):
+        """
+        Args:
+            param_blacklist: 丢弃的查询参数名（不区分大小写，支持 * 通配），默认 DEFAULT_PARAM_BLACKLIST
+            sort_query: 是否按参数排序，使参数顺序不同的 URL 视为同一个
+        """
+        patterns = DEFAULT_PARAM_BLACKLIST if param_blacklist is None else param_blacklist
+        patterns = [p.strip().lower() for p in patterns if p.strip()]
+        self._exact = {p for p in patterns if not any(c in p for c in "*?[")}
+        self._wildcards = [p for p in patterns if p not in self._exact]
+        self.sort_query = sort_query
+        self._netlocs: Dict[Tuple[str, str], str] = {}
+
+    def _blacklisted(self, name: str) -> bool:
+        name = unquote(name).lower()
+        return name in self._exact or any(fnmatch.fnmatchcase(name, p) for p in self._wildcards)
+
+    def _netloc(self, scheme: str, netloc: str) -> str:
+        """主机名小写并去掉默认端口（按 netloc 缓存，同一站点只计算一次）"""
+        key = (scheme, netloc)
+        cached = self._netlocs.get(key)
+        if cached is None:
+            parsed = urlsplit(f"{scheme}://{netloc}")
+            host = (parsed.hostname or "").lower()
+            if ':' in host:
+                host = f"[{host}]"
+            try:
+                port = parsed.port
+            except ValueError:
+                port = None
+            cached = host if port is None or port == DEFAULT_PORTS.get(scheme) else f"{host}:{port}"
+            if parsed.username is not None:
+                credentials = parsed.username + (f":{parsed.password}" if parsed.password is not None else "")
+                cached = f"{credentials}@{cached}"
+            if len(self._netlocs) >= 10000:
+                self._netlocs.clear()
+            self._netlocs[key] = cached
+        return cached
+
+    def __call__(self, url: str) -> str:
+        scheme, netloc, path, query, _ = urlsplit(url)
+        scheme = scheme.lower()
+        netloc = self._netloc(scheme, netloc)
+
+        if not path:
+            path = '/'
+        elif ';' in path and 'jsessionid=' in path.lower():
+            path = '/'.join(s.split(';', 1)[0] if ';jsessionid=' in s.lower() else s for s in path.split('/'))
+
+        if query:
+            pairs = [p for p in query.split('&') if p and not self._blacklisted(p.split('=', 1)[0])]
+            if self.sort_query:
+                pairs.sort()
+            query = '&'.join(pairs)
+        return f"{scheme}://{netloc}{path}?{query}" if query else f"{scheme}://{netloc}{path}"
+
+
+def fingerprint(url: str) -> int:
+    """URL 的 64 位指纹"""
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class BloomFilter:
+    """布隆过滤器：没有假阴性，用于在查找磁盘上的指纹之前快速排除"""
+
+    def __init__(self, capacity: int, bits_per_item: int = 10):
+        self.size = max(64, capacity * bits_per_item)
+        self.hashes = max(1, round(bits_per_item * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, fp: int) -> Iterator[int]:
+        # 双重哈希：由 64 位指纹的高低两半派生 k 个位置
+        h1, h2 = fp & 0xFFFFFFFF, (fp >> 32) | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, fp: int):
+        for pos in self._positions(fp):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, fp: int) -> bool:
+        # 逐位检查，遇到 0 立即返回（新 URL 通常在第一、二位就被排除）
+        bits = self._bits
+        for pos in self._positions(fp):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+
+class FingerprintSet:
+    """
+    紧凑的已访问集合
+    存 64 位指纹而不是 URL 字符串（每个约 8 字节，Python set 中的 URL 字符串通常超过 100 字节）：
+    新指纹先进入小缓冲，满了排序成 array('Q') 有序段，相近大小的段两两归并；
+    内存中的指纹超过上限时把最大的段写到磁盘并 mmap 查找，可选为每个磁盘段配一个布隆过滤器，
+    新 URL（绝大多数查找）不需要触碰磁盘页
+    """
+
+    BUFFER_SIZE = 65536
+
+    def __init__(self, memory_limit: int = 2_000_000, spill_dir: Optional[str] = None, bloom: bool = True):
+        """
+        Args:
+            memory_limit: 内存中保留的指纹数量上限，超过后写入磁盘（spill_dir 为空时不限制）
+            spill_dir: 磁盘段的存放目录
+            bloom: 是否为磁盘段建立布隆过滤器
+        """
+        self.memory_limit = memory_limit
+        self.spill_dir = spill_dir
+        self.bloom = bloom
+        self._buffer: set = set()
+        self._runs: List[array] = []
+        self._disk_runs: List[Tuple[str, mmap.mmap, memoryview, Optional[BloomFilter]]] = []
+        self._count = 0
+        # track_new() 之后新加入的指纹，由 take_new() 取走（断点只追加增量）
+        self._new: Optional[array] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    @staticmethod
+    def _in_run(run, fp: int) -> bool:
+        i = bisect_left(run, fp)
+        return i < len(run) and run[i] == fp
+
+    def __contains__(self, fp: int) -> bool:
+        if fp in self._buffer:
+            return True
+        for run in self._runs:
+            if self._in_run(run, fp):
+                return True
+        for _, _, view, bloom in self._disk_runs:
+            if (bloom is None or fp in bloom) and self._in_run(view, fp):
+                return True
+        return False
+
+    def add(self, fp: int) -> bool:
+        """加入指纹，返回是否为新指纹"""
+        if fp in self:
+            return False
+        self._buffer.add(fp)
+        self._count += 1
+        if self._new is not None:
+            self._new.append(fp)
+        if len(self._buffer) >= self.BUFFER_SIZE:
+            self._flush_buffer()
+        return True
+
+    def _flush_buffer(self):
+        self._runs.append(array('Q', sorted(self._buffer)))
+        self._buffer = set()
+        # 像二进制计数器一样归并，段数保持在 O(log n)
+        while len(self._runs) >= 2 and len(self._runs[-1]) >= len(self._runs[-2]):
+            newer, older = self._runs.pop(), self._runs.pop()
+            self._runs.append(array('Q', heapq.merge(older, newer)))
+        if self.spill_dir and sum(len(r) for r in self._runs) > self.memory_limit:
+            self._spill(self._runs.pop(0))
+
+    def _spill(self, run: array):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = os.path.join(self.spill_dir, f"visited-{len(self._disk_runs)}.bin")
+        with open(path, 'wb') as f:
+            run.tofile(f)
+        bloom = None
+        if self.bloom:
+            bloom = BloomFilter(len(run))
+            for fp in run:
+                bloom.add(fp)
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._disk_runs.append((path, mm, memoryview(mm).cast('Q'), bloom))
+
+    def track_new(self):
+        """开始记录新加入的指纹"""
+        self._new = array('Q')
+
+    def take_new(self) -> bytes:
+        """取走上次调用以来新加入的指纹（断点追加到指纹文件末尾，不必每次复制整个集合）"""
+        if self._new is None:
+            return b""
+        data = self._new.tobytes()
+        self._new = array('Q')
+        return data
+
+    def update_from_bytes(self, data: bytes) -> int:
+        """加入 take_new() 产生的指纹（断点的指纹文件），返回读取的数量"""
+        loaded = array('Q')
+        loaded.frombytes(data[:len(data) - len(data) % loaded.itemsize])
+        for fp in loaded:
+            self.add(fp)
+        return len(loaded)
+
+    def close(self):
+        for path, mm, view, _ in self._disk_runs:
+            view.release()
+            mm.close()
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._disk_runs = []
+
+
+class Frontier:
+    """
+    抓取前沿：规范化 + 去重 + 先进先出的待抓取队列
+    队列中每项为 (url, depth)，depth 为从起始页开始的链接深度；
+    内存中的队列超过 memory_urls 时，新 URL 追加到磁盘文件，内存队列取空后再按顺序读回
+    """
+
+    def __init__(self, canonicalizer: Optional[UrlCanonicalizer] = None, memory_urls: int = 100_000,
+                 visited_memory: int = 2_000_000, spill_dir: Optional[str] = None, bloom: bool = True,
+                 pending_path: Optional[str] = None):
+        """
+        Args:
+            canonicalizer: URL 规范化规则，默认 UrlCanonicalizer()
+            memory_urls: 内存中待抓取 URL 的上限（spill_dir 为空时不限制）
+            visited_memory: 内存中已访问指纹的上限
+            spill_dir: 溢出文件目录（任务工作目录下），None 表示全部在内存
+            bloom: 磁盘上的指纹段是否使用布隆过滤器
+            pending_path: 待抓取 URL 的溢出文件，默认为 spill_dir 下的 pending.txt；
+                          指定时该文件由断点按偏移引用，取空后与 close() 时都保留
+        """
+        self.canonicalize = canonicalizer or UrlCanonicalizer()
+        self.memory_urls = memory_urls
+        self.spill_dir = spill_dir
+        self.visited = FingerprintSet(visited_memory, os.path.join(spill_dir, "visited") if spill_dir else None, bloom)
+        self._queue: deque = deque()
+        self._spill_path = pending_path or (os.path.join(spill_dir, "pending.txt") if spill_dir else None)
+        self._keep_spill = pending_path is not None
+        self._spill_file = None
+        self._spill_offset = 0
+        self._spilled = 0
+
+    def __len__(self) -> int:
+        return len(self._queue) + self._spilled
+
+    def seen(self, url: str) -> bool:
+        """url 必须已经规范化"""
+        return fingerprint(url) in self.visited
+
+    def mark_seen(self, url: str) -> bool:
+        """登记为已访问但不排队（如重定向的目标），返回是否为新 URL；url 必须已经规范化"""
+        return self.visited.add(fingerprint(url))
+
+    def add(self, url: str, depth: int = 0) -> bool:
+        """规范化后排队，已访问过的 URL 返回 False"""
+        return self.add_canonical(self.canonicalize(url), depth)
+
+    def add_canonical(self, url: str, depth: int = 0) -> bool:
+        if not self.visited.add(fingerprint(url)):
+            return False
+        self._push(url, depth)
+        return True
+
+    def requeue(self, url: str, depth: int = 0):
+        """排队一个已登记为已访问的 URL（重试、断点恢复，或调用方先 mark_seen 再做检查）"""
+        self._push(url, depth)
+
+    def _push(self, url: str, depth: int):
+        if self._spill_path and (self._spilled or len(self._queue) >= self.memory_urls):
+            if self._spill_file is None:
+                os.makedirs(os.path.dirname(self._spill_path), exist_ok=True)
+                # 文件中还有未读或已读过的行（保留的溢出文件）时接着追加，否则覆盖旧文件
+                mode = 'a' if self._spilled or self._spill_offset else 'w'
+                self._spill_file = open(self._spill_path, mode, encoding='utf-8')
+            self._spill_file.write(f"{depth}\t{url}\n")
+            self._spilled += 1
+        else:
+            self._queue.append((url, depth))
+
+    @staticmethod
+    def _parse_line(line: str) -> Tuple[str, int]:
+        depth, url = line.rstrip("\n").split("\t", 1)
+        return url, int(depth)
+
+    def pop(self) -> Optional[Tuple[str, int]]:
+        if not self._queue and self._spilled:
+            self._refill()
+        return self._queue.popleft() if self._queue else None
+
+    def _refill(self):
+        if self._spill_file is not None:
+            self._spill_file.flush()
+        with open(self._spill_path, 'r', encoding='utf-8') as f:
+            f.seek(self._spill_offset)
+            while len(self._queue) < self.memory_urls and self._spilled:
+                line = f.readline()
+                if not line:
+                    break
+                self._queue.append(self._parse_line(line))
+                self._spilled -= 1
+            self._spill_offset = f.tell()
+        if not self._spilled and not self._keep_spill:
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+            os.remove(self._spill_path)
+            self._spill_offset = 0
+
+    def checkpoint_state(self) -> Tuple[List[Tuple[str, int]], Dict[str, int]]:
+        """
+        断点使用：内存中的队列头部，以及溢出文件的引用
+        溢出文件只 flush 不读取，记录未读部分的偏移、文件长度与行数
+        """
+        if self._spill_file is not None:
+            self._spill_file.flush()
+            size = self._spill_file.tell()
+        else:
+            size = self._spill_offset
+        return list(self._queue), {"offset": self._spill_offset, "size": size, "count": self._spilled}
+
+    def restore(self, head: Iterable[Tuple[str, int]], offset: int = 0, size: int = 0, count: int = 0) -> int:
+        """
+        按 checkpoint_state() 的结果恢复队列，返回待抓取的数量；URL 需要另外登记为已访问
+        溢出文件截断到断点记录的长度，丢弃断点之后追加的行；文件已不存在时只恢复队列头部
+        """
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+        self._queue = deque((url, depth) for url, depth in head)
+        self._spill_offset = self._spilled = 0
+        if count and self._spill_path and os.path.exists(self._spill_path):
+            with open(self._spill_path, 'r+b') as f:
+                f.truncate(size)
+            self._spill_offset, self._spilled = offset, count
+        return len(self)
+
+    def close(self):
+        """删除溢出文件（断点引用的 pending_path 除外）"""
+        self.visited.close()
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+        if self.spill_dir:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+        self._queue.clear()
+        self._spilled = 0
+        self._spill_offset = 0
@@ -0,0 +1,173 @@
+import json
+import threading
+import uuid
+from typing import Callable, Dict, Generator, Iterator, Optional, Tuple
+
+from .cache import normalize_url
+from .scheduler import PRIORITIES, AdmissionError, JobScheduler
+
+
+def make_job_key(url: str, engine_name: str, archive_format: str, stream_archive: bool,
+                 budget: Optional[dict] = None) -> str:
+    """
+    任务键：归一化 URL + 影响结果的选项，相同键的请求共享同一个任务（也共用同一个断点）
+    预算按原值序列化（不经过 describe() 的取整），不同的预算不会被合并
+    """
+    budget_key = json.dumps(budget or {}, sort_keys=True)
+    return f"{normalize_url(url)}|{engine_name}|{archive_format}|{int(bool(stream_archive))}|{budget_key}"
+
+
+class Job:
+    """
+    一个正在运行的抓取任务
+    任务线程发布的每次更新都是完整状态（日志、计数、结果），
+    订阅者只需要拿到最新版本，后加入的订阅者也能立即看到当前进度
+    """
+
+    def __init__(self, key: str):
+        """
+        Args:
+            key: 任务键（归一化 URL + 选项），相同键的请求共享同一个任务
+        """
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.state: Optional[tuple] = None
+        self.version = 0
+        self.done = False
+        self.subscribers = 0
+        self.cancelled = threading.Event()
+        self._cond = threading.Condition()
+
+    def publish(self, update: tuple):
+        with self._cond:
+            self.state = update
+            self.version += 1
+            self._cond.notify_all()
+
+    def finish(self):
+        with self._cond:
+            self.done = True
+            self._cond.notify_all()
+
+    def follow(self, on_leave: Callable[["Job"], None]) -> Generator[tuple, None, None]:
+        """
+        订阅任务进度，直到任务结束
+        订阅者中途离开（生成器被关闭）时调用 on_leave
+        """
+        with self._cond:
+            self.subscribers += 1
+        seen = 0
+        try:
+            while True:
+                with self._cond:
+                    while self.version == seen and not self.done:
+                        self._cond.wait(timeout=1.0)
+                    if self.version == seen and self.done:
+                        return
+                    seen = self.version
+                    state = self.state
+                yield state
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+            on_leave(self)
+
+
+class JobRegistry:
+    """
+    在途任务表
+    同一个键的第二个请求不会重新抓取，而是挂到正在运行的任务上，
+    所有订阅者共享实时日志与最终归档；最后一个订阅者离开时取消任务
+    """
+
+    def __init__(self, scheduler: Optional[JobScheduler] = None):
+        """
+        Args:
+            scheduler: 任务调度器；为 None 时每个任务立即在独立线程中运行
+        """
+        self.scheduler = scheduler
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+
+    def submit(self, key: str, runner: Callable[[Job], Iterator[tuple]],
+               priority: int = PRIORITIES["normal"]) -> Tuple[Job, bool]:
+        """
+        获取或创建任务
+
+        Args:
+            key: 任务键
+            runner: 创建任务时以 Job 为参数调用，返回产出状态更新的生成器
+            priority: 调度优先级（数值越小越先执行）
+
+        Returns:
+            Tuple[Job, bool]: (任务, 是否为新创建)
+
+        Raises:
+            AdmissionError: 调度队列已满，任务被拒绝
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not job.done and not job.cancelled.is_set():
+                return job, False
+            job = Job(key)
+            self._jobs[key] = job
+
+        if self.scheduler is None:
+            thread = threading.Thread(target=self._run, args=(job, runner), name=f"job-{job.id}", daemon=True)
+            thread.start()
+            return job, True
+
+        try:
+            self.scheduler.submit(job, lambda: self._run(job, runner), priority)
+        except AdmissionError:
+            with self._lock:
+                if self._jobs.get(key) is job:
+                    del self._jobs[key]
+            raise
+        return job, True
+
+    def _run(self, job: Job, runner: Callable[[Job], Iterator[tuple]]):
+        # 排队期间所有订阅者都已离开，不再启动
+        if job.cancelled.is_set():
+            with self._lock:
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+            job.finish()
+            return
+        updates = runner(job)
+        try:
+            for update in updates:
+                job.publish(update)
+                if job.cancelled.is_set():
+                    break
+        finally:
+            # 关闭生成器会触发任务内部的 finally（停止引擎、清理流水线）
+            close = getattr(updates, "close", None)
+            if close:
+                close()
+            with self._lock:
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+            job.finish()
+
+    def leave(self, job: Job):
+        """订阅者离开；没有订阅者的任务会被取消，还在排队的直接移出调度队列"""
+        if job.subscribers <= 0 and not job.done:
+            job.cancelled.set()
+            if self.scheduler is not None and self.scheduler.cancel(job):
+                with self._lock:
+                    if self._jobs.get(job.key) is job:
+                        del self._jobs[job.key]
+                job.finish()
+
+    def get(self, key: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(key)
+
+    def find(self, job_id: str) -> Optional[Job]:
+        """按任务 ID 查找在途任务"""
+        with self._lock:
+            for job in self._jobs.values():
+                if job.id == job_id:
+                    return job
+        return None
@@ -0,0 +1,101 @@
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class CrawlManifest:
+    """
+    站点抓取清单
+    按域名持久化每个 URL 的 ETag / Last-Modified / 大小 / 内容哈希，
+    供下一次镜像发送条件请求，跳过未变化的资源
+    """
+
+    VERSION = 1
+
+    def __init__(self, manifest_dir: str, domain: str):
+        """
+        Args:
+            manifest_dir: 清单存放目录（FileManager 的 manifest 路径）
+            domain: 站点域名，一个域名一个清单文件
+        """
+        self.path = os.path.join(manifest_dir, f"{domain}.json")
+        self.domain = domain
+        self.entries: Dict[str, dict] = {}
+        self._touched: set = set()
+
+    def load(self) -> "CrawlManifest":
+        """读取清单，文件不存在或损坏时视为空清单"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION:
+                self.entries = data.get("entries", {})
+        except (OSError, ValueError):
+            self.entries = {}
+        return self
+
+    def save(self, prune: bool = False):
+        """
+        原子写入清单
+
+        Args:
+            prune: 为 True 时丢弃本次任务没有访问到的条目
+        """
+        if prune:
+            self.entries = {u: e for u, e in self.entries.items() if u in self._touched}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": self.VERSION, "domain": self.domain, "entries": self.entries}, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, url: str) -> Optional[dict]:
+        return self.entries.get(url)
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """为已知 URL 生成条件请求头"""
+        entry = self.entries.get(url)
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def record(self, url: str, path: str, size: int, digest: str, etag: Optional[str] = None,
+               last_modified: Optional[str] = None, content_type: str = "",
+               links: Optional[List[Tuple[str, bool]]] = None) -> bool:
+        """
+        记录一次成功下载
+
+        Args:
+            size: 正文字节数
+            digest: 正文的 SHA-256（十六进制），由调用方在接收时边下载边计算
+
+        Returns:
+            bool: 内容与上一次相比是否发生变化
+        """
+        previous = self.entries.get(url)
+        self.entries[url] = {
+            "path": path,
+            "etag": etag,
+            "last_modified": last_modified,
+            "size": size,
+            "sha256": digest,
+            "content_type": content_type,
+            "links": [list(link) for link in links] if links is not None else None,
+            "fetched_at": int(time.time()),
+        }
+        self._touched.add(url)
+        return previous is None or previous.get("sha256") != digest
+
+    def touch(self, url: str):
+        """标记条目在本次任务中仍然有效（例如 304 未修改）"""
+        if url in self.entries:
+            self._touched.add(url)
+            self.entries[url]["checked_at"] = int(time.time())
+
+    def total_size(self) -> int:
+        return sum(e.get("size", 0) for e in self.entries.values())
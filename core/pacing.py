@@ -0,0 +1,243 @@
+import asyncio
+import re
+import time
+import urllib.request
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+# 表示源站过载、需要退让的状态码
+OVERLOAD_STATUSES = (429, 503)
+
+# robots.txt 的 Request-rate: "请求数/时长[单位]"，如 "1/5"、"1/10s"、"30/1m"，其后可跟时间段（如 "0600-0845"）
+REQUEST_RATE_PATTERN = re.compile(r"(?P<requests>\d+)\s*/\s*(?P<seconds>\d+(?:\.\d+)?)\s*(?P<unit>[smhd]?)\b",
+                                  re.IGNORECASE)
+REQUEST_RATE_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+class PacingPolicy:
+    """
+    单个主机的请求节奏
+    令牌桶限制请求速率，AIMD 调整在途请求数：成功时缓慢增加，429/503/超时时减半
+    """
+
+    # 未设置速率时原生引擎的默认上限（次/秒），只用于压住并发连接的瞬时突发
+    DEFAULT_RATE = 20.0
+
+    def __init__(self, rate: Optional[float] = None, burst: Optional[int] = None, max_concurrency: int = 8,
+                 min_concurrency: int = 1, min_delay: float = 0.0, respect_crawl_delay: bool = True,
+                 max_retries: int = 3, max_backoff: float = 300.0):
+        """
+        Args:
+            rate: 每个主机每秒最多发起的请求数，<= 0 表示不限；None 使用 DEFAULT_RATE（wget 不限速）
+            burst: 令牌桶容量（允许的瞬时突发），默认等于 max_concurrency
+            max_concurrency: 每个主机在途请求数的上限（AIMD 的起点）
+            min_concurrency: AIMD 减半的下限
+            min_delay: 同一主机两次请求之间的最小间隔（秒）
+            respect_crawl_delay: 是否遵守 robots.txt 的 Crawl-delay / Request-rate
+            max_retries: 过载或超时的请求最多重试次数
+            max_backoff: 单次退让（含 Retry-After）的最长时间（秒）
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        # 运维显式设置的速率或最小间隔才会让 wget 等待
+        self.explicit_rate = rate is not None or min_delay > 0
+        if rate is None:
+            rate = self.DEFAULT_RATE
+        self.rate = rate if rate > 0 else 0.0
+        if min_delay > 0:
+            self.rate = min(self.rate, 1.0 / min_delay) if self.rate else 1.0 / min_delay
+        self.burst = max(1, burst if burst is not None else self.max_concurrency)
+        self.respect_crawl_delay = respect_crawl_delay
+        self.max_retries = max(0, max_retries)
+        self.max_backoff = max_backoff
+
+    @property
+    def request_interval(self) -> float:
+        """
+        单连接下载器（wget）对应的请求间隔（秒）
+        默认速率不适用：wget 同一时间只有一个请求，不会出现并发突发，没有显式设置时不等待
+        """
+        return 1.0 / self.rate if self.rate and self.explicit_rate else 0.0
+
+
+class TokenBucket:
+    """令牌桶：预约式取令牌，令牌不足时返回需要等待的时间"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """取一个令牌，返回需要等待的秒数（0 表示立即可用）"""
+        if not self.rate:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class HostPacer:
+    """
+    单个主机的调度状态（只在事件循环线程中使用）
+    在途请求数受 AIMD 上限约束；过载时按 Retry-After 或指数退避暂停整个主机
+    """
+
+    # 两次减半之间至少间隔的时间（秒），同一波过载只减半一次
+    DECREASE_INTERVAL = 1.0
+    # 没有 Retry-After 时的初始退避（秒），连续过载时翻倍
+    BASE_BACKOFF = 1.0
+
+    def __init__(self, policy: PacingPolicy):
+        self.policy = policy
+        self.limit = float(policy.max_concurrency)
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.bucket = TokenBucket(policy.rate, policy.burst)
+        self._cond = asyncio.Condition()
+        self._last_decrease = 0.0
+        self._backoff = self.BASE_BACKOFF
+
+    def apply_crawl_delay(self, delay: float):
+        """robots.txt 的 Crawl-delay：每 delay 秒最多一个请求"""
+        if delay > 0:
+            self.bucket.rate = min(self.bucket.rate, 1.0 / delay) if self.bucket.rate else 1.0 / delay
+            self.bucket.burst = 1
+            self.bucket.tokens = min(self.bucket.tokens, 1.0)
+
+    @asynccontextmanager
+    async def slot(self):
+        """占用一个请求名额：等待 AIMD 上限、退让期与令牌"""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            wait = self.blocked_until - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            wait = self.bucket.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            yield
+        finally:
+            async with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def on_success(self):
+        """加性增：每完成约 limit 个请求，上限加一"""
+        self.limit = min(float(self.policy.max_concurrency), self.limit + 1.0 / self.limit)
+        self._backoff = self.BASE_BACKOFF
+
+    def on_overload(self, retry_after: Optional[float] = None) -> float:
+        """乘性减：上限减半并暂停该主机，返回暂停的秒数"""
+        now = time.monotonic()
+        if now - self._last_decrease >= self.DECREASE_INTERVAL:
+            self.limit = max(float(self.policy.min_concurrency), self.limit / 2)
+            self._last_decrease = now
+        if retry_after is None:
+            pause = self._backoff
+            self._backoff = min(self._backoff * 2, self.policy.max_backoff)
+        else:
+            pause = retry_after
+        pause = min(max(pause, 0.0), self.policy.max_backoff)
+        self.blocked_until = max(self.blocked_until, now + pause)
+        return pause
+
+
+class HostScheduler:
+    """按主机分配 HostPacer"""
+
+    def __init__(self, policy: PacingPolicy):
+        self.policy = policy
+        self._pacers: Dict[str, HostPacer] = {}
+
+    def pacer(self, host: str) -> HostPacer:
+        pacer = self._pacers.get(host)
+        if pacer is None:
+            pacer = self._pacers[host] = HostPacer(self.policy)
+        return pacer
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After：秒数或 HTTP 日期"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_request_rate(value: str) -> Optional[float]:
+    """
+    把 Request-rate 的值换算为请求间隔（秒），如 "1/5" -> 5.0、"30/1m" -> 2.0；无法解析返回 None
+    其后的时间段限制不区分，全天按该速率执行
+    """
+    m = REQUEST_RATE_PATTERN.match(value.strip())
+    if not m:
+        return None
+    requests = int(m.group('requests'))
+    if requests <= 0:
+        return None
+    return float(m.group('seconds')) * REQUEST_RATE_UNITS[m.group('unit').lower()] / requests
+
+
+def parse_crawl_delay(robots_txt: str, user_agent: str = "*") -> Optional[float]:
+    """
+    从 robots.txt 中取出适用的请求间隔（秒）：Crawl-delay 与 Request-rate 换算出的间隔取较大者
+    优先使用名字出现在 user_agent 中的分组，其次是 "User-agent: *"；
+    不用 urllib.robotparser：它只接受整数秒
+    """
+    agent = user_agent.lower()
+    delays: Dict[str, float] = {}
+    group: List[str] = []
+    in_rules = False
+    for raw in robots_txt.splitlines():
+        line = raw.split('#', 1)[0].strip()
+        if ':' not in line:
+            continue
+        field, value = (part.strip() for part in line.split(':', 1))
+        field = field.lower()
+        if field == "user-agent":
+            # 规则之后再出现 User-agent 表示新的分组
+            if in_rules:
+                group, in_rules = [], False
+            group.append(value.lower())
+            continue
+        in_rules = True
+        if field == "crawl-delay":
+            try:
+                delay = float(value)
+            except ValueError:
+                continue
+        elif field == "request-rate":
+            delay = parse_request_rate(value)
+            if delay is None:
+                continue
+        else:
+            continue
+        for name in group:
+            if name == "*" or (name and agent != "*" and name in agent):
+                key = "*" if name == "*" else "specific"
+                delays[key] = max(delays.get(key, 0.0), delay)
+    return delays.get("specific", delays.get("*"))
+
+
+def fetch_crawl_delay(url: str, user_agent: str = "*", timeout: float = 5.0) -> Optional[float]:
+    """同步读取站点的 robots.txt（供 wget 后端在启动前使用），获取失败返回 None"""
+    parsed = urlparse(url)
+    try:
+        with urllib.request.urlopen(f"{parsed.scheme}://{parsed.netloc}/robots.txt", timeout=timeout) as resp:
+            text = resp.read(512 * 1024).decode('utf-8', errors='replace')
+    except Exception:
+        return None
+    return parse_crawl_delay(text, user_agent)
@@ -0,0 +1,108 @@
+import codecs
+import os
+import queue
+import selectors
+import subprocess
+import threading
+from typing import Dict, IO, Iterator, Optional, Tuple
+
+# 每次系统调用读取的字节数
+CHUNK_SIZE = 64 * 1024
+
+
+class LineSplitter:
+    """
+    增量解码与分行
+    把任意切分的字节块解码为文本，只返回完整的行（保留换行符），
+    不完整的末行与被截断的多字节字符留到下一块
+    """
+
+    def __init__(self, encoding: str = 'utf-8'):
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self._partial = ""
+
+    def feed(self, data: bytes) -> str:
+        """加入一个字节块，返回其中完整的行组成的文本（可能为空）"""
+        text = self._partial + self._decoder.decode(data)
+        cut = text.rfind("\n") + 1
+        self._partial = text[cut:]
+        return text[:cut]
+
+    def close(self) -> str:
+        """流结束：返回剩余的不完整行"""
+        text = self._partial + self._decoder.decode(b"", final=True)
+        self._partial = ""
+        return text
+
+
+class ProcessPump:
+    """
+    子进程输出泵
+    同时排空 stdout 与 stderr（任何一个管道写满都会让子进程阻塞），
+    每次读取一大块字节，增量解码后按整行批量交给调用方：产出 (流名称, 若干完整行的文本)
+
+    背压：只有调用方取走上一批之后才会继续读取；调用方处理慢时管道被写满，
+    子进程随之暂停，而不是在内存中无限堆积
+    """
+
+    def __init__(self, process: subprocess.Popen, encoding: str = 'utf-8', chunk_size: int = CHUNK_SIZE):
+        """
+        Args:
+            process: 以二进制管道（stdout / stderr=PIPE，不设 text）启动的子进程
+            encoding: 输出的编码，无法解码的字节替换为 U+FFFD
+            chunk_size: 每次读取的字节数
+        """
+        self.process = process
+        self.chunk_size = chunk_size
+        self._streams: Dict[str, IO[bytes]] = {
+            name: pipe for name, pipe in (("stdout", process.stdout), ("stderr", process.stderr)) if pipe is not None
+        }
+        self._splitters = {name: LineSplitter(encoding) for name in self._streams}
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        if os.name == "nt":
+            # Windows 的 select 不支持管道，改为每个管道一个读取线程
+            yield from self._iter_threads()
+            return
+        with selectors.DefaultSelector() as selector:
+            for name, pipe in self._streams.items():
+                selector.register(pipe, selectors.EVENT_READ, name)
+            while selector.get_map():
+                for key, _ in selector.select():
+                    text = self._read(key.data, key.fileobj)
+                    if text is None:
+                        selector.unregister(key.fileobj)
+                        text = self._splitters[key.data].close()
+                    if text:
+                        yield key.data, text
+
+    def _read(self, name: str, pipe: IO[bytes]) -> Optional[str]:
+        """读取一块并返回其中的完整行；管道关闭（EOF）时返回 None"""
+        data = os.read(pipe.fileno(), self.chunk_size)
+        if not data:
+            return None
+        return self._splitters[name].feed(data)
+
+    def _iter_threads(self) -> Iterator[Tuple[str, str]]:
+        # 有界队列：调用方处理慢时读取线程阻塞，效果与上面相同
+        chunks: "queue.Queue[Tuple[str, Optional[str]]]" = queue.Queue(maxsize=16)
+
+        def reader(name: str, pipe: IO[bytes]):
+            while True:
+                text = self._read(name, pipe)
+                if text is None:
+                    chunks.put((name, None))
+                    return
+                if text:
+                    chunks.put((name, text))
+
+        for name, pipe in self._streams.items():
+            threading.Thread(target=reader, args=(name, pipe), daemon=True).start()
+        open_streams = len(self._streams)
+        while open_streams:
+            name, text = chunks.get()
+            if text is None:
+                open_streams -= 1
+                text = self._splitters[name].close()
+            if text:
+                yield name, text
@@ -0,0 +1,184 @@
+import heapq
+import itertools
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger("Scheduler")
+
+# 任务优先级：数值越小越先执行
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+
+class AdmissionError(Exception):
+    """任务被准入控制拒绝（队列已满等）"""
+
+
+def default_worker_count(bandwidth_mbps: Optional[float] = None, per_job_mbps: float = 20.0) -> int:
+    """
+    根据 CPU 核心数与出口带宽估算抓取 worker 数量
+    抓取主要受网络限制，每个核心可以承载两个任务；给出带宽时不超过 带宽 / 单任务带宽
+    """
+    workers = (os.cpu_count() or 1) * 2
+    if bandwidth_mbps:
+        workers = min(workers, max(1, int(bandwidth_mbps // per_job_mbps)))
+    return max(1, workers)
+
+
+def available_memory_mb() -> Optional[float]:
+    """可用内存（MB），无法获取时返回 None"""
+    try:
+        with open("/proc/meminfo", 'r') as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def check_resources(storage_path: str, min_free_disk_mb: int, min_free_memory_mb: int) -> Optional[str]:
+    """准入检查：磁盘或内存不足时返回原因，否则返回 None"""
+    try:
+        free_mb = shutil.disk_usage(storage_path).free / (1024 * 1024)
+        if free_mb < min_free_disk_mb:
+            return f"low disk space ({free_mb:.0f} MB free)"
+    except OSError:
+        pass
+    memory_mb = available_memory_mb()
+    if memory_mb is not None and memory_mb < min_free_memory_mb:
+        return f"low memory ({memory_mb:.0f} MB available)"
+    return None
+
+
+class JobScheduler:
+    """
+    任务调度器
+    有界优先级队列 + 固定数量的抓取 worker 线程；
+    入队时队列已满则拒绝，启动前磁盘或内存不足则推迟；排队中取消的任务立即移出队列
+    """
+
+    def __init__(self, workers: int, max_queue: int = 50, storage_path: str = ".",
+                 min_free_disk_mb: int = 2048, min_free_memory_mb: int = 512,
+                 recheck_interval: float = 5.0,
+                 on_position: Optional[Callable[[object, int, str], None]] = None):
+        """
+        Args:
+            workers: 同时运行的任务数量
+            max_queue: 排队任务的最大数量，超过后直接拒绝
+            storage_path: 用于检查剩余磁盘空间的路径
+            min_free_disk_mb: 剩余磁盘低于该值时推迟启动新任务
+            min_free_memory_mb: 可用内存低于该值时推迟启动新任务
+            recheck_interval: 资源不足时重新检查的间隔（秒）
+            on_position: 排队位置变化时的回调 (job, 位置, 说明)，位置从 1 开始
+        """
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.storage_path = storage_path
+        self.min_free_disk_mb = min_free_disk_mb
+        self.min_free_memory_mb = min_free_memory_mb
+        self.recheck_interval = recheck_interval
+        self.on_position = on_position
+
+        self._heap: List[Tuple[int, int, object, Callable[[], None]]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = 0
+        self._waiting_reason = ""
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"scheduler-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, job, run: Callable[[], None], priority: int = PRIORITIES["normal"]):
+        """
+        任务入队
+
+        Raises:
+            AdmissionError: 队列已满
+        """
+        with self._cond:
+            if len(self._heap) >= self.max_queue:
+                raise AdmissionError(f"Queue is full ({self.max_queue} jobs waiting), please try again later")
+            heapq.heappush(self._heap, (priority, next(self._seq), job, run))
+            self._cond.notify()
+        self._notify_positions()
+
+    def cancel(self, job) -> bool:
+        """
+        取消排队中的任务：移出队列，不再占用排队名额，后面的任务位置前移
+
+        Returns:
+            bool: 任务是否还在队列中（已开始运行的任务返回 False，由任务自己停止）
+        """
+        with self._cond:
+            remaining = [item for item in self._heap if item[2] is not job]
+            if len(remaining) == len(self._heap):
+                return False
+            heapq.heapify(remaining)
+            self._heap = remaining
+        self._notify_positions()
+        return True
+
+    def queue_depth(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def running(self) -> int:
+        with self._cond:
+            return self._running
+
+    def check_resources(self) -> Optional[str]:
+        """资源不足时返回原因，否则返回 None"""
+        return check_resources(self.storage_path, self.min_free_disk_mb, self.min_free_memory_mb)
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                # 准入控制：资源不足时推迟，任务留在队列中
+                reason = self.check_resources()
+                if reason:
+                    if reason != self._waiting_reason:
+                        logger.warning(f"Delaying queued jobs: {reason}")
+                    self._waiting_reason = reason
+                    self._cond.release()
+                    try:
+                        self._notify_positions()
+                        time.sleep(self.recheck_interval)
+                    finally:
+                        self._cond.acquire()
+                    continue
+                self._waiting_reason = ""
+                _, _, job, run = heapq.heappop(self._heap)
+                self._running += 1
+
+            self._notify_positions()
+            try:
+                run()
+            except Exception as e:
+                logger.error(f"Job crashed: {e}")
+            finally:
+                with self._cond:
+                    self._running -= 1
+
+    def _notify_positions(self):
+        if self.on_position is None:
+            return
+        with self._cond:
+            ordered = [item[2] for item in sorted(self._heap)]
+            reason = self._waiting_reason
+        for position, job in enumerate(ordered, start=1):
+            try:
+                self.on_position(job, position, reason)
+            except Exception:
+                pass
@@ -0,0 +1,78 @@
+import os
+
+from core.budget import CrawlBudget
+from core.scheduler import default_worker_count
+
+# --- 配置部分 ---
+# Web 节点 (app.py) 与分布式 worker 节点 (worker_node.py) 共用的 WD_* 配置，每个节点按自己的环境变量生效；
+# 执行任务需要的部分由 job_settings() 汇总为传给 crawl_and_package 的 settings
+
+# 分布式模式下各节点共享的任务队列数据库（位于共享的 storage 目录中）
+QUEUE_DB = os.environ.get("WD_QUEUE_DB", os.path.join("storage", "jobs.db"))
+# 调度: 同时运行的任务数（默认按 CPU 核心数与 WD_BANDWIDTH_MBPS 出口带宽估算）
+BANDWIDTH_MBPS = float(os.environ.get("WD_BANDWIDTH_MBPS", 0)) or None
+MAX_JOBS = int(os.environ.get("WD_MAX_JOBS", 0)) or default_worker_count(BANDWIDTH_MBPS)
+# 准入控制: 剩余磁盘 / 可用内存低于阈值时推迟启动
+MIN_FREE_DISK_MB = int(os.environ.get("WD_MIN_FREE_DISK_MB", 2048))
+MIN_FREE_MEMORY_MB = int(os.environ.get("WD_MIN_FREE_MEMORY_MB", 512))
+# 流水线压缩: 下载过程中边保存边写入 ZIP，设为 0 则在下载结束后整体压缩
+PIPELINED_ZIP = os.environ.get("WD_PIPELINED_ZIP", "1") == "1"
+# 整体压缩时使用的进程数，默认使用全部 CPU 核心
+ZIP_WORKERS = int(os.environ.get("WD_ZIP_WORKERS", os.cpu_count() or 1))
+# 文本类成员的 deflate 级别；图片/字体/视频等已压缩格式始终 STORED
+ZIP_TEXT_LEVEL = int(os.environ.get("WD_ZIP_TEXT_LEVEL", 6))
+# 吞吐与 ETA: 没有上一次抓取的记录时读取 sitemap.xml 估算页面数
+SITEMAP_ETA = os.environ.get("WD_SITEMAP_ETA", "1") == "1"
+# 每个主机的请求节奏: 速率上限（次/秒，0 为不限；未设置时原生引擎按 20 限制突发，wget 不等待）、
+# 在途请求数上限（遇到 429/503/超时自动减半）、最小请求间隔（秒），
+# 是否遵守 robots.txt 的 Crawl-delay / Request-rate，过载请求的重试次数
+HOST_RATE = float(os.environ["WD_HOST_RATE"]) if os.environ.get("WD_HOST_RATE") else None
+HOST_CONCURRENCY = int(os.environ.get("WD_HOST_CONCURRENCY", 8))
+HOST_MIN_DELAY = float(os.environ.get("WD_HOST_MIN_DELAY", 0))
+RESPECT_CRAWL_DELAY = os.environ.get("WD_RESPECT_CRAWL_DELAY", "1") == "1"
+MAX_RETRIES = int(os.environ.get("WD_MAX_RETRIES", 3))
+# 爬虫陷阱: 同一路径段最多重复的次数、同一形状目录下的 URL 数、同一模板的页面数、每个查询参数的不同取值数，
+# 超过后剪除该子空间（各项设为 0 关闭）；wget 后端为加入新规则最多重启的次数
+TRAP_MAX_REPEATED_SEGMENTS = int(os.environ.get("WD_TRAP_MAX_REPEATED_SEGMENTS", 3))
+TRAP_MAX_URLS_PER_PATTERN = int(os.environ.get("WD_TRAP_MAX_URLS_PER_PATTERN", 10000))
+TRAP_MAX_PAGES_PER_TEMPLATE = int(os.environ.get("WD_TRAP_MAX_PAGES_PER_TEMPLATE", 2000))
+TRAP_MAX_PARAM_VALUES = int(os.environ.get("WD_TRAP_MAX_PARAM_VALUES", 100))
+TRAP_MAX_RESTARTS = int(os.environ.get("WD_TRAP_MAX_RESTARTS", 3))
+# 原生引擎的抓取前沿: 规范化时丢弃的查询参数（逗号分隔，支持 * 通配，留空使用内置的 utm_*/会话 ID 列表）；
+# 内存中待抓取 URL 与已访问指纹的数量上限，超出部分写入工作目录；磁盘上的指纹是否使用布隆过滤器
+URL_PARAM_BLACKLIST = [p for p in os.environ.get("WD_URL_PARAM_BLACKLIST", "").split(',') if p.strip()] or None
+FRONTIER_MEMORY_URLS = int(os.environ.get("WD_FRONTIER_MEMORY_URLS", 100000))
+VISITED_MEMORY_URLS = int(os.environ.get("WD_VISITED_MEMORY_URLS", 2000000))
+FRONTIER_BLOOM = os.environ.get("WD_FRONTIER_BLOOM", "1") == "1"
+# 抓取预算的上限: 每个任务最多的文件数、下载量（MB）、链接深度与抓取时长（分钟），0 为不限；
+# 任务自己的预算不限或超过上限时按上限执行，预算用完时打包已下载的部分
+BUDGET_MAX_FILES = int(os.environ.get("WD_BUDGET_MAX_FILES", 0))
+BUDGET_MAX_MB = float(os.environ.get("WD_BUDGET_MAX_MB", 0))
+BUDGET_MAX_DEPTH = int(os.environ.get("WD_BUDGET_MAX_DEPTH", 0))
+BUDGET_MAX_MINUTES = float(os.environ.get("WD_BUDGET_MAX_MINUTES", 0))
+BUDGET_CEILING = CrawlBudget(max_files=BUDGET_MAX_FILES, max_bytes=int(BUDGET_MAX_MB * 1024 * 1024),
+                             max_depth=BUDGET_MAX_DEPTH, max_seconds=BUDGET_MAX_MINUTES * 60)
+
+
+def job_settings() -> dict:
+    """
+    执行任务时传给 crawl_and_package 的 settings（各键的含义见 crawl_and_package 的说明）
+
+    Returns:
+        dict: 每次调用返回新的字典，调用方可以放心修改
+    """
+    return {
+        "pipelined_zip": PIPELINED_ZIP,
+        "zip_workers": ZIP_WORKERS,
+        "zip_text_level": ZIP_TEXT_LEVEL,
+        "sitemap_eta": SITEMAP_ETA,
+        "pacing": {"rate": HOST_RATE, "max_concurrency": HOST_CONCURRENCY, "min_delay": HOST_MIN_DELAY,
+                   "respect_crawl_delay": RESPECT_CRAWL_DELAY, "max_retries": MAX_RETRIES},
+        "traps": {"max_repeated_segments": TRAP_MAX_REPEATED_SEGMENTS,
+                  "max_urls_per_pattern": TRAP_MAX_URLS_PER_PATTERN,
+                  "max_pages_per_template": TRAP_MAX_PAGES_PER_TEMPLATE,
+                  "max_param_values": TRAP_MAX_PARAM_VALUES, "max_restarts": TRAP_MAX_RESTARTS},
+        "frontier": {"url_param_blacklist": URL_PARAM_BLACKLIST, "frontier_memory": FRONTIER_MEMORY_URLS,
+                     "visited_memory": VISITED_MEMORY_URLS, "bloom": FRONTIER_BLOOM},
+        "budget_ceiling": BUDGET_CEILING.to_dict(),
+    }
@@ -0,0 +1,116 @@
+import secrets
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+class StreamRegistry:
+    """
+    流式下载令牌表
+    下载完成的站点目录登记一个随机令牌，客户端通过 /stream/<token> 获取边生成边发送的 ZIP；
+    令牌过期后执行回调（保留镜像或清理临时目录）；start() 启动后台线程定期回收，
+    即使之后不再有新的登记或下载，过期的站点目录也会被释放；
+    同一个键（任务 ID）只登记一次，之后的登记复用同一个令牌，回调只执行一次
+    """
+
+    def __init__(self, ttl_seconds: int = 1800):
+        """
+        Args:
+            ttl_seconds: 令牌有效期（秒），过期后站点目录被回收
+        """
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}
+        # 键 -> 令牌
+        self._keys: Dict[str, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, interval_seconds: float = 60.0):
+        """
+        启动定期回收过期令牌的后台线程（重复调用无效）
+
+        Args:
+            interval_seconds: 检查间隔（秒），不超过令牌有效期
+        """
+        if self._thread is not None:
+            return
+        interval = max(1.0, min(interval_seconds, self.ttl_seconds))
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.expire()
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=loop, name="stream-expiry", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台回收线程"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def register(self, source_dir: str, filename: str, on_expire: Optional[Callable[[], None]] = None,
+                 key: Optional[str] = None) -> str:
+        """
+        登记一个可流式下载的目录，返回令牌
+
+        Args:
+            on_expire: 令牌过期后的回调
+            key: 登记的键；同一个键已登记且未过期时返回原令牌并延长有效期，本次的 on_expire 被忽略
+        """
+        self.expire()
+        with self._lock:
+            token = self._keys.get(key) if key is not None else None
+            if token is not None:
+                self._entries[token]["expires_at"] = time.time() + self.ttl_seconds
+                return token
+            token = secrets.token_urlsafe(24)
+            self._entries[token] = {
+                "source_dir": source_dir,
+                "filename": filename,
+                "on_expire": on_expire,
+                "expires_at": time.time() + self.ttl_seconds,
+                "active": 0,
+                "key": key,
+            }
+            if key is not None:
+                self._keys[key] = token
+        return token
+
+    def acquire(self, token: str) -> Optional[dict]:
+        """开始一次下载；令牌无效或已过期返回 None"""
+        self.expire()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            entry["active"] += 1
+            return dict(entry)
+
+    def release(self, token: str):
+        """一次下载结束（完成或客户端断开）"""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                entry["active"] -= 1
+        self.expire()
+
+    def expire(self):
+        """回收过期且没有正在进行下载的令牌"""
+        now = time.time()
+        expired = []
+        with self._lock:
+            for token, entry in list(self._entries.items()):
+                if entry["expires_at"] <= now and entry["active"] <= 0:
+                    expired.append(self._entries.pop(token))
+                    if entry["key"] is not None:
+                        self._keys.pop(entry["key"], None)
+        for entry in expired:
+            if entry["on_expire"]:
+                try:
+                    entry["on_expire"]()
+                except Exception:
+                    pass
@@ -0,0 +1,133 @@
+import gzip
+import os
+import shutil
+import subprocess
+import tarfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Optional
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖：缺失时回退到 zstd 命令行
+    zstandard = None
+
+
+class ParallelGzipWriter:
+    """
+    并行 gzip 写入器（类似 pigz）
+    把输入切成固定大小的块，每块在线程池中压缩为一个独立的 gzip 成员，
+    按顺序拼接输出；多成员 gzip 文件可被 gunzip / tarfile 正常读取
+    """
+
+    def __init__(self, fileobj: BinaryIO, threads: int = 4, level: int = 6, block_size: int = 1 << 20):
+        """
+        Args:
+            fileobj: 以二进制写模式打开的输出文件
+            threads: 压缩线程数（zlib 压缩时会释放 GIL）
+            level: gzip 压缩级别
+            block_size: 每个 gzip 成员的原始数据大小
+        """
+        self.fp = fileobj
+        self.level = level
+        self.block_size = block_size
+        self.threads = max(1, threads)
+        self._pool = ThreadPoolExecutor(max_workers=self.threads)
+        self._pending = deque()
+        self._buffer = bytearray()
+
+    def write(self, data: bytes) -> int:
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            block = bytes(self._buffer[:self.block_size])
+            del self._buffer[:self.block_size]
+            self._submit(block)
+        return len(data)
+
+    def _submit(self, block: bytes):
+        self._pending.append(self._pool.submit(gzip.compress, block, self.level, mtime=0))
+        # 限制在途块数量，控制内存占用
+        while len(self._pending) > self.threads * 2:
+            self.fp.write(self._pending.popleft().result())
+
+    def close(self):
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        while self._pending:
+            self.fp.write(self._pending.popleft().result())
+        self._pool.shutdown()
+        self.fp.flush()
+
+
+class ZstdCliWriter:
+    """没有安装 zstandard 时，通过 zstd -T<n> 子进程多线程压缩"""
+
+    def __init__(self, output_path: str, threads: int = 0, level: int = 3):
+        """
+        Args:
+            output_path: 输出文件路径
+            threads: zstd 线程数，0 表示使用全部核心
+            level: zstd 压缩级别
+        """
+        self.process = subprocess.Popen(
+            ["zstd", f"-T{threads}", f"-{level}", "-q", "-f", "-o", output_path],
+            stdin=subprocess.PIPE,
+        )
+
+    def write(self, data: bytes) -> int:
+        self.process.stdin.write(data)
+        return len(data)
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"zstd exited with code {self.process.returncode}")
+
+
+def zstd_available() -> bool:
+    return zstandard is not None or shutil.which("zstd") is not None
+
+
+def write_tarball(source_dir: str, output_path: str, compression: str, threads: int = 4,
+                  level: Optional[int] = None):
+    """
+    把站点目录打包为 tar.gz 或 tar.zst（流式写入，不产生中间 tar 文件）
+
+    Args:
+        source_dir: 站点目录，成员名以目录名开头（与 ZIP 布局一致）
+        output_path: 输出文件路径
+        compression: "gz" 或 "zst"
+        threads: 压缩线程数
+        level: 压缩级别，None 使用各格式的默认值
+    """
+    source_dir = os.path.abspath(source_dir)
+    arcname = os.path.basename(source_dir)
+
+    if compression == "gz":
+        with open(output_path, 'wb') as f:
+            writer = ParallelGzipWriter(f, threads=threads, level=level if level is not None else 6)
+            with tarfile.open(fileobj=writer, mode='w|') as tar:
+                tar.add(source_dir, arcname=arcname)
+            writer.close()
+
+    elif compression == "zst":
+        level = level if level is not None else 3
+        if zstandard is not None:
+            with open(output_path, 'wb') as f:
+                cctx = zstandard.ZstdCompressor(level=level, threads=threads)
+                with cctx.stream_writer(f, closefd=False) as writer:
+                    with tarfile.open(fileobj=writer, mode='w|') as tar:
+                        tar.add(source_dir, arcname=arcname)
+        elif shutil.which("zstd"):
+            writer = ZstdCliWriter(output_path, threads=threads, level=level)
+            try:
+                with tarfile.open(fileobj=writer, mode='w|') as tar:
+                    tar.add(source_dir, arcname=arcname)
+            finally:
+                writer.close()
+        else:
+            raise RuntimeError("tar.zst output requires the 'zstandard' package or the zstd command")
+
+    else:
+        raise ValueError(f"Unsupported tar compression: {compression}")
@@ -0,0 +1,124 @@
+import pytest
+
+import core.budget
+from core.budget import (
+    BUDGET_BYTES, BUDGET_DEPTH, BUDGET_DURATION, BUDGET_FILES, BudgetMeter, CrawlBudget,
+)
+
+
+class FakeClock:
+    """替换 core.budget 中的 time 模块，测试可以直接拨动时间"""
+
+    def __init__(self, now: float = 1_000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(core.budget, "time", fake)
+    return fake
+
+
+# --- CrawlBudget ---
+
+def test_budget_normalizes_values():
+    budget = CrawlBudget(max_files=-5, max_bytes=None, max_depth="3", max_seconds=1.5)
+    assert budget.to_dict() == {"max_files": 0, "max_bytes": 0, "max_depth": 3, "max_seconds": 1.5}
+    assert CrawlBudget.from_dict(budget.to_dict()).to_dict() == budget.to_dict()
+    assert CrawlBudget.from_dict(None).to_dict() == CrawlBudget().to_dict()
+    assert not CrawlBudget()
+    assert CrawlBudget(max_depth=1)
+
+
+@pytest.mark.parametrize("requested, ceiling, expected", [
+    # 两者都设置时取较小值
+    ({"max_files": 100, "max_bytes": 10}, {"max_files": 50, "max_bytes": 20}, {"max_files": 50, "max_bytes": 10}),
+    # 只有一方设置（0 表示不限）时取设置的一方：用户不能通过 0 绕过上限
+    ({"max_depth": 0, "max_seconds": 30}, {"max_depth": 5, "max_seconds": 0}, {"max_depth": 5, "max_seconds": 30}),
+    ({}, {"max_files": 10, "max_seconds": 60}, {"max_files": 10, "max_seconds": 60}),
+    ({"max_files": 7}, {}, {"max_files": 7}),
+])
+def test_capped(requested, ceiling, expected):
+    capped = CrawlBudget(**requested).capped(CrawlBudget(**ceiling))
+    assert capped.to_dict() == CrawlBudget(**expected).to_dict()
+
+
+def test_capped_without_ceiling_returns_same_budget():
+    budget = CrawlBudget(max_files=3)
+    assert budget.capped(None) is budget
+    assert budget.capped(CrawlBudget()) is budget
+
+
+def test_describe():
+    assert CrawlBudget().describe() == "unlimited"
+    assert CrawlBudget(max_files=10).describe() == "10 files"
+    budget = CrawlBudget(max_files=10, max_bytes=5 * 1024 * 1024, max_depth=3, max_seconds=90)
+    assert budget.describe() == "10 files · 5.0 MB · depth 3 · 1m 30s"
+    assert CrawlBudget(max_seconds=7200).describe() == "2h 0m"
+
+
+# --- BudgetMeter ---
+
+def test_meter_file_limit(clock):
+    meter = BudgetMeter(CrawlBudget(max_files=3))
+    meter.record(100)
+    meter.record(100)
+    assert meter.exhausted() is None
+    meter.record(100)
+    assert meter.exhausted() == BUDGET_FILES
+    assert meter.explain(BUDGET_FILES) == "file budget of 3 reached"
+
+
+def test_meter_counts_restored_files(clock):
+    meter = BudgetMeter(CrawlBudget(max_files=5))
+    # 断点恢复时已完成的文件一次计入，不带字节数
+    meter.record(0, files=5)
+    assert (meter.files, meter.bytes) == (5, 0)
+    assert meter.exhausted() == BUDGET_FILES
+
+
+def test_meter_byte_limit(clock):
+    meter = BudgetMeter(CrawlBudget(max_bytes=2048))
+    meter.record(1024)
+    assert meter.exhausted() is None
+    meter.record(1500)
+    assert meter.exhausted() == BUDGET_BYTES
+    assert meter.explain(BUDGET_BYTES) == "size budget of 2.0 KB reached (2.5 KB downloaded)"
+
+
+def test_meter_files_checked_before_bytes(clock):
+    meter = BudgetMeter(CrawlBudget(max_files=1, max_bytes=10))
+    meter.record(100)
+    assert meter.exhausted() == BUDGET_FILES
+
+
+def test_meter_duration_limit(clock):
+    meter = BudgetMeter(CrawlBudget(max_seconds=60))
+    assert meter.deadline == clock.now + 60
+    clock.now += 59.9
+    assert meter.exhausted() is None
+    clock.now += 0.1
+    assert meter.exhausted() == BUDGET_DURATION
+    # 也可以传入调用方的当前时间
+    assert meter.exhausted(now=meter.started) is None
+    assert meter.explain(BUDGET_DURATION) == "time budget of 1m 0s reached"
+
+
+def test_meter_without_limits(clock):
+    meter = BudgetMeter(CrawlBudget())
+    for _ in range(1000):
+        meter.record(1024 * 1024)
+    clock.now += 10 ** 6
+    assert meter.deadline is None
+    assert meter.exhausted() is None
+
+
+def test_explain_depth():
+    meter = BudgetMeter(CrawlBudget(max_depth=2))
+    # 深度预算不会结束抓取，只说明未跟随的链接
+    assert meter.exhausted() is None
+    assert meter.explain(BUDGET_DEPTH) == "links deeper than 2 levels were not followed"
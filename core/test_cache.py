@@ -0,0 +1,174 @@
+import json
+import multiprocessing
+import os
+
+import pytest
+
+import core.cache
+from core.cache import ResultCache, normalize_url
+
+
+class FakeClock:
+    """替换 core.cache 中的 time 模块，测试可以直接拨动时间"""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(core.cache, "time", fake)
+    return fake
+
+
+def _archive(tmp_path, name: str, size: int = 100) -> str:
+    path = tmp_path / name
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+
+def _cache(tmp_path, **kwargs) -> ResultCache:
+    return ResultCache(str(tmp_path / "result_cache.json"), **kwargs)
+
+
+# --- 命中与未命中 ---
+
+def test_normalize_url():
+    assert normalize_url("HTTP://Example.COM:80?b=2&a=1#top") == "http://example.com/?a=1&b=2"
+    assert normalize_url("https://example.com:8443/docs") == "https://example.com:8443/docs"
+
+
+def test_hit_and_miss(tmp_path, clock):
+    cache = _cache(tmp_path)
+    zip_path = _archive(tmp_path, "a.zip")
+    assert cache.lookup("https://example.com/", {"engine": "wget"}) is None
+    cache.store("https://example.com/", {"engine": "wget"}, zip_path)
+    # 归一化后相同的 URL 命中，选项不同则不命中
+    assert cache.lookup("https://EXAMPLE.com:443/#x", {"engine": "wget"}) == zip_path
+    assert cache.lookup("https://example.com/", {"engine": "native"}) is None
+    assert cache.lookup("https://example.org/", {"engine": "wget"}) is None
+
+
+def test_missing_archive_is_a_miss(tmp_path, clock):
+    cache = _cache(tmp_path)
+    zip_path = _archive(tmp_path, "a.zip")
+    cache.store("https://example.com/", None, zip_path)
+    os.remove(zip_path)
+    assert cache.lookup("https://example.com/") is None
+    assert cache.paths() == set()
+
+
+def test_invalidate(tmp_path, clock):
+    cache = _cache(tmp_path)
+    cache.store("https://example.com/", None, _archive(tmp_path, "a.zip"))
+    cache.invalidate("https://example.com/")
+    assert cache.lookup("https://example.com/") is None
+
+
+# --- 有效期 ---
+
+def test_ttl_expiry(tmp_path, clock):
+    cache = _cache(tmp_path, ttl_seconds=60, grace_seconds=30)
+    zip_path = _archive(tmp_path, "a.zip")
+    cache.store("https://example.com/", None, zip_path)
+    clock.now += 59
+    assert cache.lookup("https://example.com/") == zip_path
+    clock.now += 2
+    assert cache.lookup("https://example.com/") is None
+    # 过期的归档在宽限期内仍然保留
+    assert os.path.exists(zip_path)
+    clock.now += 31
+    cache.store("https://example.org/", None, _archive(tmp_path, "b.zip"))
+    assert not os.path.exists(zip_path)
+
+
+# --- LRU 淘汰与延迟删除 ---
+
+def test_lru_eviction(tmp_path, clock):
+    cache = _cache(tmp_path, max_bytes=250, grace_seconds=30)
+    first = _archive(tmp_path, "first.zip")
+    second = _archive(tmp_path, "second.zip")
+    cache.store("https://a.example/", None, first)
+    clock.now += 1
+    cache.store("https://b.example/", None, second)
+    clock.now += 1
+    # 访问过的条目最近使用，超出上限时淘汰另一个
+    assert cache.lookup("https://a.example/") == first
+    clock.now += 1
+    third = _archive(tmp_path, "third.zip")
+    cache.store("https://c.example/", None, third)
+    assert cache.lookup("https://b.example/") is None
+    assert cache.lookup("https://a.example/") == first
+    assert cache.lookup("https://c.example/") == third
+    # 被淘汰的归档可能仍在下载中，宽限期过后才删除
+    assert os.path.exists(second)
+    assert os.path.abspath(second) in cache.paths()
+    clock.now += 31
+    cache.lookup("https://a.example/")
+    assert not os.path.exists(second)
+    assert os.path.exists(first) and os.path.exists(third)
+
+
+def test_replaced_archive_is_deleted_after_grace(tmp_path, clock):
+    cache = _cache(tmp_path, grace_seconds=30)
+    old = _archive(tmp_path, "old.zip")
+    new = _archive(tmp_path, "new.zip")
+    cache.store("https://example.com/", None, old)
+    hit = cache.lookup("https://example.com/")
+    cache.store("https://example.com/", None, new)
+    # 刚命中的用户仍可以下载旧归档
+    assert hit == old and os.path.exists(old)
+    assert cache.lookup("https://example.com/") == new
+    clock.now += 31
+    cache.lookup("https://example.com/")
+    assert not os.path.exists(old)
+    assert os.path.exists(new)
+
+
+def test_reads_old_index_format(tmp_path, clock):
+    zip_path = _archive(tmp_path, "a.zip")
+    cache = _cache(tmp_path)
+    key = cache.make_key("https://example.com/")
+    with open(cache.index_path, 'w', encoding='utf-8') as f:
+        json.dump({key: {"url": "https://example.com/", "options": {}, "path": zip_path, "size": 100,
+                         "created_at": clock.now, "last_access": clock.now}}, f)
+    assert _cache(tmp_path).lookup("https://example.com/") == zip_path
+
+
+# --- 多进程 / 多节点共享索引 ---
+
+def test_instances_share_the_index(tmp_path, clock):
+    node_a = _cache(tmp_path)
+    node_b = _cache(tmp_path)
+    zip_path = _archive(tmp_path, "a.zip")
+    node_a.store("https://example.com/", None, zip_path)
+    assert node_b.lookup("https://example.com/") == zip_path
+    node_b.store("https://example.org/", None, _archive(tmp_path, "b.zip"))
+    # node_a 在锁内重新读取索引，两个节点的条目都保留
+    node_a.store("https://example.net/", None, _archive(tmp_path, "c.zip"))
+    assert len(_cache(tmp_path).paths()) == 3
+
+
+def _store_many(index_path: str, archive_path: str, worker: int, count: int):
+    cache = ResultCache(index_path)
+    for i in range(count):
+        cache.store(f"https://example.com/{worker}/{i}", None, archive_path)
+
+
+@pytest.mark.skipif(core.cache.fcntl is None, reason="flock is not available")
+def test_concurrent_processes_keep_every_entry(tmp_path):
+    zip_path = _archive(tmp_path, "shared.zip")
+    index_path = str(tmp_path / "result_cache.json")
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_store_many, args=(index_path, zip_path, w, 20)) for w in range(6)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(timeout=60)
+        assert p.exitcode == 0
+    with open(index_path, 'r', encoding='utf-8') as f:
+        assert len(json.load(f)["entries"]) == 120
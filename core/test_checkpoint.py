@@ -0,0 +1,80 @@
+import os
+from array import array
+
+from core.checkpoint import CrawlCheckpoint
+
+URL = "https://example.com/"
+
+
+def _fps(*values):
+    return array('Q', values).tobytes()
+
+
+def _save(cp, website_dir, fingerprints, **state):
+    cp.save("native", str(website_dir), fingerprints=fingerprints, **state)
+
+
+def test_fingerprints_are_appended(tmp_path):
+    site = tmp_path / "site"
+    site.mkdir()
+    cp = CrawlCheckpoint(str(tmp_path / "cp"), URL)
+    _save(cp, site, _fps(1, 2))
+    _save(cp, site, _fps(3), frontier=[["https://example.com/a", 1]],
+          pending={"offset": 10, "size": 30, "count": 2})
+    _save(cp, site, b"")
+
+    loaded = CrawlCheckpoint(str(tmp_path / "cp"), URL)
+    assert loaded.load()
+    assert loaded.fingerprints == _fps(1, 2, 3)
+    assert loaded.visited_count == 3
+    assert loaded.frontier == []
+    assert loaded.pending == {}
+
+
+def test_unsaved_fingerprints_are_ignored(tmp_path):
+    site = tmp_path / "site"
+    site.mkdir()
+    cp = CrawlCheckpoint(str(tmp_path / "cp"), URL)
+    _save(cp, site, _fps(1, 2), pending={"offset": 0, "size": 12, "count": 1})
+    # 进程在追加指纹之后、替换 JSON 之前退出：多出的指纹不属于断点
+    with open(cp.visited_path, 'ab') as f:
+        f.write(_fps(99))
+
+    loaded = CrawlCheckpoint(str(tmp_path / "cp"), URL)
+    assert loaded.load()
+    assert loaded.fingerprints == _fps(1, 2)
+    assert loaded.pending == {"offset": 0, "size": 12, "count": 1}
+    # 继续保存时覆盖多出的部分
+    _save(loaded, site, _fps(3))
+    with open(cp.visited_path, 'rb') as f:
+        assert f.read() == _fps(1, 2, 3)
+
+
+def test_discard_and_delete(tmp_path):
+    site = tmp_path / "site"
+    site.mkdir()
+    cp = CrawlCheckpoint(str(tmp_path / "cp"), URL)
+    _save(cp, site, _fps(1, 2))
+    # 重新开始的抓取从头写入指纹文件
+    cp.discard_visited()
+    _save(cp, site, _fps(5))
+    with open(cp.visited_path, 'rb') as f:
+        assert f.read() == _fps(5)
+
+    with open(cp.pending_path, 'w') as f:
+        f.write("0\thttps://example.com/a\n")
+    cp.delete()
+    assert not cp.exists()
+    assert list((tmp_path / "cp").iterdir()) == []
+
+
+def test_checkpoint_without_fingerprints(tmp_path):
+    site = tmp_path / "site"
+    site.mkdir()
+    cp = CrawlCheckpoint(str(tmp_path / "cp"), URL)
+    _save(cp, site, _fps(1))
+    # 其他引擎的断点不使用指纹文件
+    cp.save("wget", str(site))
+    assert not os.path.exists(cp.visited_path)
+    loaded = CrawlCheckpoint(str(tmp_path / "cp"), URL)
+    assert loaded.load() and loaded.engine == "wget" and loaded.fingerprints == b""
@@ -0,0 +1,175 @@
+import pytest
+
+from core.events import (
+    CrawlError, FileReused, FileSaved, LogMessage, Redirect, RequestStarted, ResponseStatus, WgetEventParser,
+    classify_failure, ERROR_DNS, ERROR_HTTP, ERROR_NETWORK, ERROR_OTHER, ERROR_TIMEOUT,
+)
+
+# 以下 stderr 均录自 wget 1.21.3（LC_ALL=C.UTF-8），只改了主机名
+
+SAVED_LOG = """\
+--2026-10-18 06:20:21--  http://example.com/data
+Connecting to example.com:80... connected.
+HTTP request sent, awaiting response... 200 OK
+Length: 8 [application/json]
+Saving to: ‘example.com/data’
+
+     0K                                                       100%  184K=0s
+
+Last-modified header missing -- time-stamps turned off.
+2026-10-18 06:20:21 (184 KB/s) - ‘example.com/data’ saved [8/8]
+
+"""
+
+REDIRECT_LOG = """\
+--2026-10-18 06:20:21--  http://example.com/old
+Connecting to example.com:80... connected.
+HTTP request sent, awaiting response... 301 Moved Permanently
+Location: http://example.com/new [following]
+--2026-10-18 06:20:21--  http://example.com/new
+Connecting to example.com:80... connected.
+HTTP request sent, awaiting response... 200 OK
+Length: 15 [text/html]
+Saving to: ‘example.com/old’
+
+     0K                                                       100% 6.57M=0s
+
+2026-10-18 06:20:21 (6.57 MB/s) - ‘example.com/old’ saved [15/15]
+
+"""
+
+NOT_MODIFIED_LOG = """\
+--2026-10-18 06:20:25--  http://example.com/new
+Connecting to example.com:80... connected.
+HTTP request sent, awaiting response... 304 Not Modified
+File ‘example.com/new’ not modified on server. Omitting download.
+
+"""
+
+NO_NEWER_LOG = """\
+--2026-10-18 06:20:34--  http://example.com/new
+Connecting to example.com:80... connected.
+HTTP request sent, awaiting response... 200 OK
+Length: 15
+Server file no newer than local file ‘example.com/new’ -- not retrieving.
+
+"""
+
+FAILURE_LOG = """\
+--2026-10-18 06:20:15--  http://example.com/nope
+Connecting to example.com:80... connected.
+HTTP request sent, awaiting response... 404 Not Found
+2026-10-18 06:20:15 ERROR 404: Not Found.
+
+--2026-10-18 06:20:15--  http://example.com:9/x
+Connecting to example.com:9... failed: Connection refused.
+--2026-10-18 06:20:15--  http://nonexistent.invalid/
+Resolving nonexistent.invalid (nonexistent.invalid)... failed: Name or service not known.
+wget: unable to resolve host address ‘nonexistent.invalid’
+--2026-10-18 06:20:34--  http://example.com/slow
+Connecting to example.com:80... connected.
+HTTP request sent, awaiting response... Read error (Connection timed out) in headers.
+Retrying.
+
+--2026-10-18 06:20:36--  (try: 2)  http://example.com/slow
+Connecting to example.com:80... connected.
+HTTP request sent, awaiting response... Read error (Connection reset by peer) in headers.
+Giving up.
+
+"""
+
+
+def _events(log: str, kind=None):
+    parser = WgetEventParser()
+    events = [parser.parse(line) for line in log.splitlines(keepends=True)]
+    return [e for e in events if kind is None or isinstance(e, kind)]
+
+
+def test_saved_file_size_and_url():
+    saved = _events(SAVED_LOG, FileSaved)
+    assert len(saved) == 1
+    assert saved[0].url == "http://example.com/data"
+    assert saved[0].path == "example.com/data"
+    assert saved[0].size == 8
+    # 原始行原样保留，用于完整日志
+    assert saved[0].line() == "2026-10-18 06:20:21 (184 KB/s) - ‘example.com/data’ saved [8/8]\n"
+    status = _events(SAVED_LOG, ResponseStatus)
+    assert [(s.status, s.reason) for s in status] == [(200, "OK")]
+
+
+def test_other_lines_are_log_messages():
+    events = _events(SAVED_LOG)
+    # "Saving to:" 与进度条不是独立事件
+    assert isinstance(events[4], LogMessage)
+    assert events[4].text == "Saving to: ‘example.com/data’\n"
+    assert sum(isinstance(e, LogMessage) for e in events) == len(events) - 3
+
+
+def test_saved_path_with_quote():
+    event = WgetEventParser().parse("2026-10-18 06:20:21 (1 MB/s) - ‘example.com/it’s here.html’ saved [42]\n")
+    assert isinstance(event, FileSaved)
+    assert event.path == "example.com/it’s here.html"
+    assert event.size == 42
+
+
+def test_redirect_carries_status_and_source_url():
+    events = _events(REDIRECT_LOG)
+    redirect = [e for e in events if isinstance(e, Redirect)]
+    assert len(redirect) == 1
+    assert redirect[0].url == "http://example.com/old"
+    assert redirect[0].location == "http://example.com/new"
+    assert redirect[0].status == 301
+    # 重定向后的保存事件属于新的请求
+    saved = [e for e in events if isinstance(e, FileSaved)]
+    assert saved[0].url == "http://example.com/new"
+    assert saved[0].size == 15
+
+
+@pytest.mark.parametrize("log", [NOT_MODIFIED_LOG, NO_NEWER_LOG], ids=["304", "head"])
+def test_unchanged_file_is_reused(log):
+    reused = _events(log, FileReused)
+    assert len(reused) == 1
+    assert reused[0].url == "http://example.com/new"
+    assert reused[0].path == "example.com/new"
+    assert _events(log, FileSaved) == []
+
+
+def test_failures():
+    errors = _events(FAILURE_LOG, CrawlError)
+    assert [(e.url, e.kind, e.status) for e in errors] == [
+        ("http://example.com/nope", ERROR_HTTP, 404),
+        ("http://example.com:9/x", ERROR_NETWORK, None),
+        ("http://nonexistent.invalid/", ERROR_DNS, None),
+        ("http://example.com/slow", ERROR_TIMEOUT, None),
+        ("http://example.com/slow", ERROR_NETWORK, None),
+    ]
+    assert errors[0].message == "Not Found"
+    assert errors[1].message == "Connection refused"
+    assert errors[3].message == "Connection timed out"
+
+
+def test_retry_request_line():
+    requests = _events(FAILURE_LOG, RequestStarted)
+    # "(try: 2)" 不是 URL
+    assert [r.url for r in requests][-2:] == ["http://example.com/slow", "http://example.com/slow"]
+
+
+def test_parse_chunk_matches_line_parsing():
+    log = SAVED_LOG + REDIRECT_LOG + NOT_MODIFIED_LOG + FAILURE_LOG
+    chunked = WgetEventParser().parse_chunk(log)
+    assert [(type(e), e.line()) for e in chunked] == [(type(e), e.line()) for e in _events(log)]
+
+
+@pytest.mark.parametrize("message, kind", [
+    ("Connection timed out", ERROR_TIMEOUT),
+    ("Read timeout", ERROR_TIMEOUT),
+    ("Temporary failure in name resolution", ERROR_DNS),
+    ("Name or service not known", ERROR_DNS),
+    ("Unable to resolve host address", ERROR_DNS),
+    ("Connection refused", ERROR_NETWORK),
+    ("Connection reset by peer", ERROR_NETWORK),
+    ("Network is unreachable", ERROR_NETWORK),
+    ("No such file or directory", ERROR_OTHER),
+])
+def test_classify_failure(message, kind):
+    assert classify_failure(message) == kind
@@ -0,0 +1,215 @@
+import threading
+import time
+
+import pytest
+
+import core.fleet
+from core.fleet import FleetWorker, SQLiteJobQueue
+from utils.file_manager import FileManager
+
+
+class FakeClock:
+    """替换 core.fleet 中的 time 模块，测试可以直接拨动时间"""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(core.fleet, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def job_queue(tmp_path, clock):
+    return SQLiteJobQueue(str(tmp_path / "storage" / "queue.db"))
+
+
+def _enqueue(job_queue: SQLiteJobQueue, clock: FakeClock, key: str, priority: int = 1) -> str:
+    # 每个任务的创建时间不同，排队顺序确定
+    clock.now += 1
+    job_id, created = job_queue.enqueue(key, {"url": f"https://{key}.example/"}, priority)
+    assert created
+    return job_id
+
+
+# --- 入队与认领 ---
+
+def test_enqueue_merges_same_key(job_queue, clock):
+    job_id = _enqueue(job_queue, clock, "site")
+    assert job_queue.enqueue("site", {}) == (job_id, False)
+    assert job_queue.get(job_id)["params"] == {"url": "https://site.example/"}
+    assert job_queue.get("missing") is None
+
+
+def test_claim_by_priority_and_age(job_queue, clock):
+    low = _enqueue(job_queue, clock, "low", priority=2)
+    first = _enqueue(job_queue, clock, "first")
+    second = _enqueue(job_queue, clock, "second")
+    high = _enqueue(job_queue, clock, "high", priority=0)
+    assert [job_queue.position(j) for j in (high, first, second, low)] == [1, 2, 3, 4]
+
+    claimed = [job_queue.claim("w1")["id"] for _ in range(4)]
+    assert claimed == [high, first, second, low]
+    assert job_queue.claim("w1") is None
+    job = job_queue.get(high)
+    assert job["state"] == "running" and job["worker"] == "w1" and job["attempts"] == 1
+    # 运行中的任务不再有排队位置
+    assert job_queue.position(high) == 0
+
+
+def test_complete_and_events(job_queue, clock):
+    job_id = _enqueue(job_queue, clock, "site")
+    job_queue.claim("w1")
+    job_queue.append_events(job_id, [("10 files", 10), ("20 files", 20)])
+    events = job_queue.events_since(job_id)
+    assert [payload for _, payload in events] == [("10 files", 10), ("20 files", 20)]
+    assert job_queue.events_since(job_id, events[0][0]) == events[1:]
+
+    # 其他 worker 不能结束不属于自己的任务
+    job_queue.complete(job_id, "w2", "failed")
+    assert job_queue.get(job_id)["state"] == "running"
+    job_queue.complete(job_id, "w1", "done", {"archive": "site.zip"})
+    job = job_queue.get(job_id)
+    assert job["state"] == "done" and job["result"] == {"archive": "site.zip"}
+    # 已结束的任务不再合并新请求
+    assert job_queue.enqueue("site", {})[1]
+
+
+# --- 取消 ---
+
+def test_detach_cancels_queued_job(job_queue, clock):
+    ahead = _enqueue(job_queue, clock, "ahead")
+    behind = _enqueue(job_queue, clock, "behind")
+    job_queue.attach(ahead)
+    job_queue.attach(ahead)
+    job_queue.detach(ahead)
+    assert job_queue.get(ahead)["state"] == "queued"
+    job_queue.detach(ahead)
+    assert job_queue.get(ahead)["state"] == "cancelled"
+    # 取消的任务不会被认领，也不占用排队位置
+    assert job_queue.position(behind) == 1
+    assert job_queue.claim("w1")["id"] == behind
+
+
+def test_detach_stops_running_job(job_queue, clock):
+    job_id = _enqueue(job_queue, clock, "site")
+    job_queue.attach(job_id)
+    job_queue.claim("w1")
+    assert job_queue.heartbeat(job_id, "w1")
+    job_queue.detach(job_id)
+    # 运行中的任务由 worker 在下一次心跳时发现并停止
+    job = job_queue.get(job_id)
+    assert job["state"] == "running" and job["cancel_requested"] == 1
+    assert not job_queue.heartbeat(job_id, "w1")
+    # 正在取消的任务不再合并新请求
+    assert job_queue.enqueue("site", {})[1]
+
+
+# --- 心跳超时与重试 ---
+
+def test_requeue_stale_job(job_queue, clock):
+    job_id = _enqueue(job_queue, clock, "site")
+    job_queue.claim("w1")
+    clock.now += 30
+    assert job_queue.requeue_stale(timeout_seconds=60) == 0
+    assert job_queue.heartbeat(job_id, "w1")
+    clock.now += 61
+    assert job_queue.requeue_stale(timeout_seconds=60) == 1
+    job = job_queue.get(job_id)
+    assert job["state"] == "queued" and job["worker"] is None
+    # 原 worker 的心跳失效，另一个 worker 接管（从断点继续）
+    assert not job_queue.heartbeat(job_id, "w1")
+    job = job_queue.claim("w2")
+    assert job["id"] == job_id and job["attempts"] == 2
+
+
+def test_requeue_stale_gives_up_after_max_attempts(job_queue, clock):
+    job_id = _enqueue(job_queue, clock, "site")
+    for attempt in range(1, 3):
+        assert job_queue.claim(f"w{attempt}")["attempts"] == attempt
+        clock.now += 61
+        assert job_queue.requeue_stale(timeout_seconds=60, max_attempts=3) == 1
+    job_queue.claim("w3")
+    clock.now += 61
+    assert job_queue.requeue_stale(timeout_seconds=60, max_attempts=3) == 0
+    assert job_queue.get(job_id)["state"] == "failed"
+
+
+def test_requeue_stale_fails_cancelled_job(job_queue, clock):
+    job_id = _enqueue(job_queue, clock, "site")
+    job_queue.attach(job_id)
+    job_queue.claim("w1")
+    job_queue.detach(job_id)
+    clock.now += 61
+    # 已请求取消的任务在 worker 崩溃后不再重试
+    assert job_queue.requeue_stale(timeout_seconds=60) == 0
+    assert job_queue.get(job_id)["state"] == "failed"
+
+
+# --- 流式下载与清理 ---
+
+def test_stream_holders(job_queue, clock):
+    job_id = _enqueue(job_queue, clock, "site")
+    job_queue.hold_stream(job_id, "ui-1")
+    job_queue.hold_stream(job_id, "ui-1")
+    job_queue.hold_stream(job_id, "ui-2")
+    assert not job_queue.release_stream(job_id, "ui-1")
+    # 最后一个节点的链接过期时才回收目录
+    assert job_queue.release_stream(job_id, "ui-2")
+
+
+def test_purge_finished_jobs(job_queue, clock):
+    old = _enqueue(job_queue, clock, "old")
+    job_queue.claim("w1")
+    job_queue.append_events(old, [("done",)])
+    job_queue.hold_stream(old, "ui-1")
+    job_queue.complete(old, "w1", "done")
+    queued = _enqueue(job_queue, clock, "queued")
+    clock.now += 25 * 3600
+    job_queue.purge(max_age_hours=24)
+    assert job_queue.get(old) is None
+    assert job_queue.events_since(old) == []
+    assert job_queue.release_stream(old, "ui-2")
+    # 未结束的任务不受影响
+    assert job_queue.get(queued)["state"] == "queued"
+
+
+# --- worker 节点 ---
+
+def test_worker_stops_idle_job_when_cancelled(job_queue, clock, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    FileManager().initialize()
+    closed = []
+
+    def fake_run_in_process(target, *args, idle_timeout=None):
+        # 子进程产出一条进度后长时间没有输出（例如在下载大文件）
+        assert idle_timeout
+        try:
+            yield ("update", "Downloading...\n", 1, 0, "running")
+            while True:
+                time.sleep(idle_timeout)
+                yield None
+        finally:
+            closed.append(True)
+
+    monkeypatch.setattr(core.fleet, "run_in_process", fake_run_in_process)
+    job_id, _ = job_queue.enqueue("site", {"url": "https://site.example/", "engine": "wget", "format": "zip",
+                                           "stream": False})
+    job_queue.attach(job_id)
+    job = job_queue.claim("w1")
+    worker = FleetWorker(job_queue, {}, heartbeat_interval=0.05, flush_interval=0.01)
+    # 跟踪者在任务运行时离开，worker 在下一次心跳时发现取消
+    threading.Timer(0.1, job_queue.detach, args=(job_id,)).start()
+    finished = threading.Thread(target=worker._run_job, args=(job, "w1"), daemon=True)
+    finished.start()
+    finished.join(5)
+    assert not finished.is_alive()
+    assert closed == [True]
+    assert job_queue.get(job_id)["state"] == "cancelled"
+    assert [payload for _, payload in job_queue.events_since(job_id)] == [("Downloading...\n", 1, 0, "running")]
@@ -0,0 +1,196 @@
+import os
+
+import pytest
+
+from core.frontier import FingerprintSet, Frontier, UrlCanonicalizer, fingerprint
+
+
+@pytest.fixture
+def small_buffer(monkeypatch):
+    """缩小指纹缓冲，几百个指纹就会产生有序段、归并与磁盘段"""
+    monkeypatch.setattr(FingerprintSet, "BUFFER_SIZE", 16)
+
+
+def _urls(n: int):
+    return [f"https://example.com/page/{i}.html" for i in range(n)]
+
+
+# --- UrlCanonicalizer ---
+
+def test_canonicalizer_normalizes_equivalent_urls():
+    canonicalize = UrlCanonicalizer()
+    assert canonicalize("HTTP://Example.COM:80/a?b=2&a=1&utm_source=x#top") == "http://example.com/a?a=1&b=2"
+    assert canonicalize("https://example.com") == "https://example.com/"
+    assert canonicalize("https://example.com:8443/x;jsessionid=abc?PHPSESSID=1") == "https://example.com:8443/x"
+
+
+def test_canonicalizer_custom_blacklist():
+    canonicalize = UrlCanonicalizer(param_blacklist=["ref*"], sort_query=False)
+    assert canonicalize("https://example.com/?z=1&referrer=a&utm_source=x") == "https://example.com/?z=1&utm_source=x"
+
+
+# --- FingerprintSet ---
+
+@pytest.mark.parametrize("bloom", [True, False])
+def test_fingerprint_set_spills_to_disk(tmp_path, small_buffer, bloom):
+    spill_dir = str(tmp_path / "visited")
+    visited = FingerprintSet(memory_limit=50, spill_dir=spill_dir, bloom=bloom)
+    fps = [fingerprint(u) for u in _urls(1000)]
+    try:
+        assert all(visited.add(fp) for fp in fps)
+        assert not any(visited.add(fp) for fp in fps)
+        assert len(visited) == len(fps)
+        # 内存中的指纹不超过上限（另加一个未满的缓冲），其余在磁盘段中
+        assert os.listdir(spill_dir)
+        assert sum(len(run) for run in visited._runs) <= 50 + FingerprintSet.BUFFER_SIZE
+        assert all(fp in visited for fp in fps)
+        assert not any(fingerprint(u) in visited for u in _urls(2000)[1000:])
+    finally:
+        visited.close()
+    assert not os.listdir(spill_dir)
+
+
+def test_fingerprint_set_reloads_new_fingerprints(tmp_path, small_buffer):
+    visited = FingerprintSet(memory_limit=50, spill_dir=str(tmp_path / "a"))
+    fps = [fingerprint(u) for u in _urls(500)]
+    visited.add(fps[0])
+    visited.track_new()
+    # 断点每次只取走新增的指纹，追加到指纹文件
+    data = b""
+    for chunk in (fps[:200], fps[200:]):
+        for fp in chunk:
+            visited.add(fp)
+        data += visited.take_new()
+    assert visited.take_new() == b""
+    visited.close()
+
+    # 断点恢复：读回到新的集合（同样会溢出到磁盘）
+    reloaded = FingerprintSet(memory_limit=50, spill_dir=str(tmp_path / "b"))
+    try:
+        assert reloaded.update_from_bytes(data) == len(fps) - 1
+        reloaded.add(fps[0])
+        assert len(reloaded) == len(fps)
+        assert all(fp in reloaded for fp in fps)
+        assert not reloaded.add(fps[0])
+    finally:
+        reloaded.close()
+
+
+def test_fingerprint_set_without_spill_dir_stays_in_memory(small_buffer):
+    visited = FingerprintSet(memory_limit=10)
+    for u in _urls(200):
+        visited.add(fingerprint(u))
+    assert len(visited) == 200
+    assert not visited._disk_runs
+
+
+# --- Frontier ---
+
+def test_frontier_deduplicates_canonical_urls():
+    frontier = Frontier()
+    assert frontier.add("https://Example.com/a?utm_source=x", depth=1)
+    assert not frontier.add("https://example.com:443/a#section", depth=2)
+    assert frontier.seen("https://example.com/a")
+    assert frontier.pop() == ("https://example.com/a", 1)
+    assert frontier.pop() is None
+
+
+def test_frontier_spills_and_keeps_fifo_order(tmp_path):
+    spill_dir = str(tmp_path / "frontier")
+    frontier = Frontier(memory_urls=10, spill_dir=spill_dir)
+    urls = _urls(100)
+    try:
+        for depth, url in enumerate(urls):
+            assert frontier.add(url, depth)
+        assert len(frontier) == 100
+        assert len(frontier._queue) == 10
+        assert os.path.exists(os.path.join(spill_dir, "pending.txt"))
+
+        # 取出一部分后再加入新 URL：仍然排在溢出的 URL 之后
+        popped = [frontier.pop() for _ in range(25)]
+        frontier.add("https://example.com/late.html", 7)
+        while True:
+            item = frontier.pop()
+            if item is None:
+                break
+            popped.append(item)
+        assert popped == list(zip(urls, range(100))) + [("https://example.com/late.html", 7)]
+        assert not os.path.exists(os.path.join(spill_dir, "pending.txt"))
+    finally:
+        frontier.close()
+    assert not os.path.exists(spill_dir)
+
+
+def _drain(frontier):
+    order = []
+    while True:
+        item = frontier.pop()
+        if item is None:
+            return order
+        order.append(item)
+
+
+def test_frontier_reloads_from_checkpoint_state(tmp_path, small_buffer):
+    pending_path = str(tmp_path / "job.pending")
+    frontier = Frontier(memory_urls=10, visited_memory=20, spill_dir=str(tmp_path / "a"), pending_path=pending_path)
+    frontier.visited.track_new()
+    urls = _urls(60)
+    for depth, url in enumerate(urls):
+        frontier.add(url, depth % 5)
+    done = [frontier.pop() for _ in range(15)]
+    # 断点保存的内容：内存中的队列头部、溢出文件的引用与新增的指纹
+    head, pending = frontier.checkpoint_state()
+    visited = frontier.visited.take_new()
+    assert len(head) == 5 and pending["count"] == 40
+    # 断点之后追加的 URL 不属于该断点
+    frontier.add("https://example.com/after-checkpoint.html")
+    frontier.close()
+    # 溢出文件由断点引用，close() 不删除
+    assert os.path.exists(pending_path)
+
+    resumed = Frontier(memory_urls=10, visited_memory=20, spill_dir=str(tmp_path / "b"), pending_path=pending_path)
+    try:
+        resumed.visited.update_from_bytes(visited)
+        assert resumed.restore(head, **pending) == 45
+        # 已抓取与待抓取的 URL 都不会再次排队
+        assert not any(resumed.add(url) for url in urls)
+        assert resumed.add("https://example.com/new.html")
+        assert _drain(resumed) == [(u, d % 5) for d, u in enumerate(urls)][15:] + [("https://example.com/new.html", 0)]
+    finally:
+        resumed.close()
+
+
+def test_frontier_checkpoint_survives_refill(tmp_path):
+    pending_path = str(tmp_path / "job.pending")
+    frontier = Frontier(memory_urls=10, pending_path=pending_path)
+    urls = _urls(40)
+    for url in urls:
+        frontier.add(url)
+    # 取空溢出文件后文件仍保留，偏移指向末尾，新 URL 接着追加
+    popped = [frontier.pop() for _ in range(35)]
+    head, pending = frontier.checkpoint_state()
+    assert pending["count"] == 0 and pending["offset"] == pending["size"] > 0
+    for i in range(20):
+        frontier.add(f"https://example.com/more/{i}.html")
+    head, pending = frontier.checkpoint_state()
+    frontier.close()
+
+    resumed = Frontier(memory_urls=10, pending_path=pending_path)
+    try:
+        resumed.restore(head, **pending)
+        assert popped + _drain(resumed) == [(u, 0) for u in urls] + [
+            (f"https://example.com/more/{i}.html", 0) for i in range(20)]
+    finally:
+        resumed.close()
+
+
+def test_frontier_restore_without_spill_file(tmp_path):
+    frontier = Frontier(memory_urls=10, pending_path=str(tmp_path / "missing.pending"))
+    # 溢出文件已不存在：只恢复队列头部
+    assert frontier.restore([("https://example.com/a", 1)], offset=0, size=100, count=30) == 1
+    assert _drain(frontier) == [("https://example.com/a", 1)]
+    # 新的溢出从头写入
+    for url in _urls(15):
+        frontier.add(url)
+    assert len(frontier) == 15
+    assert [u for u, _ in _drain(frontier)] == _urls(15)
@@ -0,0 +1,131 @@
+import threading
+
+from core.jobs import JobRegistry, make_job_key
+
+TIMEOUT = 5
+
+
+class ScriptedRun:
+    """按测试的节奏产出状态：每次 step() 放行一条更新，记录被调用的次数与生成器是否被关闭"""
+
+    def __init__(self, updates):
+        self.updates = list(updates)
+        self.calls = 0
+        self.closed = threading.Event()
+        self._steps = threading.Semaphore(0)
+
+    def step(self, count: int = 1):
+        for _ in range(count):
+            self._steps.release()
+
+    def __call__(self, job):
+        self.calls += 1
+        try:
+            for update in self.updates:
+                if not self._steps.acquire(timeout=TIMEOUT):
+                    return
+                yield update
+        finally:
+            self.closed.set()
+
+
+def _wait_for_version(job, version: int):
+    with job._cond:
+        assert job._cond.wait_for(lambda: job.version >= version, timeout=TIMEOUT)
+
+
+def _wait_for_subscribers(job, count: int):
+    with job._cond:
+        assert job._cond.wait_for(lambda: job.subscribers == count, timeout=TIMEOUT)
+
+
+def _follow_in_thread(registry: JobRegistry, job):
+    """在线程中跟踪任务，返回收到的全部状态"""
+    received = []
+    thread = threading.Thread(target=lambda: received.extend(job.follow(registry.leave)), daemon=True)
+    thread.start()
+    return thread, received
+
+
+def test_make_job_key():
+    key = make_job_key("https://Example.com", "wget", "zip", False, {"max_files": 10})
+    assert key == make_job_key("https://example.com/", "wget", "zip", False, {"max_files": 10})
+    assert key != make_job_key("https://example.com/", "wget", "zip", True, {"max_files": 10})
+    assert key != make_job_key("https://example.com/", "wget", "zip", False, {"max_files": 11})
+
+
+def test_same_key_shares_one_run():
+    registry = JobRegistry()
+    run = ScriptedRun(["one", "two"])
+    job, created = registry.submit("site", run)
+    again, created_again = registry.submit("site", run)
+    assert created and not created_again
+    assert again is job
+
+    first, first_received = _follow_in_thread(registry, job)
+    second, second_received = _follow_in_thread(registry, job)
+    _wait_for_subscribers(job, 2)
+    run.step(2)
+    first.join(TIMEOUT)
+    second.join(TIMEOUT)
+    assert run.calls == 1
+    assert first_received[-1] == second_received[-1] == "two"
+    # 任务结束后同一个键重新创建任务
+    _, created = registry.submit("site", ScriptedRun([]))
+    assert created
+
+
+def test_different_keys_run_separately():
+    registry = JobRegistry()
+    run = ScriptedRun(["done"])
+    job_a, _ = registry.submit("a", run)
+    job_b, created = registry.submit("b", run)
+    assert created and job_a is not job_b
+    run.step(2)
+    for job in (job_a, job_b):
+        assert list(job.follow(registry.leave)) == ["done"]
+    assert run.calls == 2
+
+
+def test_late_follower_replays_current_state():
+    registry = JobRegistry()
+    run = ScriptedRun(["10 files", "20 files", "finished"])
+    job, _ = registry.submit("site", run)
+    early, early_received = _follow_in_thread(registry, job)
+    run.step(2)
+    _wait_for_version(job, 2)
+
+    # 后加入的跟踪者立即拿到最新的完整状态，不需要等下一次更新
+    late = job.follow(registry.leave)
+    assert next(late) == "20 files"
+    run.step()
+    assert list(late) == ["finished"]
+    early.join(TIMEOUT)
+    assert early_received[-1] == "finished"
+
+
+def test_last_leave_cancels_the_run():
+    registry = JobRegistry()
+    run = ScriptedRun(["started", "never sent"])
+    job, _ = registry.submit("site", run)
+    run.step()
+    _wait_for_version(job, 1)
+
+    first = job.follow(registry.leave)
+    second = job.follow(registry.leave)
+    assert next(first) == next(second) == "started"
+    first.close()
+    assert not job.cancelled.is_set()
+    second.close()
+    assert job.cancelled.is_set()
+
+    # 任务线程在下一次更新后停止，关闭生成器（触发 runner 的清理），任务从表中移除
+    run.step()
+    assert run.closed.wait(TIMEOUT)
+    with job._cond:
+        assert job._cond.wait_for(lambda: job.done, timeout=TIMEOUT)
+    assert registry.get("site") is None
+    assert registry.find(job.id) is None
+    # 已取消的任务不会被新的请求复用
+    _, created = registry.submit("site", ScriptedRun([]))
+    assert created
@@ -0,0 +1,193 @@
+import email.utils
+
+import pytest
+
+import core.pacing
+from core.engine import WgetEngine
+from core.pacing import (
+    HostPacer, PacingPolicy, TokenBucket, parse_crawl_delay, parse_request_rate, parse_retry_after,
+)
+from utils.file_manager import FileManager
+
+
+class FakeClock:
+    """替换 core.pacing 中的 time 模块，测试可以直接拨动时间"""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(core.pacing, "time", fake)
+    return fake
+
+
+# --- 令牌桶 ---
+
+def test_token_bucket_burst_then_refill(clock):
+    bucket = TokenBucket(rate=2.0, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    # 令牌用完后按预约排队：每个请求多等 1 / rate 秒
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+    clock.now += 1.0
+    assert bucket.reserve() == pytest.approx(0.5)
+    # 长时间空闲后最多攒满 burst 个令牌
+    clock.now += 60
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.5)
+
+
+def test_token_bucket_without_rate_never_waits(clock):
+    bucket = TokenBucket(rate=0.0, burst=1)
+    assert all(bucket.reserve() == 0.0 for _ in range(100))
+
+
+# --- AIMD ---
+
+def test_overload_halves_once_per_interval(clock):
+    pacer = HostPacer(PacingPolicy(max_concurrency=8, min_concurrency=1))
+    pacer.on_overload()
+    assert pacer.limit == 4
+    # 同一波过载的其他请求不再减半
+    pacer.on_overload()
+    assert pacer.limit == 4
+    for expected in (2, 1, 1):
+        clock.now += HostPacer.DECREASE_INTERVAL
+        pacer.on_overload()
+        assert pacer.limit == expected
+
+
+def test_overload_backoff_and_retry_after(clock):
+    pacer = HostPacer(PacingPolicy(max_backoff=5.0))
+    # 没有 Retry-After：指数退避，不超过 max_backoff
+    assert [pacer.on_overload() for _ in range(5)] == [1.0, 2.0, 4.0, 5.0, 5.0]
+    assert pacer.blocked_until == clock.now + 5.0
+    # Retry-After 优先，同样受 max_backoff 限制
+    assert pacer.on_overload(retry_after=3.0) == 3.0
+    assert pacer.on_overload(retry_after=600.0) == 5.0
+    # 成功的请求重置退避
+    pacer.on_success()
+    assert pacer.on_overload() == 1.0
+
+
+def test_additive_recovery(clock):
+    pacer = HostPacer(PacingPolicy(max_concurrency=4))
+    pacer.on_overload()
+    clock.now += HostPacer.DECREASE_INTERVAL
+    pacer.on_overload()
+    assert pacer.limit == 1
+    # 每个成功的请求加 1 / limit：每完成约 limit 个请求上限加一
+    pacer.on_success()
+    assert pacer.limit == 2
+    pacer.on_success()
+    assert pacer.limit == pytest.approx(2.5)
+    pacer.on_success()
+    assert pacer.limit == pytest.approx(2.9)
+    for _ in range(10):
+        pacer.on_success()
+    assert pacer.limit == 4
+
+
+def test_crawl_delay_slows_the_bucket(clock):
+    pacer = HostPacer(PacingPolicy(rate=20, max_concurrency=8))
+    pacer.apply_crawl_delay(2.0)
+    assert pacer.bucket.rate == 0.5 and pacer.bucket.burst == 1
+    assert pacer.bucket.reserve() == 0.0
+    assert pacer.bucket.reserve() == pytest.approx(2.0)
+
+
+# --- Retry-After ---
+
+def test_retry_after_seconds():
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after(" 5 ") == 5.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("") is None
+    assert parse_retry_after("soon") is None
+
+
+def test_retry_after_http_date(clock):
+    later = email.utils.formatdate(clock.now + 90, usegmt=True)
+    assert parse_retry_after(later) == pytest.approx(90.0)
+    # 已经过去的时间不需要等待
+    earlier = email.utils.formatdate(clock.now - 90, usegmt=True)
+    assert parse_retry_after(earlier) == 0.0
+
+
+# --- robots.txt ---
+
+@pytest.mark.parametrize("value, interval", [
+    ("1/5", 5.0),
+    ("1/10s", 10.0),
+    ("30/1m", 2.0),
+    ("2/1h 0600-0845", 1800.0),
+    ("0/5", None),
+    ("fast", None),
+])
+def test_parse_request_rate(value, interval):
+    assert parse_request_rate(value) == interval
+
+
+ROBOTS = """\
+User-agent: *
+Crawl-delay: 2
+Disallow: /private
+
+# 专门针对 wget 的分组
+User-agent: Wget
+User-agent: OtherBot
+Request-rate: 1/10s
+Crawl-delay: 3
+
+User-agent: SlowBot
+Request-rate: 1/1m  # 每分钟一次
+"""
+
+
+@pytest.mark.parametrize("agent, delay", [
+    ("*", 2.0),
+    ("Wget/1.21.3", 10.0),
+    ("OtherBot", 10.0),
+    ("SlowBot/2.0", 60.0),
+    ("Mozilla/5.0", 2.0),
+])
+def test_parse_crawl_delay_per_agent(agent, delay):
+    assert parse_crawl_delay(ROBOTS, agent) == delay
+
+
+def test_parse_crawl_delay_without_rules():
+    assert parse_crawl_delay("User-agent: *\nDisallow: /\n") is None
+    assert parse_crawl_delay("User-agent: Wget\nCrawl-delay: 1.5\n", "*") is None
+    assert parse_crawl_delay("User-agent: Wget\nCrawl-delay: 1.5\n", "Wget") == 1.5
+
+
+# --- wget 的请求间隔 ---
+
+def _wait_options(tmp_path, pacing, crawl_delay=None):
+    engine = WgetEngine(FileManager(str(tmp_path)), pacing=pacing)
+    engine.crawl_delay = crawl_delay
+    return [option for option in engine._pacing_options() if option.startswith("--wait=") or option == "--random-wait"]
+
+
+def test_wget_does_not_wait_by_default(tmp_path):
+    # 默认速率只用于原生引擎的并发，wget 不等待
+    assert PacingPolicy().rate == PacingPolicy.DEFAULT_RATE
+    assert _wait_options(tmp_path, PacingPolicy()) == []
+
+
+def test_wget_waits_for_explicit_rate_or_robots(tmp_path):
+    assert _wait_options(tmp_path, PacingPolicy(rate=4)) == ["--wait=0.25", "--random-wait"]
+    assert _wait_options(tmp_path, PacingPolicy(min_delay=2)) == ["--wait=2", "--random-wait"]
+    assert _wait_options(tmp_path, PacingPolicy(), crawl_delay=3.0) == ["--wait=3", "--random-wait"]
+    # 两者都有时取较慢的一个
+    assert _wait_options(tmp_path, PacingPolicy(rate=4), crawl_delay=1.0) == ["--wait=1", "--random-wait"]
+    assert _wait_options(tmp_path, PacingPolicy(rate=0)) == []
@@ -0,0 +1,90 @@
+import subprocess
+import sys
+
+from core.pump import LineSplitter, ProcessPump
+
+
+# --- LineSplitter ---
+
+def test_returns_only_complete_lines():
+    splitter = LineSplitter()
+    assert splitter.feed(b"first line\nsecond ") == "first line\n"
+    assert splitter.feed(b"half") == ""
+    assert splitter.feed(b" done\nthird\n") == "second half done\nthird\n"
+    assert splitter.close() == ""
+
+
+def test_multibyte_character_split_across_reads():
+    splitter = LineSplitter()
+    data = "保存到: ‘example.com/页面.html’\n".encode("utf-8")
+    # 逐字节送入：多字节字符的每一段都不能被替换为 U+FFFD
+    text = "".join(splitter.feed(data[i:i + 1]) for i in range(len(data)))
+    assert text == "保存到: ‘example.com/页面.html’\n"
+    assert splitter.close() == ""
+
+
+def test_multibyte_character_split_at_chunk_boundary():
+    splitter = LineSplitter()
+    data = "‘a’ saved [1/1]\n".encode("utf-8")
+    # ‘ 的 3 个字节分在两次读取中
+    assert splitter.feed(data[:2]) == ""
+    assert splitter.feed(data[2:]) == "‘a’ saved [1/1]\n"
+
+
+def test_carriage_return_progress_stays_on_one_line():
+    splitter = LineSplitter()
+    # 进度条用 \r 覆盖同一行，直到 \n 才算一行结束
+    assert splitter.feed(b" 10%\r 50%\r") == ""
+    assert splitter.feed(b"100%\nSaving to: x\n") == " 10%\r 50%\r100%\nSaving to: x\n"
+
+
+def test_eof_flushes_partial_line():
+    splitter = LineSplitter()
+    assert splitter.feed(b"complete\nno newline at end") == "complete\n"
+    assert splitter.close() == "no newline at end"
+    assert splitter.close() == ""
+
+
+def test_eof_with_truncated_character():
+    splitter = LineSplitter()
+    data = "页".encode("utf-8")
+    assert splitter.feed(b"tail " + data[:2]) == ""
+    # 流在多字节字符中间结束：残缺的字节替换为 U+FFFD，不抛出异常
+    assert splitter.close() == "tail �"
+
+
+def test_invalid_bytes_are_replaced():
+    splitter = LineSplitter()
+    assert splitter.feed(b"bad \xff byte\n") == "bad � byte\n"
+
+
+def test_other_encoding():
+    splitter = LineSplitter("latin-1")
+    assert splitter.feed("café\n".encode("latin-1")) == "café\n"
+
+
+# --- ProcessPump ---
+
+def test_pump_drains_both_streams():
+    script = (
+        "import sys\n"
+        "for i in range(2000):\n"
+        "    sys.stdout.write(f'out {i}\\n')\n"
+        "    sys.stderr.write(f'err {i} ‘文件’\\n')\n"
+        "sys.stderr.write('last')\n"
+    )
+    process = subprocess.Popen([sys.executable, "-c", script], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               bufsize=0)
+    received = {"stdout": [], "stderr": []}
+    # 很小的块：多字节字符与行都会被切断
+    for stream, text in ProcessPump(process, chunk_size=7):
+        received[stream].append(text)
+    assert process.wait(timeout=30) == 0
+
+    stdout = "".join(received["stdout"])
+    stderr = "".join(received["stderr"])
+    assert stdout.splitlines() == [f"out {i}" for i in range(2000)]
+    assert stderr.splitlines() == [f"err {i} ‘文件’" for i in range(2000)] + ["last"]
+    # 每一批都是完整的行，只有 EOF 时的末行没有换行符
+    assert all(text.endswith("\n") for text in received["stdout"])
+    assert all(text.endswith("\n") for text in received["stderr"][:-1])
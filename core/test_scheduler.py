@@ -0,0 +1,171 @@
+import threading
+
+import pytest
+
+from core.jobs import JobRegistry
+from core.scheduler import PRIORITIES, AdmissionError, JobScheduler, default_worker_count
+
+TIMEOUT = 5
+
+
+class Recorder:
+    """记录任务的执行顺序与最近一次排队位置通知"""
+
+    def __init__(self):
+        self.order = []
+        self.positions = {}
+        self.reasons = set()
+        self.lock = threading.Lock()
+        self.finished = threading.Semaphore(0)
+
+    def on_position(self, job, position: int, reason: str):
+        with self.lock:
+            self.positions[job] = position
+            self.reasons.add(reason)
+
+    def run(self, name: str):
+        def run():
+            with self.lock:
+                self.order.append(name)
+            self.finished.release()
+        return run
+
+    def wait(self, count: int):
+        for _ in range(count):
+            assert self.finished.acquire(timeout=TIMEOUT)
+
+
+def _scheduler(recorder: Recorder, **kwargs) -> JobScheduler:
+    options = {"workers": 1, "min_free_disk_mb": 0, "min_free_memory_mb": 0, "recheck_interval": 0.05,
+               "on_position": recorder.on_position}
+    options.update(kwargs)
+    return JobScheduler(**options)
+
+
+def _occupy(scheduler: JobScheduler) -> threading.Event:
+    """占住唯一的 worker，返回放行用的事件"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(TIMEOUT)
+
+    scheduler.submit("blocker", blocker)
+    assert started.wait(TIMEOUT)
+    return release
+
+
+def _publish_position(job, position: int, reason: str):
+    """与 app 相同：排队位置作为任务状态发布给订阅者"""
+    job.publish(("queued", position))
+
+
+def test_default_worker_count(monkeypatch):
+    monkeypatch.setattr("os.cpu_count", lambda: 4)
+    assert default_worker_count() == 8
+    assert default_worker_count(bandwidth_mbps=100) == 5
+    assert default_worker_count(bandwidth_mbps=1) == 1
+
+
+def test_priority_order():
+    recorder = Recorder()
+    scheduler = _scheduler(recorder)
+    release = _occupy(scheduler)
+    scheduler.submit("low", recorder.run("low"), PRIORITIES["low"])
+    scheduler.submit("normal-1", recorder.run("normal-1"), PRIORITIES["normal"])
+    scheduler.submit("high", recorder.run("high"), PRIORITIES["high"])
+    scheduler.submit("normal-2", recorder.run("normal-2"), PRIORITIES["normal"])
+    release.set()
+    recorder.wait(4)
+    # 优先级相同的任务按提交顺序执行
+    assert recorder.order == ["high", "normal-1", "normal-2", "low"]
+
+
+def test_position_notifications():
+    recorder = Recorder()
+    scheduler = _scheduler(recorder)
+    release = _occupy(scheduler)
+    recorder.positions.clear()
+    scheduler.submit("a", recorder.run("a"), PRIORITIES["normal"])
+    scheduler.submit("b", recorder.run("b"), PRIORITIES["normal"])
+    assert recorder.positions == {"a": 1, "b": 2}
+    # 高优先级任务插到前面，其余任务的位置后移
+    scheduler.submit("c", recorder.run("c"), PRIORITIES["high"])
+    assert recorder.positions == {"a": 2, "b": 3, "c": 1}
+    assert recorder.reasons == {""}
+    release.set()
+    recorder.wait(3)
+
+
+def test_admission_rejects_when_queue_is_full():
+    recorder = Recorder()
+    scheduler = _scheduler(recorder, max_queue=2)
+    release = _occupy(scheduler)
+    scheduler.submit("a", recorder.run("a"))
+    scheduler.submit("b", recorder.run("b"))
+    with pytest.raises(AdmissionError):
+        scheduler.submit("c", recorder.run("c"))
+    assert scheduler.queue_depth() == 2
+    release.set()
+    recorder.wait(2)
+    assert recorder.order == ["a", "b"]
+
+
+def test_low_resources_delay_queued_jobs(monkeypatch):
+    recorder = Recorder()
+    scheduler = _scheduler(recorder)
+    reasons = ["low disk space (10 MB free)"] * 3
+    monkeypatch.setattr(scheduler, "check_resources", lambda: reasons.pop() if reasons else None)
+    scheduler.submit("a", recorder.run("a"))
+    recorder.wait(1)
+    # 推迟期间排队位置的通知带上原因
+    assert "low disk space (10 MB free)" in recorder.reasons
+    assert recorder.order == ["a"]
+
+
+def test_cancel_removes_queued_job():
+    recorder = Recorder()
+    scheduler = _scheduler(recorder, max_queue=2)
+    release = _occupy(scheduler)
+    scheduler.submit("a", recorder.run("a"))
+    scheduler.submit("b", recorder.run("b"))
+    assert scheduler.cancel("a")
+    assert not scheduler.cancel("a")
+    # 取消的任务不再占用排队名额，后面的任务位置前移
+    assert scheduler.queue_depth() == 1
+    assert recorder.positions["b"] == 1
+    scheduler.submit("c", recorder.run("c"))
+    release.set()
+    recorder.wait(2)
+    assert recorder.order == ["b", "c"]
+    # 已经开始运行的任务不能从队列中取消
+    assert not scheduler.cancel("blocker")
+
+
+def test_registry_leave_frees_the_queue_slot():
+    scheduler = _scheduler(Recorder(), max_queue=1)
+    release = _occupy(scheduler)
+    scheduler.on_position = _publish_position
+    registry = JobRegistry(scheduler=scheduler)
+    runs = []
+
+    def runner(job):
+        runs.append(job)
+        yield "done"
+
+    job, _ = registry.submit("site", runner)
+    follower = job.follow(registry.leave)
+    assert next(follower) == ("queued", 1)
+    with pytest.raises(AdmissionError):
+        registry.submit("other", runner)
+    follower.close()
+    assert job.cancelled.is_set() and job.done
+    assert scheduler.queue_depth() == 0
+    assert registry.get("site") is None
+    # 空出的名额可以接收新任务
+    other, created = registry.submit("other", runner)
+    assert created
+    release.set()
+    assert list(other.follow(registry.leave))[-1] == "done"
+    assert runs == [other]
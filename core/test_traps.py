@@ -0,0 +1,169 @@
+import re
+import shutil
+import subprocess
+
+import pytest
+
+from core.traps import (
+    TRAP_PARAM, TRAP_PATTERN, TRAP_REPEATED, TRAP_TEMPLATE, TrapDetector, TrapPolicy, generalize_segment, posix_escape,
+)
+
+ORIGIN = "http://example.com"
+
+
+def _detector(**thresholds) -> TrapDetector:
+    """只打开 thresholds 中给出的检查，其余设为 0"""
+    limits = {"max_repeated_segments": 0, "max_urls_per_pattern": 0, "max_pages_per_template": 0,
+              "max_param_values": 0}
+    limits.update(thresholds)
+    return TrapDetector(TrapPolicy(**limits))
+
+
+def _first_rule(detector: TrapDetector, urls):
+    """依次登记 urls，返回第一次触发的规则及其下标"""
+    for i, url in enumerate(urls):
+        rule = detector.check(url)
+        if rule is not None:
+            return i, rule
+    return None, None
+
+
+def _grep_matches(regex: str, urls) -> list:
+    """用 POSIX 扩展正则（grep -E，与 wget 的 --reject-regex 同一语法）筛选 URL"""
+    proc = subprocess.run(["grep", "-E", "--", regex], input="\n".join(urls) + "\n",
+                          capture_output=True, text=True)
+    assert proc.returncode in (0, 1), proc.stderr
+    return proc.stdout.splitlines()
+
+
+def _assert_regex(regex: str, rejected, kept):
+    for url in rejected:
+        assert re.search(regex, url), url
+    for url in kept:
+        assert not re.search(regex, url), url
+    if shutil.which("grep"):
+        assert _grep_matches(regex, list(rejected) + list(kept)) == list(rejected)
+
+
+# --- 辅助函数 ---
+
+def test_generalize_segment():
+    assert generalize_segment("page12.html") == "page{n}.html"
+    assert generalize_segment("2024-05-01") == "{n}-{n}-{n}"
+    assert generalize_segment("123e4567-e89b-12d3-a456-426614174000") == "{id}"
+    assert generalize_segment("deadbeefcafebabe00") == "{id}"
+    assert generalize_segment("about") == "about"
+
+
+def test_posix_escape():
+    assert posix_escape("a.b?c=(1)") == r"a\.b\?c=\(1\)"
+    assert re.fullmatch(posix_escape("x[1]+{2}|^$"), "x[1]+{2}|^$")
+
+
+# --- 各类规则 ---
+
+def test_repeated_segments():
+    detector = _detector(max_repeated_segments=3)
+    assert detector.check(f"{ORIGIN}/a/b/a/b/a/b/") is None
+    rule = detector.check(f"{ORIGIN}/a/b/a/b/a/b/a/b/")
+    assert rule is not None and rule.kind == TRAP_REPEATED
+    # 同一来源的重复规则只有一条，由 static_regex 在启动时交给 wget
+    assert detector.check(f"{ORIGIN}/c/c/c/c") is rule
+    assert rule.pruned == 2 and rule.regex == ""
+
+
+def test_param_values():
+    detector = _detector(max_param_values=3)
+    urls = [f"{ORIGIN}/search?q=x&color={c}" for c in ("red", "green", "blue", "red", "black")]
+    index, rule = _first_rule(detector, urls)
+    # 重复的取值不计数，第 4 个不同的取值才触发
+    assert index == 4 and rule.kind == TRAP_PARAM
+    assert rule.key == f"{ORIGIN}/search?color"
+    assert detector.check(f"{ORIGIN}/search?color=white") is rule
+    assert detector.check(f"{ORIGIN}/search?q=y") is None
+    _assert_regex(rule.regex,
+                  rejected=[f"{ORIGIN}/search?color=red", f"{ORIGIN}/search?q=x&color=pink"],
+                  kept=[f"{ORIGIN}/search?q=x", f"{ORIGIN}/search?xcolor=1", f"{ORIGIN}/other?color=red",
+                        "http://example.org/search?color=red"])
+
+
+def test_pages_per_template():
+    detector = _detector(max_pages_per_template=5)
+    index, rule = _first_rule(detector, [f"{ORIGIN}/item/{i}.html" for i in range(10)])
+    assert index == 5 and rule.kind == TRAP_TEMPLATE
+    assert detector.check(f"{ORIGIN}/item/999.html") is rule
+    # 其他模板与其他来源不受影响
+    assert detector.check(f"{ORIGIN}/item/1.html?page=2") is None
+    assert detector.check("http://example.org/item/1.html") is None
+    _assert_regex(rule.regex,
+                  rejected=[f"{ORIGIN}/item/42.html", f"{ORIGIN}/item/7.html"],
+                  kept=[f"{ORIGIN}/item/x.html", f"{ORIGIN}/item/42.html?page=2", f"{ORIGIN}/item/4/2.html",
+                        f"{ORIGIN}/items/42.html"])
+
+
+def test_urls_per_pattern():
+    detector = _detector(max_urls_per_pattern=5)
+    urls = [f"{ORIGIN}/cal/2024/{m:02d}/day{m}.html" for m in range(1, 13)]
+    index, rule = _first_rule(detector, urls)
+    assert index == 5 and rule.kind == TRAP_PATTERN
+    assert rule.key == f"{ORIGIN}/cal/{{n}}/{{n}}/"
+    assert detector.check(f"{ORIGIN}/cal/1999/01/index.html") is rule
+    assert detector.check(f"{ORIGIN}/cal/2024/") is None
+    _assert_regex(rule.regex,
+                  rejected=[f"{ORIGIN}/cal/2030/12/anything", f"{ORIGIN}/cal/2030/12/", f"{ORIGIN}/cal/1/2/x?y=1"],
+                  kept=[f"{ORIGIN}/cal/2030/", f"{ORIGIN}/cal/2030/12/deep/x.html", f"{ORIGIN}/cal/x/12/a.html"])
+
+
+def test_default_policy_ignores_normal_site():
+    detector = TrapDetector()
+    urls = [f"{ORIGIN}/"] + [f"{ORIGIN}/docs/{name}.html" for name in ("intro", "install", "usage", "faq")]
+    urls += [f"{ORIGIN}/blog/post{i}.html" for i in range(50)] + [f"{ORIGIN}/img/a/b/c/logo.png"]
+    assert all(detector.check(url) is None for url in urls)
+    assert not detector.rules and detector.pruned == 0
+
+
+# --- 合并后的 --reject-regex ---
+
+def test_static_regex_rejects_repeated_segments():
+    regex = _detector(max_repeated_segments=3).static_regex()
+    _assert_regex(regex,
+                  rejected=[f"{ORIGIN}/a/a/a/a", f"{ORIGIN}/a/b/a/b/a/b/a/b/", f"{ORIGIN}/x/a/y/a/z/a/w/a?p=1"],
+                  kept=[f"{ORIGIN}/a/a/a", f"{ORIGIN}/a/ab/abc/abcd", f"{ORIGIN}/a/b/c/d/e/f/g/h",
+                        f"{ORIGIN}/a?x=/a/a/a/a"])
+
+
+def test_reject_regex_combines_rules():
+    detector = TrapDetector(TrapPolicy(max_repeated_segments=2, max_urls_per_pattern=0,
+                                       max_pages_per_template=3, max_param_values=2))
+    for url in ([f"{ORIGIN}/p/{i}" for i in range(4)] +
+                [f"{ORIGIN}/list?sort={s}" for s in ("a", "b", "c")]):
+        detector.check(url)
+    assert {kind for kind, _ in detector.rules} == {TRAP_TEMPLATE, TRAP_PARAM}
+    regex = detector.reject_regex()
+    assert regex.startswith(detector.static_regex() + "|(")
+    # 静态规则的反向引用在合并后仍指向第一个分组
+    _assert_regex(regex,
+                  rejected=[f"{ORIGIN}/p/100", f"{ORIGIN}/list?sort=z", f"{ORIGIN}/s/s/s"],
+                  kept=[f"{ORIGIN}/p/100/x", f"{ORIGIN}/list?page=2", f"{ORIGIN}/s/s", f"{ORIGIN}/"])
+
+
+def test_reject_regex_disabled():
+    detector = _detector()
+    assert detector.static_regex() is None
+    assert detector.reject_regex() is None
+    assert detector.check(f"{ORIGIN}/a/a/a/a/a?x=1") is None
+
+
+def test_summary_counts_pruned_urls():
+    detector = _detector(max_pages_per_template=2)
+    for i in range(6):
+        detector.check(f"{ORIGIN}/item/{i}.html")
+    assert detector.pruned == 4
+    assert detector.summary() == ["more than 2 pages like /item/{n}.html: 4 URLs pruned"]
+
+
+@pytest.mark.parametrize("limit", [1, 3, 5])
+def test_static_regex_threshold(limit):
+    regex = _detector(max_repeated_segments=limit).static_regex()
+    assert not re.search(regex, ORIGIN + "/a" * limit)
+    assert re.search(regex, ORIGIN + "/a" * (limit + 1))
@@ -0,0 +1,196 @@
+import os
+import struct
+import zipfile
+import zlib
+
+import pytest
+
+from core.zipwriter import (
+    ZIP16_LIMIT, ZIP32_LIMIT, ZIP_DEFLATED, ZIP_STORED, RawZipWriter, ZipStream, compress_member,
+)
+
+# 超过 4GB 的成员：稀疏文件（不占磁盘）+ 最快的 deflate 级别，归档本身只有几十 MB
+LARGE_SIZE = ZIP32_LIMIT + (1 << 20)
+LARGE_LEVEL = 1
+# 超过 ZIP 结束记录 16 位计数上限的成员数量
+MANY_ENTRIES = ZIP16_LIMIT + 100
+
+
+def _assert_round_trip(zip_path: str, expected: dict):
+    """testzip 校验每个成员的 CRC；expected 为 {成员名: 原始大小或内容}"""
+    with zipfile.ZipFile(zip_path) as zf:
+        assert zf.testzip() is None
+        infos = {info.filename: info for info in zf.infolist()}
+        assert sorted(infos) == sorted(expected)
+        for name, content in expected.items():
+            if isinstance(content, bytes):
+                assert zf.read(name) == content
+            else:
+                assert infos[name].file_size == content
+
+
+def _zip64_entry_count(zip_path: str) -> int:
+    """ZIP64 结束记录中的成员总数（zipfile 按中央目录的字节数读取，成员数写错也能打开，需要单独检查）"""
+    with open(zip_path, 'rb') as f:
+        f.seek(-4096, os.SEEK_END)
+        tail = f.read()
+    start = tail.rfind(b"PK\x06\x06")
+    assert start != -1, "missing ZIP64 end of central directory record"
+    return struct.unpack_from("<Q", tail, start + 32)[0]
+
+
+def _sample_files(root) -> dict:
+    files = {
+        "site/index.html": b"<html>" + b"hello world " * 500 + b"</html>",
+        "site/img/logo.png": os.urandom(4096),
+        "site/empty.txt": b"",
+        "site/中文/页面.html": "你好".encode('utf-8') * 100,
+    }
+    for name, content in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+    return files
+
+
+def _method(name: str) -> int:
+    return ZIP_STORED if name.endswith(".png") else ZIP_DEFLATED
+
+
+def _sparse_file(path, size: int) -> str:
+    with open(path, 'wb') as f:
+        f.truncate(size)
+    return str(path)
+
+
+def _stream_to_file(zs: ZipStream, members, zip_path) -> str:
+    """members 为 (路径, 成员名, method, level)"""
+    with open(zip_path, 'wb') as f:
+        for path, arcname, method, level in members:
+            for chunk in zs.stream_file(path, arcname, method=method, level=level):
+                f.write(chunk)
+        for chunk in zs.finish():
+            f.write(chunk)
+    return str(zip_path)
+
+
+# --- 普通站点：三种写入方式 ---
+
+def test_serial_writer_round_trip(tmp_path):
+    files = _sample_files(tmp_path)
+    zip_path = tmp_path / "serial.zip"
+    with open(zip_path, 'wb') as f:
+        writer = RawZipWriter(f)
+        for name in files:
+            writer.write_file_streaming(str(tmp_path / name), name, method=_method(name))
+        writer.close()
+    _assert_round_trip(str(zip_path), files)
+
+
+def test_parallel_writer_round_trip(tmp_path):
+    files = _sample_files(tmp_path)
+    zip_path = tmp_path / "parallel.zip"
+    with open(zip_path, 'wb') as f:
+        writer = RawZipWriter(f)
+        for name in files:
+            method = _method(name)
+            crc, usize, payload = compress_member(str(tmp_path / name), method)
+            writer.write_compressed(name, payload, crc, usize, method=method)
+        writer.close()
+    _assert_round_trip(str(zip_path), files)
+
+
+def test_streamed_writer_round_trip(tmp_path):
+    files = _sample_files(tmp_path)
+    members = [(str(tmp_path / name), name, _method(name), 6) for name in files]
+    zip_path = _stream_to_file(ZipStream(chunk_size=1024), members, tmp_path / "stream.zip")
+    _assert_round_trip(zip_path, files)
+
+
+# --- 成员数量超过 65535：结束记录需要 ZIP64 ---
+
+def test_serial_writer_many_entries(tmp_path):
+    source = tmp_path / "a.txt"
+    source.write_bytes(b"x")
+    zip_path = tmp_path / "many.zip"
+    with open(zip_path, 'wb') as f:
+        writer = RawZipWriter(f)
+        for i in range(MANY_ENTRIES):
+            writer.write_file_streaming(str(source), f"f/{i}.txt", method=ZIP_STORED)
+        writer.close()
+    _assert_round_trip(str(zip_path), {f"f/{i}.txt": b"x" for i in range(MANY_ENTRIES)})
+    assert _zip64_entry_count(str(zip_path)) == MANY_ENTRIES
+
+
+def test_parallel_writer_many_entries(tmp_path):
+    payload = b"x"
+    zip_path = tmp_path / "many.zip"
+    with open(zip_path, 'wb') as f:
+        writer = RawZipWriter(f)
+        for i in range(MANY_ENTRIES):
+            writer.write_compressed(f"f/{i}.txt", payload, zlib.crc32(payload), len(payload), method=ZIP_STORED)
+        writer.close()
+    _assert_round_trip(str(zip_path), {f"f/{i}.txt": payload for i in range(MANY_ENTRIES)})
+    assert _zip64_entry_count(str(zip_path)) == MANY_ENTRIES
+
+
+def test_streamed_writer_many_entries(tmp_path):
+    source = tmp_path / "a.txt"
+    source.write_bytes(b"x")
+    members = [(str(source), f"f/{i}.txt", ZIP_DEFLATED, 6) for i in range(MANY_ENTRIES)]
+    zip_path = _stream_to_file(ZipStream(), members, tmp_path / "many.zip")
+    _assert_round_trip(zip_path, {f"f/{i}.txt": b"x" for i in range(MANY_ENTRIES)})
+    assert _zip64_entry_count(zip_path) == MANY_ENTRIES
+
+
+# --- 超过 4GB 的成员：本地头 / 中央目录的大小与其后成员的偏移都需要 ZIP64 ---
+
+def test_serial_writer_large_entry(tmp_path):
+    large = _sparse_file(tmp_path / "large.bin", LARGE_SIZE)
+    zip_path = tmp_path / "large.zip"
+    with open(zip_path, 'wb') as f:
+        writer = RawZipWriter(f)
+        writer.write_file_streaming(large, "large.bin", method=ZIP_DEFLATED, level=LARGE_LEVEL)
+        writer.write_compressed("after.txt", b"tail", zlib.crc32(b"tail"), 4, method=ZIP_STORED)
+        writer.close()
+    _assert_round_trip(str(zip_path), {"large.bin": LARGE_SIZE, "after.txt": b"tail"})
+
+
+def test_parallel_writer_large_entry(tmp_path):
+    # 与 compress_member 的输出相同，但分块生成，不需要在内存中放下 4GB 的原始数据
+    chunk = bytes(1 << 24)
+    compressor = zlib.compressobj(LARGE_LEVEL, zlib.DEFLATED, -15)
+    crc, parts, remaining = 0, [], LARGE_SIZE
+    while remaining:
+        data = chunk[:min(remaining, len(chunk))]
+        crc = zlib.crc32(data, crc)
+        parts.append(compressor.compress(data))
+        remaining -= len(data)
+    parts.append(compressor.flush())
+
+    zip_path = tmp_path / "large.zip"
+    with open(zip_path, 'wb') as f:
+        writer = RawZipWriter(f)
+        writer.write_compressed("large.bin", b"".join(parts), crc, LARGE_SIZE, method=ZIP_DEFLATED)
+        writer.write_compressed("after.txt", b"tail", zlib.crc32(b"tail"), 4, method=ZIP_STORED)
+        writer.close()
+    _assert_round_trip(str(zip_path), {"large.bin": LARGE_SIZE, "after.txt": b"tail"})
+
+
+def test_streamed_writer_large_entry(tmp_path):
+    large = _sparse_file(tmp_path / "large.bin", LARGE_SIZE)
+    tail = tmp_path / "after.txt"
+    tail.write_bytes(b"tail")
+    members = [(large, "large.bin", ZIP_DEFLATED, LARGE_LEVEL), (str(tail), "after.txt", ZIP_STORED, 0)]
+    zip_path = _stream_to_file(ZipStream(), members, tmp_path / "large.zip")
+    _assert_round_trip(zip_path, {"large.bin": LARGE_SIZE, "after.txt": b"tail"})
+
+
+@pytest.mark.parametrize("method", [ZIP_STORED, ZIP_DEFLATED])
+def test_compress_member_matches_zlib(tmp_path, method):
+    path = tmp_path / "page.html"
+    data = b"<p>compress me</p>" * 100
+    path.write_bytes(data)
+    crc, usize, payload = compress_member(str(path), method)
+    assert (crc, usize) == (zlib.crc32(data), len(data))
+    assert (zlib.decompress(payload, -15) if method == ZIP_DEFLATED else payload) == data
@@ -0,0 +1,187 @@
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit, unquote
+
+# 陷阱规则的种类
+TRAP_REPEATED = "repeated"
+TRAP_PATTERN = "pattern"
+TRAP_TEMPLATE = "template"
+TRAP_PARAM = "param"
+
+# 路径段的泛化：长的十六进制 / UUID 视为 ID，其余数字串视为数字
+ID_SEGMENT_PATTERN = re.compile(r"[0-9a-fA-F]{8}(?:-?[0-9a-fA-F]{4}){3}-?[0-9a-fA-F]{12}|[0-9a-fA-F]{16,}")
+NUMBER_PATTERN = re.compile(r"\d+")
+# 泛化后的占位符对应的 POSIX 正则（wget 的 --reject-regex 不支持 PCRE 语法）
+PLACEHOLDER_REGEX = {"{id}": "[0-9a-fA-F-]+", "{n}": "[0-9]+"}
+PLACEHOLDER_SPLIT = re.compile(r"(\{id\}|\{n\})")
+POSIX_SPECIAL = set("\\.[]()*+?{}|^$")
+
+
+def posix_escape(text: str) -> str:
+    """转义 POSIX 扩展正则的特殊字符"""
+    return "".join("\\" + c if c in POSIX_SPECIAL else c for c in text)
+
+
+def generalize_segment(segment: str) -> str:
+    """把路径段中的 ID 与数字替换为占位符：page12.html -> page{n}.html"""
+    segment = ID_SEGMENT_PATTERN.sub("{id}", segment)
+    return NUMBER_PATTERN.sub("{n}", segment)
+
+
+def _template_regex(template: str) -> str:
+    return "".join(PLACEHOLDER_REGEX.get(part) or posix_escape(part) for part in PLACEHOLDER_SPLIT.split(template))
+
+
+class TrapPolicy:
+    """
+    爬虫陷阱（无限 URL 空间）的识别阈值
+    日历翻页、分面搜索、相对链接导致的路径无限重复等会产生无穷多的 URL，
+    超过阈值的子空间被剪除，不再抓取
+    """
+
+    def __init__(self, max_repeated_segments: int = 3, max_urls_per_pattern: int = 10000,
+                 max_pages_per_template: int = 2000, max_param_values: int = 100, max_restarts: int = 3):
+        """
+        Args:
+            max_repeated_segments: 同一路径段在一个 URL 中最多出现的次数（/a/b/a/b/a/b/...）
+            max_urls_per_pattern: 同一形状目录（数字与 ID 泛化后的父路径）下直接包含的 URL 数量上限
+            max_pages_per_template: 同一模板（泛化后的完整路径 + 查询参数名）的页面数量上限
+            max_param_values: 同一路径下每个查询参数的不同取值数量上限（分面、排序、日历参数）
+            max_restarts: wget 后端为了加入新的剪除规则最多重启的次数
+            各项 <= 0 表示不检查
+        """
+        self.max_repeated_segments = max_repeated_segments
+        self.max_urls_per_pattern = max_urls_per_pattern
+        self.max_pages_per_template = max_pages_per_template
+        self.max_param_values = max_param_values
+        self.max_restarts = max_restarts
+
+
+class TrapRule:
+    """一条剪除规则：被剪除的子空间及对应的 wget --reject-regex"""
+
+    def __init__(self, kind: str, key: str, description: str, regex: str):
+        self.kind = kind
+        self.key = key
+        self.description = description
+        self.regex = regex
+        self.pruned = 0
+
+
+class TrapDetector:
+    """
+    按已发现（尚未抓取）的 URL 统计并识别陷阱
+    check(url) 对每个新 URL 调用一次：计数超过阈值时产生一条规则，此后同一子空间的 URL 都被剪除；
+    计数只保存聚合键，不保存 URL 本身
+    """
+
+    def __init__(self, policy: Optional[TrapPolicy] = None):
+        self.policy = policy or TrapPolicy()
+        self.rules: Dict[Tuple[str, str], TrapRule] = {}
+        self._pattern_counts: Counter = Counter()
+        self._template_counts: Counter = Counter()
+        # (模板路径, 参数名) -> 已见过的取值；超过上限后不再记录
+        self._param_values: Dict[Tuple[str, str], Set[str]] = {}
+
+    @property
+    def pruned(self) -> int:
+        return sum(rule.pruned for rule in self.rules.values())
+
+    def static_regex(self) -> Optional[str]:
+        """
+        不需要计数的规则（路径段重复）对应的 POSIX 正则，供 wget 启动时使用
+        同一段（以 / 分隔的完整段）出现 max_repeated_segments + 1 次即拒绝；
+        只匹配第一个 ? 之前的部分，与 check() 一样不检查查询参数中的路径
+        """
+        limit = self.policy.max_repeated_segments
+        if limit <= 0:
+            return None
+        return "^[^?]*(/[^/?]+)" + r"(/[^?]*)?\1" * limit + r"(/|\?|$)"
+
+    def reject_regex(self) -> Optional[str]:
+        """
+        静态规则与已触发的规则合并为一个 --reject-regex
+        静态规则放在最前且不加括号，使其中的反向引用 \\1 仍指向第一个分组
+        """
+        parts = [self.static_regex()] + [f"({rule.regex})" for rule in self.rules.values() if rule.regex]
+        parts = [p for p in parts if p]
+        return "|".join(parts) if parts else None
+
+    def check(self, url: str) -> Optional[TrapRule]:
+        """登记一个新 URL；属于陷阱时返回对应的规则（规则的 pruned 计数加一），否则返回 None"""
+        rule = self._classify(url)
+        if rule is not None:
+            rule.pruned += 1
+        return rule
+
+    def _rule(self, kind: str, key: str, description: str, regex: str) -> TrapRule:
+        rule = self.rules.get((kind, key))
+        if rule is None:
+            rule = self.rules[(kind, key)] = TrapRule(kind, key, description, regex)
+        return rule
+
+    def _classify(self, url: str) -> Optional[TrapRule]:
+        policy = self.policy
+        scheme, netloc, path, query, _ = urlsplit(url)
+        origin = f"{scheme}://{netloc}"
+        segments = [s for s in path.split('/') if s]
+
+        # 1. 路径段重复
+        if policy.max_repeated_segments > 0 and segments:
+            segment, count = Counter(segments).most_common(1)[0]
+            if count > policy.max_repeated_segments:
+                return self._rule(TRAP_REPEATED, origin,
+                                  f"path segment repeated more than {policy.max_repeated_segments} times "
+                                  f"(e.g. '{unquote(segment)}')", "")
+
+        generalized = [generalize_segment(s) for s in segments]
+        # 目录形状：父路径（/cal/2024/05/ 与 /cal/2024/05/day.html 的父路径分别为 /cal/{n}/ 与 /cal/{n}/{n}/）
+        directory = "/" + "".join(s + "/" for s in generalized[:-1])
+        shape = "/" + "/".join(generalized) + ("/" if path.endswith('/') and generalized else "")
+        names = sorted({p.split('=', 1)[0] for p in query.split('&') if p}) if query else []
+        template = shape + ("?" + "&".join(names) if names else "")
+        shape_regex = "^" + posix_escape(origin) + _template_regex(shape)
+
+        # 2. 已触发的规则（同一模板 / 同一目录形状）
+        rule = self.rules.get((TRAP_TEMPLATE, origin + template)) or self.rules.get((TRAP_PATTERN, origin + directory))
+        if rule is not None:
+            return rule
+
+        # 3. 查询参数取值过多（分面搜索、排序、日历参数）
+        if policy.max_param_values > 0 and query:
+            for pair in query.split('&'):
+                name, _, value = pair.partition('=')
+                key = (origin + shape, name)
+                rule = self.rules.get((TRAP_PARAM, f"{origin}{shape}?{name}"))
+                if rule is not None:
+                    return rule
+                values = self._param_values.setdefault(key, set())
+                if value in values:
+                    continue
+                if len(values) >= policy.max_param_values:
+                    return self._rule(TRAP_PARAM, f"{origin}{shape}?{name}",
+                                      f"more than {policy.max_param_values} values of '{unquote(name)}' on {shape}",
+                                      shape_regex + r"\?(.*&)?" + posix_escape(name) + "=")
+                values.add(value)
+
+        # 4. 同一模板的页面数量
+        if policy.max_pages_per_template > 0:
+            self._template_counts[origin + template] += 1
+            if self._template_counts[origin + template] > policy.max_pages_per_template:
+                regex = shape_regex + (r"\?" if names else "$")
+                return self._rule(TRAP_TEMPLATE, origin + template,
+                                  f"more than {policy.max_pages_per_template} pages like {template}", regex)
+
+        # 5. 同一形状目录下的 URL 数量
+        if policy.max_urls_per_pattern > 0:
+            self._pattern_counts[origin + directory] += 1
+            if self._pattern_counts[origin + directory] > policy.max_urls_per_pattern:
+                regex = "^" + posix_escape(origin) + _template_regex(directory) + "[^/?]*/?(\\?.*)?$"
+                return self._rule(TRAP_PATTERN, origin + directory,
+                                  f"more than {policy.max_urls_per_pattern} URLs in directories like {directory}", regex)
+        return None
+
+    def summary(self) -> List[str]:
+        """每条规则一行的剪除汇总"""
+        return [f"{rule.description}: {rule.pruned} URLs pruned" for rule in self.rules.values()]
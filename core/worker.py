@@ -0,0 +1,251 @@
+import logging
+import os
+import subprocess
+import sys
+import threading
+from multiprocessing import Pipe
+from multiprocessing.connection import Connection
+from typing import Callable, Iterator, Optional, Tuple
+from urllib.parse import urlparse
+
+from utils.file_manager import FileManager
+from utils.parser import LogParser
+from utils.throughput import ThroughputMeter, count_sitemap_urls
+from core.base import create_engine
+from core.budget import CrawlBudget
+from core.jobs import make_job_key
+from core.events import BudgetExhausted, FileSaved, PhaseChanged, PHASE_FINISHED
+from core.manifest import CrawlManifest
+from core.pacing import PacingPolicy
+from core.traps import TrapPolicy
+from core.zipper import CompressionPolicy, ZipEngine
+
+# worker 进程以 "python -m core.worker" 启动，需要能找到项目根目录
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_in_process(target: Callable[..., Iterator], *args, grace_seconds: float = 10.0,
+                   idle_timeout: Optional[float] = None) -> Iterator:
+    """
+    在独立的 worker 进程中运行生成器函数，把它产出的每一项通过 socketpair 传回
+    不使用 multiprocessing 的 spawn：它会在子进程中重新导入 app.py（构建 UI、启动调度器）
+    调用方关闭本生成器（任务取消 / 客户端断开）时通知子进程停止，超时后强制结束；
+    Web 进程退出时连接断开，子进程同样会停止
+
+    Args:
+        target: 模块级生成器函数，以 (*args, cancelled=Event) 调用
+        grace_seconds: 取消后等待子进程自行清理的时间（秒）
+        idle_timeout: 设置后，子进程超过该时间（秒）没有产出时产出 None，便于调用方发送积压的进度
+    """
+    conn, child_conn = Pipe()
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (PROJECT_ROOT, env.get("PYTHONPATH")) if p)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "core.worker", str(child_conn.fileno())],
+        pass_fds=(child_conn.fileno(),),
+        env=env,
+    )
+    child_conn.close()
+    try:
+        conn.send((target, args))
+        while True:
+            if idle_timeout is not None and not conn.poll(idle_timeout):
+                yield None
+                continue
+            try:
+                item = conn.recv()
+            except EOFError:
+                break
+            yield item
+    finally:
+        try:
+            conn.send("cancel")
+        except OSError:
+            pass
+        # 关闭连接后，阻塞在 send 上的子进程会立即收到 BrokenPipeError
+        conn.close()
+        try:
+            process.wait(timeout=grace_seconds)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def _child_main(fd: int):
+    """worker 进程入口：接收任务，逐项回传产出，同时监听取消信号"""
+    logging.basicConfig(level=logging.INFO)
+    conn = Connection(fd)
+    target, args = conn.recv()
+    cancelled = threading.Event()
+
+    def listen():
+        try:
+            conn.recv()
+        except (EOFError, OSError):
+            pass
+        cancelled.set()
+
+    threading.Thread(target=listen, daemon=True).start()
+
+    items = target(*args, cancelled=cancelled)
+    try:
+        for item in items:
+            conn.send(item)
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    finally:
+        # 关闭生成器，触发任务内部的清理（停止引擎、保存断点）
+        items.close()
+        conn.close()
+
+
+def crawl_and_package(job_id: str, url: str, engine_name: str, archive_format: str, stream_archive: bool,
+                      settings: dict, budget: Optional[dict] = None, cancelled=None) -> Iterator[tuple]:
+    """
+    worker 进程中执行的任务主体：下载并打包
+    产出 ("progress", 新增日志, 文件数, 错误数, 状态, 吞吐统计) 进度事件，最后产出 ("result", 结果)；
+    结果缓存、镜像保留与流式链接由 Web 进程根据结果处理；预算用完时 result["budget"] 为说明，
+    此时 result["incremental"] 为 False（不完整的目录不保留为镜像）
+
+    Args:
+        settings: pipelined_zip / zip_workers / zip_text_level / sitemap_eta / pacing（PacingPolicy 的参数）/
+                  traps（TrapPolicy 的参数）/ frontier（原生引擎的抓取前沿参数）/
+                  budget_ceiling（本机的预算上限，CrawlBudget 的参数）
+        budget: 任务预算（CrawlBudget 的参数），执行前再按本机的上限约束一次
+    """
+    result = {"folder": None, "archive": None, "incremental": False, "keep_files": True, "budget": None}
+    yield from _run_pipeline(job_id, url, engine_name, archive_format, stream_archive, settings, budget,
+                             cancelled, result)
+    yield "result", result
+
+
+def estimate_site_size(fm: FileManager, url: str, use_sitemap: bool = False) -> Tuple[Optional[int], Optional[int]]:
+    """
+    估算站点规模，供 ETA 使用：优先用上一次抓取的清单或镜像，其次用 sitemap 中的 URL 数量
+
+    Returns:
+        Tuple[Optional[int], Optional[int]]: (预期文件数, 预期字节数)，未知为 None
+    """
+    parsed = urlparse(url)
+    domain = parsed.hostname or parsed.netloc
+
+    # 1. 原生引擎的抓取清单（每个 URL 的大小都有记录）
+    manifest = CrawlManifest(fm.get_paths()['manifest'], domain).load()
+    if manifest.entries:
+        return len(manifest.entries), manifest.total_size()
+
+    # 2. 上一次保留的镜像（wget 的目录名可能带端口）
+    for name in dict.fromkeys((domain, parsed.netloc)):
+        stats = fm.mirror_stats(name)
+        if stats and stats[0]:
+            return stats
+
+    # 3. sitemap 只给出页面数量，不含图片、样式等资源，仅作粗略估计
+    if use_sitemap:
+        return count_sitemap_urls(url), None
+    return None, None
+
+
+def _run_pipeline(job_id, url, engine_name, archive_format, stream_archive, settings, budget, cancelled, result):
+    fm = FileManager()
+    try:
+        pacing = PacingPolicy(**settings["pacing"]) if settings.get("pacing") else None
+        traps = TrapPolicy(**settings["traps"]) if settings.get("traps") else None
+        # 断点按任务键区分：同一站点、选项不同的任务可能同时运行
+        checkpoint_key = make_job_key(url, engine_name, archive_format, stream_archive, budget)
+        budget = CrawlBudget.from_dict(budget).capped(CrawlBudget.from_dict(settings.get("budget_ceiling")))
+        engine = create_engine(engine_name, fm, job_id=job_id, pacing=pacing, traps=traps, budget=budget,
+                               checkpoint_key=checkpoint_key, **settings.get("frontier", {}))
+    except (ValueError, RuntimeError) as e:
+        result["keep_files"] = False
+        yield "progress", f"❌ Error: {str(e)}", 0, 0, "❌ Error", None
+        return
+    result["incremental"] = engine.incremental
+    zipper = ZipEngine(fm, workers=settings["zip_workers"],
+                       policy=CompressionPolicy(text_level=settings["zip_text_level"]), job_id=job_id)
+    expected_files, expected_bytes = estimate_site_size(fm, url, settings.get("sitemap_eta", False))
+    # ETA 不超过预算
+    if budget.max_files:
+        expected_files = min(expected_files or budget.max_files, budget.max_files)
+    if budget.max_bytes and expected_bytes:
+        expected_bytes = min(expected_bytes, budget.max_bytes)
+    meter = ThroughputMeter(expected_bytes=expected_bytes, expected_files=expected_files)
+    parser = LogParser(meter=meter)
+    use_pipeline = settings["pipelined_zip"] and archive_format == "zip" and not stream_archive
+    stats = {'files': 0, 'errors': 0}
+
+    yield "progress", f"🚀 Initializing download engine ({engine_name})...\n", 0, 0, "Starting...", None
+    if budget:
+        yield "progress", f"🎯 Crawl budget: {budget.describe()}\n", 0, 0, "Starting...", None
+    if expected_files:
+        yield ("progress", f"📏 Expecting about {expected_files} files (used for the ETA)\n",
+               0, 0, "Starting...", meter.snapshot())
+
+    pipeline = None
+    try:
+        # 阶段 1: 下载（流水线模式下同时在后台压缩已保存的文件）
+        downloaded_folder = None
+        for event in engine.events(url):
+            clean_line, stats = parser.process_event(event)
+            if isinstance(event, PhaseChanged) and event.phase == PHASE_FINISHED:
+                downloaded_folder = event.folder
+            elif isinstance(event, BudgetExhausted):
+                result["budget"] = event.message
+            if use_pipeline and isinstance(event, FileSaved) and engine.current_website_dir:
+                if pipeline is None:
+                    pipeline = zipper.open_pipeline(engine.current_website_dir)
+                pipeline.submit(event.path)
+
+            yield ("progress", clean_line or "", stats['files'], stats['errors'], "⬇️ Downloading...",
+                   meter.snapshot())
+            if cancelled is not None and cancelled.is_set():
+                return
+
+        # 下载结束后吞吐统计保持不变
+        metrics = meter.snapshot()
+
+        # 预算提前结束的目录只是站点的一部分，不保留为镜像，上一次的镜像保持不变
+        if result["budget"]:
+            result["incremental"] = False
+
+        # 阶段 2: 压缩（流式模式下由 Web 进程登记下载链接，ZIP 在客户端下载时实时生成）
+        if downloaded_folder and stream_archive:
+            result["folder"] = downloaded_folder
+
+        elif downloaded_folder:
+            yield ("progress", "\n📦 Compressing files... This may take a moment.\n",
+                   stats['files'], stats['errors'], "📦 Compressing...", metrics)
+            try:
+                zip_path = None
+                if pipeline is not None:
+                    zip_path = pipeline.finish()
+                    pipeline = None
+                if zip_path is None:
+                    zip_path = zipper.compress(downloaded_folder, archive_format)
+                result["folder"] = downloaded_folder
+                result["archive"] = zip_path
+            except Exception as z_err:
+                yield "progress", f"\n❌ Compression Error: {str(z_err)}\n", stats['files'], stats['errors'], "❌ Error", metrics
+        else:
+            yield "progress", "\n❌ Download failed or directory empty.\n", stats['files'], stats['errors'], "❌ Failed", metrics
+
+    except Exception as e:
+        yield "progress", f"\n❌ Critical Application Error: {str(e)}\n", 0, 0, "❌ Error", None
+    finally:
+        if pipeline is not None:
+            pipeline.abort()
+        engine.stop()
+        result["keep_files"] = engine.keeps_partial_files
+
+
+def stream_zip(source_dir: str, text_level: int, cancelled=None) -> Iterator[bytes]:
+    """worker 进程中生成流式 ZIP 的数据块"""
+    zipper = ZipEngine(FileManager(), policy=CompressionPolicy(text_level=text_level))
+    for chunk in zipper.stream(source_dir):
+        yield chunk
+        if cancelled is not None and cancelled.is_set():
+            return
+
+
+if __name__ == "__main__":
+    _child_main(int(sys.argv[1]))
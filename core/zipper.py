@@ -1,52 +1,348 @@
-import shutil
+import mimetypes
 import os
+import queue
+import threading
 import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from typing import Dict, Iterable, Iterator, Optional, Tuple
 from utils.file_manager import FileManager
+from core.zipwriter import RawZipWriter, ZipStream, compress_member, ZIP_DEFLATED, ZIP_STORED
+from core.tarball import write_tarball, zstd_available
+
+# 支持的输出格式 -> 文件后缀
+ARCHIVE_FORMATS = {
+    "zip": ".zip",
+    "tar.zst": ".tar.zst",
+    "tar.gz": ".tar.gz",
+}
+
+# 超过该大小的文件在主进程中流式压缩，避免整个文件经由进程间管道传输
+LARGE_FILE_THRESHOLD = 64 * 1024 * 1024
+
+# 本身已经压缩过的格式，再 deflate 几乎没有收益，直接 STORED
+STORED_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif', '.ico',
+    '.woff', '.woff2',
+    '.mp4', '.webm', '.mov', '.mkv', '.mp3', '.ogg', '.m4a',
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.zst', '.7z', '.rar', '.br',
+    '.pdf', '.jar', '.apk',
+}
+STORED_MIME_PREFIXES = ('image/', 'video/', 'audio/', 'font/woff')
+# 压缩效果好的文本类型（包括 SVG 这类文本格式的图片）
+TEXT_MIME_TYPES = ('image/svg+xml', 'application/javascript', 'application/json', 'application/xml')
+
+# 会被 wget -k / 原生引擎在抓取结束时改写链接的文件，流水线压缩时推迟到最后
+DEFERRED_SUFFIXES = ('.html', '.htm', '.xhtml', '.css')
+
+
+class CompressionPolicy:
+    """
+    成员压缩策略
+    按扩展名 / MIME 类型决定每个成员写为 STORED 还是 DEFLATED 以及压缩级别
+    """
+
+    def __init__(self, text_level: int = 6, default_level: int = 6,
+                 stored_extensions: Optional[Iterable[str]] = None,
+                 overrides: Optional[Dict[str, Tuple[int, int]]] = None):
+        """
+        Args:
+            text_level: 文本类型（HTML/CSS/JS/JSON/SVG 等）的 deflate 级别
+            default_level: 其他未知类型的 deflate 级别
+            stored_extensions: 直接 STORED 的扩展名集合，默认使用 STORED_EXTENSIONS
+            overrides: 按扩展名覆盖的 (压缩方式, 级别)，如 {'.svg': (ZIP_DEFLATED, 9)}
+        """
+        self.text_level = text_level
+        self.default_level = default_level
+        self.stored_extensions = set(stored_extensions) if stored_extensions is not None else STORED_EXTENSIONS
+        self.overrides = {k.lower(): v for k, v in (overrides or {}).items()}
+
+    def for_path(self, path: str) -> Tuple[int, int]:
+        """返回 (压缩方式, 压缩级别)"""
+        ext = os.path.splitext(path)[1].lower()
+        # wget 保存的带查询串的文件名，如 style.css?v=3
+        if '?' in ext:
+            ext = ext.split('?', 1)[0]
+        if ext in self.overrides:
+            return self.overrides[ext]
+        if ext in self.stored_extensions:
+            return ZIP_STORED, 0
+
+        mime, encoding = mimetypes.guess_type(path.split('?', 1)[0])
+        if encoding:
+            # .gz/.br 等已压缩的传输编码
+            return ZIP_STORED, 0
+        if mime:
+            if mime.startswith('text/') or mime in TEXT_MIME_TYPES:
+                return ZIP_DEFLATED, self.text_level
+            if mime.startswith(STORED_MIME_PREFIXES):
+                return ZIP_STORED, 0
+        return ZIP_DEFLATED, self.default_level
+
 
 class ZipEngine:
     """
     压缩引擎 (更新版)
-    集成 FileManager 获取输出路径
+    集成 FileManager 获取输出路径，支持 zip / tar.zst / tar.gz 输出
     """
 
-    def __init__(self, file_manager: FileManager):
+    def __init__(self, file_manager: FileManager, workers: int = 1,
+                 policy: Optional[CompressionPolicy] = None, job_id: Optional[str] = None):
         """
         Args:
             file_manager: 初始化的 FileManager 实例
+            workers: 并行压缩的进程数（tar 格式为压缩线程数），1 表示在当前进程中顺序压缩
+            policy: 成员压缩策略，默认对已压缩格式使用 STORED
+            job_id: 任务 ID；指定时归档命名为 <域名>_<job_id>，不同任务不会重名
         """
         self.fm = file_manager
         self.paths = self.fm.get_paths()
         self.output_dir = self.paths['zip']
+        self.workers = max(1, workers)
+        self.policy = policy or CompressionPolicy()
+        self.job_id = job_id
 
-    def compress(self, source_dir: str) -> str:
-        """
-        将指定目录打包为 ZIP
-        """
-        if not os.path.exists(source_dir):
-            raise FileNotFoundError(f"Source directory not found: {source_dir}")
+    @staticmethod
+    def available_formats():
+        """当前主机可用的输出格式"""
+        return [fmt for fmt in ARCHIVE_FORMATS if fmt != "tar.zst" or zstd_available()]
 
-        # 准备文件名
+    def _output_base_path(self, source_dir: str, suffix: str = ".zip") -> str:
+        """根据站点目录生成输出路径（不含后缀）"""
         base_name = os.path.basename(os.path.normpath(source_dir))
+        if self.job_id:
+            return os.path.join(self.output_dir, f"{base_name}_{self.job_id}")
         output_base_path = os.path.join(self.output_dir, base_name)
-        
+
         # 简单的防重名策略
-        if os.path.exists(output_base_path + ".zip"):
+        if os.path.exists(output_base_path + suffix):
             timestamp = int(time.time())
             output_base_path = f"{output_base_path}_{timestamp}"
+        return output_base_path
+
+    def compress(self, source_dir: str, archive_format: str = "zip") -> str:
+        """
+        将指定目录打包为 ZIP（或 tar.zst / tar.gz）
+        """
+        if not os.path.exists(source_dir):
+            raise FileNotFoundError(f"Source directory not found: {source_dir}")
+        if archive_format not in ARCHIVE_FORMATS:
+            raise ValueError(f"Unsupported archive format: {archive_format}")
+
+        # 准备文件名
+        suffix = ARCHIVE_FORMATS[archive_format]
+        output_base_path = self._output_base_path(source_dir, suffix)
+
+        if archive_format != "zip":
+            return self._compress_tar(source_dir, output_base_path + suffix, archive_format.split('.', 1)[1])
+
+        if self.workers > 1:
+            return self._compress_parallel(source_dir, output_base_path + ".zip")
+
+        zip_path = output_base_path + ".zip"
+        try:
+            # 顺序压缩：与 make_archive 的成员布局一致，但按策略逐个选择压缩方式
+            root_dir = os.path.dirname(os.path.abspath(source_dir))
+            with zipfile.ZipFile(zip_path, 'w') as zf:
+                for path in self._walk_files(source_dir):
+                    method, level = self.policy.for_path(path)
+                    zf.write(path, arcname=os.path.relpath(path, root_dir),
+                             compress_type=method, compresslevel=level if method == ZIP_DEFLATED else None)
+
+            return zip_path
+
+        except Exception as e:
+            try:
+                os.remove(zip_path)
+            except FileNotFoundError:
+                pass
+            raise Exception(f"Compression failed: {str(e)}")
+
+    def _walk_files(self, source_dir: str):
+        source_dir = os.path.abspath(source_dir)
+        for root, dirs, names in os.walk(source_dir):
+            dirs.sort()
+            for name in sorted(names):
+                yield os.path.join(root, name)
+
+    def _compress_parallel(self, source_dir: str, zip_path: str) -> str:
+        """
+        多进程并行压缩：各成员在进程池中独立 deflate，
+        主进程按顺序把压缩好的数据写入 ZIP（CRC、偏移由 RawZipWriter 维护）
+        """
+        root_dir = os.path.dirname(os.path.abspath(source_dir))
+        files = list(self._walk_files(source_dir))
 
         try:
-            # 这里的逻辑保持不变，依然使用 shutil
-            parent_dir = os.path.dirname(source_dir)
-            target_folder_name = os.path.basename(source_dir)
-
-            zip_path = shutil.make_archive(
-                base_name=output_base_path,
-                format='zip',
-                root_dir=parent_dir,
-                base_dir=target_folder_name
-            )
-            
+            with open(zip_path, 'wb') as f, ProcessPoolExecutor(max_workers=self.workers) as pool:
+                writer = RawZipWriter(f)
+                # 限制在途任务数量，控制内存占用
+                pending = deque()
+                window = self.workers * 4
+
+                def drain(limit: int):
+                    while len(pending) > limit:
+                        path, method, level, future = pending.popleft()
+                        arcname = os.path.relpath(path, root_dir)
+                        if future is None:
+                            writer.write_file_streaming(path, arcname, method=method, level=level)
+                        else:
+                            crc, usize, payload = future.result()
+                            writer.write_compressed(arcname, payload, crc, usize, method=method,
+                                                    mtime=os.path.getmtime(path))
+
+                for path in files:
+                    method, level = self.policy.for_path(path)
+                    # STORED 成员只需拷贝，不值得经过进程池
+                    if method == ZIP_STORED or os.path.getsize(path) >= LARGE_FILE_THRESHOLD:
+                        pending.append((path, method, level, None))
+                    else:
+                        pending.append((path, method, level, pool.submit(compress_member, path, method, level)))
+                    drain(window)
+                drain(0)
+                writer.close()
             return zip_path
 
         except Exception as e:
-            raise Exception(f"Compression failed: {str(e)}")
\ No newline at end of file
+            try:
+                os.remove(zip_path)
+            except FileNotFoundError:
+                pass
+            raise Exception(f"Compression failed: {str(e)}")
+
+    def _compress_tar(self, source_dir: str, output_path: str, compression: str) -> str:
+        """多线程 zstd / 分块并行 gzip 打包"""
+        try:
+            write_tarball(source_dir, output_path, compression, threads=self.workers)
+            return output_path
+        except Exception as e:
+            try:
+                os.remove(output_path)
+            except FileNotFoundError:
+                pass
+            raise Exception(f"Compression failed: {str(e)}")
+
+    def stream(self, source_dir: str, chunk_size: int = 1 << 20) -> Iterator[bytes]:
+        """
+        边生成边输出 ZIP，不在磁盘上写归档文件
+        适合直接作为 HTTP 响应体：首个字节立即可用，内存占用与 chunk_size 相当
+        """
+        if not os.path.exists(source_dir):
+            raise FileNotFoundError(f"Source directory not found: {source_dir}")
+
+        root_dir = os.path.dirname(os.path.abspath(source_dir))
+        zs = ZipStream(chunk_size=chunk_size)
+        for path in self._walk_files(source_dir):
+            method, level = self.policy.for_path(path)
+            yield from zs.stream_file(path, os.path.relpath(path, root_dir), method=method, level=level)
+        yield from zs.finish()
+
+    def open_pipeline(self, source_dir: str) -> "PipelinedZip":
+        """
+        开启流水线压缩：下载过程中每保存一个文件就在后台写入 ZIP
+        """
+        return PipelinedZip(self._output_base_path(source_dir) + ".zip", source_dir, self.policy)
+
+
+class PipelinedZip:
+    """
+    流水线压缩
+    接收 "文件已保存" 事件，在后台线程中边下载边写入 ZIP；
+    需要改写链接的文件推迟到 finish() 时统一写入
+    """
+
+    def __init__(self, zip_path: str, source_dir: str, policy: Optional[CompressionPolicy] = None):
+        """
+        Args:
+            zip_path: 输出 ZIP 的完整路径
+            source_dir: 站点目录，成员名相对于它的上一级目录（与 make_archive 一致）
+            policy: 成员压缩策略
+        """
+        self.zip_path = zip_path
+        self.policy = policy or CompressionPolicy()
+        self.source_dir = os.path.abspath(source_dir)
+        self.root_dir = os.path.dirname(self.source_dir)
+
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        # 已写入成员: 绝对路径 -> (大小, mtime)，用于 finish() 时发现被再次修改的文件
+        self._added: Dict[str, Tuple[int, float]] = {}
+        self._error: Optional[BaseException] = None
+        self._zip = zipfile.ZipFile(self.zip_path, 'w', compression=zipfile.ZIP_DEFLATED)
+        self._thread = threading.Thread(target=self._worker, name="zip-pipeline", daemon=True)
+        self._thread.start()
+
+    def submit(self, file_path: str):
+        """登记一个已保存的文件；目录外或需推迟的文件直接忽略"""
+        path = os.path.abspath(file_path)
+        if not path.startswith(self.source_dir + os.sep):
+            return
+        if path.lower().endswith(DEFERRED_SUFFIXES):
+            return
+        self._queue.put(path)
+
+    def _worker(self):
+        while True:
+            path = self._queue.get()
+            if path is None:
+                break
+            if self._error is not None or path in self._added:
+                continue
+            try:
+                self._add(path)
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                self._error = e
+
+    def _add(self, path: str):
+        st = os.stat(path)
+        method, level = self.policy.for_path(path)
+        self._zip.write(path, arcname=os.path.relpath(path, self.root_dir),
+                        compress_type=method, compresslevel=level if method == ZIP_DEFLATED else None)
+        self._added[path] = (st.st_size, st.st_mtime)
+
+    def finish(self) -> Optional[str]:
+        """
+        等待后台写入完成，补齐剩余文件（推迟的文件、增量复用的文件）并关闭 ZIP
+
+        Returns:
+            Optional[str]: ZIP 路径；若已写入的文件在之后被修改则返回 None，调用方应回退到整体压缩
+        """
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            self.abort()
+            raise Exception(f"Compression failed: {str(self._error)}")
+
+        try:
+            for root, _, files in os.walk(self.source_dir):
+                for name in files:
+                    path = os.path.join(root, name)
+                    if path in self._added:
+                        st = os.stat(path)
+                        if (st.st_size, st.st_mtime) != self._added[path]:
+                            # ZIP 成员无法原地替换
+                            self.abort()
+                            return None
+                        continue
+                    self._add(path)
+            self._zip.close()
+            return self.zip_path
+        except Exception as e:
+            self.abort()
+            raise Exception(f"Compression failed: {str(e)}")
+
+    def abort(self):
+        """放弃流水线并删除不完整的 ZIP"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        try:
+            self._zip.close()
+        except Exception:
+            pass
+        try:
+            os.remove(self.zip_path)
+        except FileNotFoundError:
+            pass
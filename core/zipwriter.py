@@ -0,0 +1,293 @@
+import os
+import struct
+import time
+import zlib
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+# ZIP 格式常量
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+ZIP32_LIMIT = 0xFFFFFFFF
+ZIP16_LIMIT = 0xFFFF
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END_RECORD = struct.Struct("<IHHHHIIH")
+_ZIP64_END_RECORD = struct.Struct("<IQHHIIQQQQ")
+_ZIP64_LOCATOR = struct.Struct("<IIQI")
+
+_FLAG_UTF8 = 0x800
+_FLAG_DATA_DESCRIPTOR = 0x08
+
+
+def dos_datetime(timestamp: float) -> Tuple[int, int]:
+    """把时间戳转换为 ZIP 使用的 DOS 日期/时间"""
+    t = time.localtime(timestamp)
+    year = max(t.tm_year, 1980)
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+def compress_member(path: str, method: int = ZIP_DEFLATED, level: int = 6) -> Tuple[int, int, bytes]:
+    """
+    读取并压缩单个文件（在进程池中执行）
+
+    Returns:
+        Tuple[int, int, bytes]: (crc32, 原始大小, 压缩后的数据)
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    crc = zlib.crc32(data)
+    if method == ZIP_DEFLATED:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        payload = compressor.compress(data) + compressor.flush()
+    else:
+        payload = data
+    return crc, len(data), payload
+
+
+class _Entry:
+    __slots__ = ("name", "method", "flags", "dos_time", "dos_date", "crc", "csize", "usize", "offset")
+
+    def __init__(self, name: bytes, method: int, flags: int, dos_time: int, dos_date: int):
+        self.name = name
+        self.method = method
+        self.flags = flags
+        self.dos_time = dos_time
+        self.dos_date = dos_date
+        self.crc = 0
+        self.csize = 0
+        self.usize = 0
+        self.offset = 0
+
+
+class RawZipWriter:
+    """
+    底层 ZIP 写入器
+    直接写入已经压缩好的成员数据（由进程池并行压缩），
+    自行维护本地文件头、偏移与中央目录，超过 4GB 时自动使用 ZIP64
+    """
+
+    def __init__(self, fileobj: BinaryIO):
+        """
+        Args:
+            fileobj: 以二进制写模式打开的输出文件
+        """
+        self.fp = fileobj
+        self.offset = 0
+        self.entries: List[_Entry] = []
+
+    def _write(self, data: bytes):
+        self.fp.write(data)
+        self.offset += len(data)
+
+    def _local_header(self, entry: _Entry, zip64: bool) -> bytes:
+        extra = b""
+        csize, usize = entry.csize, entry.usize
+        if zip64:
+            extra = struct.pack("<HHQQ", 0x0001, 16, entry.usize, entry.csize)
+            csize = usize = ZIP32_LIMIT
+        version = 45 if zip64 else 20
+        header = _LOCAL_HEADER.pack(
+            0x04034b50, version, entry.flags, entry.method, entry.dos_time, entry.dos_date,
+            entry.crc, csize, usize, len(entry.name), len(extra),
+        )
+        return header + entry.name + extra
+
+    def _new_entry(self, arcname: str, method: int, mtime: float, flags: int = 0) -> _Entry:
+        dos_time, dos_date = dos_datetime(mtime)
+        name = arcname.replace(os.sep, '/').encode('utf-8')
+        return _Entry(name, method, flags | _FLAG_UTF8, dos_time, dos_date)
+
+    def write_compressed(self, arcname: str, payload: bytes, crc: int, usize: int,
+                         method: int = ZIP_DEFLATED, mtime: Optional[float] = None):
+        """写入一个已压缩的成员"""
+        entry = self._new_entry(arcname, method, mtime if mtime is not None else time.time())
+        entry.crc = crc
+        entry.csize = len(payload)
+        entry.usize = usize
+        entry.offset = self.offset
+        zip64 = entry.csize >= ZIP32_LIMIT or entry.usize >= ZIP32_LIMIT
+        self._write(self._local_header(entry, zip64))
+        self._write(payload)
+        self.entries.append(entry)
+
+    def write_file_streaming(self, path: str, arcname: str, method: int = ZIP_DEFLATED,
+                             level: int = 6, chunk_size: int = 1 << 20):
+        """
+        流式压缩大文件：先写占位的本地文件头，写完数据后回填 CRC 与大小
+        （输出必须可 seek，占位头始终预留 ZIP64 字段）
+        """
+        st = os.stat(path)
+        entry = self._new_entry(arcname, method, st.st_mtime)
+        entry.offset = self.offset
+        header_len = len(self._local_header(entry, True))
+        self._write(b"\0" * header_len)
+
+        crc = 0
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15) if method == ZIP_DEFLATED else None
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                crc = zlib.crc32(chunk, crc)
+                entry.usize += len(chunk)
+                out = compressor.compress(chunk) if compressor else chunk
+                entry.csize += len(out)
+                self._write(out)
+        if compressor:
+            out = compressor.flush()
+            entry.csize += len(out)
+            self._write(out)
+        entry.crc = crc
+
+        end = self.fp.tell()
+        self.fp.seek(end - entry.csize - header_len)
+        self.fp.write(self._local_header(entry, True))
+        self.fp.seek(end)
+        self.entries.append(entry)
+
+    def close(self):
+        """写入中央目录与结束记录"""
+        cd_start = self.offset
+        for entry in self.entries:
+            extra_fields = []
+            usize, csize, offset = entry.usize, entry.csize, entry.offset
+            if usize >= ZIP32_LIMIT:
+                extra_fields.append(usize)
+                usize = ZIP32_LIMIT
+            if csize >= ZIP32_LIMIT:
+                extra_fields.append(csize)
+                csize = ZIP32_LIMIT
+            if offset >= ZIP32_LIMIT:
+                extra_fields.append(offset)
+                offset = ZIP32_LIMIT
+            extra = b""
+            if extra_fields:
+                extra = struct.pack(f"<HH{len(extra_fields)}Q", 0x0001, 8 * len(extra_fields), *extra_fields)
+            version = 45 if extra_fields else 20
+            header = _CENTRAL_HEADER.pack(
+                0x02014b50, (3 << 8) | version, version, entry.flags, entry.method,
+                entry.dos_time, entry.dos_date, entry.crc, csize, usize,
+                len(entry.name), len(extra), 0, 0, 0, (0o100644 << 16), offset,
+            )
+            self._write(header + entry.name + extra)
+
+        cd_size = self.offset - cd_start
+        count = len(self.entries)
+        if count >= ZIP16_LIMIT or cd_start >= ZIP32_LIMIT or cd_size >= ZIP32_LIMIT:
+            zip64_start = self.offset
+            self._write(_ZIP64_END_RECORD.pack(
+                0x06064b50, _ZIP64_END_RECORD.size - 12, (3 << 8) | 45, 45, 0, 0,
+                count, count, cd_size, cd_start,
+            ))
+            self._write(_ZIP64_LOCATOR.pack(0x07064b50, 0, zip64_start, 1))
+            count = min(count, ZIP16_LIMIT)
+            cd_size = min(cd_size, ZIP32_LIMIT)
+            cd_start = min(cd_start, ZIP32_LIMIT)
+        self._write(_END_RECORD.pack(0x06054b50, 0, 0, count, count, cd_size, cd_start, 0))
+        self.fp.flush()
+
+
+class _ChunkSink:
+    """收集写入的数据，供流式输出时分块取走"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def write(self, data: bytes):
+        if data:
+            self.chunks.append(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> List[bytes]:
+        chunks, self.chunks = self.chunks, []
+        return chunks
+
+
+class ZipStream(RawZipWriter):
+    """
+    流式 ZIP 生成器
+    不需要可 seek 的输出：DEFLATED 成员使用数据描述符（data descriptor）在数据之后补写 CRC 与大小，
+    STORED 成员预先读一遍计算 CRC；内存占用只与 chunk_size 有关
+    """
+
+    def __init__(self, chunk_size: int = 1 << 20):
+        """
+        Args:
+            chunk_size: 每次读取/输出的数据块大小
+        """
+        self.sink = _ChunkSink()
+        super().__init__(self.sink)
+        self.chunk_size = chunk_size
+
+    def stream_file(self, path: str, arcname: str, method: int = ZIP_DEFLATED,
+                    level: int = 6) -> Iterator[bytes]:
+        """逐块产出一个成员的本地文件头、数据与数据描述符"""
+        st = os.stat(path)
+
+        if method == ZIP_STORED:
+            crc = 0
+            with open(path, 'rb') as f:
+                while True:
+                    chunk = f.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    crc = zlib.crc32(chunk, crc)
+            entry = self._new_entry(arcname, method, st.st_mtime)
+            entry.crc, entry.csize, entry.usize = crc, st.st_size, st.st_size
+            entry.offset = self.offset
+            self._write(self._local_header(entry, st.st_size >= ZIP32_LIMIT))
+            yield from self.sink.drain()
+            with open(path, 'rb') as f:
+                while True:
+                    chunk = f.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    self._write(chunk)
+                    yield chunk
+                    self.sink.drain()
+            self.entries.append(entry)
+            return
+
+        # deflate 可能略微膨胀，接近 4GB 的文件提前按 ZIP64 处理
+        zip64 = st.st_size >= ZIP32_LIMIT - (1 << 24)
+        entry = self._new_entry(arcname, method, st.st_mtime, flags=_FLAG_DATA_DESCRIPTOR)
+        entry.offset = self.offset
+        self._write(self._local_header(entry, zip64))
+        yield from self.sink.drain()
+
+        crc = 0
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    break
+                crc = zlib.crc32(chunk, crc)
+                entry.usize += len(chunk)
+                out = compressor.compress(chunk)
+                if out:
+                    entry.csize += len(out)
+                    self._write(out)
+                    yield from self.sink.drain()
+        out = compressor.flush()
+        entry.csize += len(out)
+        self._write(out)
+        entry.crc = crc
+
+        if zip64:
+            self._write(struct.pack("<IIQQ", 0x08074b50, crc, entry.csize, entry.usize))
+        else:
+            self._write(struct.pack("<IIII", 0x08074b50, crc, entry.csize, entry.usize))
+        yield from self.sink.drain()
+        self.entries.append(entry)
+
+    def finish(self) -> Iterator[bytes]:
+        """产出中央目录与结束记录"""
+        self.close()
+        yield from self.sink.drain()
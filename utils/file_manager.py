@@ -1,22 +1,48 @@
 import os
+import json
 import shutil
+import threading
 import time
 import logging
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Union
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows 下只有进程内的线程锁
+    fcntl = None
+
+# 输出目录中由 ZipEngine 生成的归档文件
+ARCHIVE_PATTERNS = ("*.zip", "*.tar.zst", "*.tar.gz")
 
 class FileManager:
     """
     文件系统管理器
     负责初始化目录结构、清理过期文件以及安全路径检查。
     解决了原项目 "Known Issues #2: Storage management" 的问题。
+    每个任务在 temp_sites/<job_id>/ 下拥有独立的工作目录，互不干扰。
     """
 
+    # 进程内所有实例共享：正在使用的任务工作目录，以及镜像目录的读写锁（跨进程时配合文件锁）
+    _active_jobs: Dict[str, Path] = {}
+    # 任务在运行期间持有的共享文件锁 temp_sites/.<job_id>.lock，其他进程据此判断任务是否仍在运行
+    _job_locks: Dict[str, object] = {}
+    _jobs_lock = threading.Lock()
+    _mirror_lock = threading.Lock()
+
     def __init__(self, base_storage_path: str = "storage"):
         # 使用 pathlib 处理路径更安全
         self.root = Path(base_storage_path)
         self.temp_dir = self.root / "temp_sites"
         self.zip_dir = self.root / "output_zips"
+        # 增量镜像：上一次成功任务的站点副本与抓取清单
+        self.mirror_dir = self.root / "mirrors"
+        self.manifest_dir = self.root / "manifests"
+        # 断点续传：未完成任务的抓取状态
+        self.checkpoint_dir = self.root / "checkpoints"
+        # 任务的完整日志（界面只显示尾部）
+        self.log_dir = self.root / "logs"
         
         # 初始化日志
         self.logger = logging.getLogger("FileManager")
@@ -25,14 +51,19 @@ class FileManager:
         """初始化存储目录结构"""
         self.temp_dir.mkdir(parents=True, exist_ok=True)
         self.zip_dir.mkdir(parents=True, exist_ok=True)
+        self.mirror_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_dir.mkdir(parents=True, exist_ok=True)
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        self.log_dir.mkdir(parents=True, exist_ok=True)
         self.logger.info(f"Storage initialized at: {self.root.absolute()}")
 
-    def cleanup_old_files(self, max_age_minutes: int = 60):
+    def cleanup_old_files(self, max_age_minutes: int = 60, exclude: Optional[Iterable[str]] = None):
         """
-        清理过期的 ZIP 文件，防止磁盘爆满。
+        清理过期的归档文件（ZIP / tar.zst / tar.gz），防止磁盘爆满。
         
         Args:
             max_age_minutes: 文件保留的最长时间（分钟），默认 60 分钟
+            exclude: 需要保留的文件路径（如结果缓存中的归档）
         """
         if not self.zip_dir.exists():
             return
@@ -40,9 +71,12 @@ class FileManager:
         current_time = time.time()
         age_seconds = max_age_minutes * 60
         count = 0
+        keep = {os.path.abspath(p) for p in (exclude or [])}
 
         try:
-            for file_path in self.zip_dir.glob("*.zip"):
+            for file_path in self._archive_files():
+                if os.path.abspath(file_path) in keep:
+                    continue
                 # 获取文件最后修改时间
                 file_age = current_time - file_path.stat().st_mtime
                 
@@ -55,11 +89,164 @@ class FileManager:
                         self.logger.error(f"Failed to delete {file_path.name}: {e}")
             
             if count > 0:
-                print(f"[FileManager] Cleaned up {count} expired ZIP files.")
+                print(f"[FileManager] Cleaned up {count} expired archive files.")
                 
         except Exception as e:
             self.logger.error(f"Error during cleanup: {e}")
 
+    def _archive_files(self):
+        """输出目录中的所有归档文件（zip / tar.zst / tar.gz）"""
+        for pattern in ARCHIVE_PATTERNS:
+            yield from self.zip_dir.glob(pattern)
+
+    def cleanup_stale_checkpoints(self, max_age_hours: int = 24):
+        """
+        清理长时间没有被继续的断点及其保留的部分下载
+
+        Args:
+            max_age_hours: 断点保留的最长时间（小时），默认 24 小时
+        """
+        if not self.checkpoint_dir.exists():
+            return
+
+        current_time = time.time()
+        age_seconds = max_age_hours * 3600
+
+        for file_path in self.checkpoint_dir.glob("*.json"):
+            try:
+                if current_time - file_path.stat().st_mtime <= age_seconds:
+                    continue
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    website_dir = json.load(f).get("website_dir")
+                if website_dir:
+                    self.clear_temp_folder(website_dir)
+                    self._remove_empty_workspace(Path(website_dir).parent)
+                file_path.unlink()
+                file_path.with_suffix(".visited").unlink(missing_ok=True)
+                self.logger.info(f"Deleted stale checkpoint: {file_path.name}")
+            except Exception as e:
+                self.logger.error(f"Failed to delete checkpoint {file_path.name}: {e}")
+
+    def cleanup_old_logs(self, max_age_hours: int = 24):
+        """清理过期的任务日志"""
+        if not self.log_dir.exists():
+            return
+
+        current_time = time.time()
+        for file_path in self.log_dir.glob("*.log"):
+            try:
+                if current_time - file_path.stat().st_mtime > max_age_hours * 3600:
+                    file_path.unlink()
+            except OSError as e:
+                self.logger.error(f"Failed to delete log {file_path.name}: {e}")
+
+    def create_job_workspace(self, job_id: str) -> Path:
+        """为任务创建独立的工作目录 temp_sites/<job_id>/ 并登记（同时持有任务的共享文件锁）"""
+        workspace = self.temp_dir / job_id
+        workspace.mkdir(parents=True, exist_ok=True)
+        with self._jobs_lock:
+            self._active_jobs[job_id] = workspace
+            if fcntl and job_id not in self._job_locks:
+                lock_file = open(self._job_lock_path(job_id), 'a')
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH)
+                self._job_locks[job_id] = lock_file
+        return workspace
+
+    def release_job(self, job_id: str, keep_files: bool = False):
+        """
+        任务结束：注销并删除其工作目录
+
+        Args:
+            keep_files: 为 True 时只注销不删除（例如保留了断点，供后续任务续传）
+        """
+        with self._jobs_lock:
+            workspace = self._active_jobs.pop(job_id, None)
+            lock_file = self._job_locks.pop(job_id, None)
+        if lock_file is not None:
+            lock_file.close()
+            self._remove_job_lock(job_id)
+        if workspace is None:
+            workspace = self.temp_dir / job_id
+        if not keep_files:
+            self.clear_temp_folder(workspace)
+
+    def active_jobs(self) -> Dict[str, Path]:
+        with self._jobs_lock:
+            return dict(self._active_jobs)
+
+    def is_job_active(self, job_id: str) -> bool:
+        """
+        任务是否仍在运行（包括其他进程中的任务：worker 进程、同一 storage 上的其他节点）
+        运行中的任务持有共享锁，能拿到排他锁说明已经没有进程在使用
+        """
+        with self._jobs_lock:
+            if job_id in self._active_jobs:
+                return True
+        if not fcntl:
+            return False
+        try:
+            with open(self._job_lock_path(job_id), 'r') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            return False
+        except FileNotFoundError:
+            return False
+        except OSError:
+            return True
+
+    def _job_lock_path(self, job_id: str) -> Path:
+        return self.temp_dir / f".{job_id}.lock"
+
+    def _remove_job_lock(self, job_id: str):
+        """没有其他进程持有时删除任务的锁文件"""
+        if not fcntl:
+            return
+        try:
+            with open(self._job_lock_path(job_id), 'r') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self._job_lock_path(job_id).unlink()
+        except OSError:
+            pass
+
+    def cleanup_orphan_workspaces(self, max_age_hours: int = 24):
+        """
+        清理没有被任何任务或断点引用的工作目录（例如进程崩溃后遗留的）
+        """
+        if not self.temp_dir.exists():
+            return
+
+        referenced = set()
+        for file_path in self.checkpoint_dir.glob("*.json"):
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    website_dir = json.load(f).get("website_dir")
+                if website_dir:
+                    referenced.add(Path(website_dir).resolve().parent)
+            except Exception:
+                continue
+        active = {p.resolve() for p in self.active_jobs().values()}
+        age_seconds = max_age_hours * 3600
+
+        for workspace in self.temp_dir.iterdir():
+            try:
+                if workspace.name.startswith('.') and workspace.name.endswith('.lock'):
+                    # 进程崩溃后遗留的任务锁
+                    self._remove_job_lock(workspace.name[1:-len('.lock')])
+                    continue
+                if not workspace.is_dir() or workspace.resolve() in referenced | active:
+                    continue
+                if time.time() - workspace.stat().st_mtime > age_seconds:
+                    self.clear_temp_folder(workspace)
+            except Exception as e:
+                self.logger.error(f"Failed to inspect workspace {workspace.name}: {e}")
+
+    def _remove_empty_workspace(self, workspace: Path):
+        try:
+            if workspace.resolve() != self.temp_dir.resolve() and workspace.is_dir() and not any(workspace.iterdir()):
+                workspace.rmdir()
+        except OSError:
+            pass
+
     def clear_temp_folder(self, folder_path: Union[str, Path]):
         """
         强制删除指定的临时文件夹（用于下载完成后清理源码，只保留 ZIP）
@@ -78,10 +265,91 @@ class FileManager:
         except Exception as e:
             self.logger.error(f"Failed to clear temp folder {path}: {e}")
 
+    def seed_from_mirror(self, domain: str, dest_path: Union[str, Path]) -> bool:
+        """
+        用上一次保留的镜像初始化临时目录，使下载器可以发送条件请求。
+        复制时保留 mtime（wget -N 依赖本地文件时间戳）。
+
+        Returns:
+            bool: 是否存在可用的镜像
+        """
+        source = self.mirror_dir / domain
+        dest = Path(dest_path)
+        if not source.is_dir():
+            return False
+        try:
+            if self.temp_dir.resolve() not in dest.resolve().parents:
+                self.logger.warning(f"Security Warning: Attempted to seed outside temp dir: {dest}")
+                return False
+            with self._mirror_guard():
+                shutil.copytree(source, dest, copy_function=shutil.copy2, dirs_exist_ok=True)
+            self.logger.info(f"Seeded {dest.name} from mirror")
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to seed from mirror {domain}: {e}")
+            return False
+
+    def mirror_stats(self, domain: str) -> Optional[Tuple[int, int]]:
+        """
+        统计该域名镜像的规模，用于估算下一次抓取的剩余时间
+
+        Returns:
+            Optional[Tuple[int, int]]: (文件数, 总字节数)，没有镜像时返回 None
+        """
+        source = self.mirror_dir / domain
+        if not source.is_dir():
+            return None
+        files = size = 0
+        for root, _, names in os.walk(source):
+            for name in names:
+                try:
+                    size += os.path.getsize(os.path.join(root, name))
+                    files += 1
+                except OSError:
+                    pass
+        return files, size
+
+    def retain_mirror(self, folder_path: Union[str, Path]):
+        """
+        打包完成后把临时目录保留为该域名的镜像（替代 clear_temp_folder）
+        """
+        path = Path(folder_path)
+        try:
+            if self.temp_dir.resolve() not in path.resolve().parents:
+                self.logger.warning(f"Security Warning: Attempted to retain outside temp dir: {path}")
+                return
+            target = self.mirror_dir / path.name
+            with self._mirror_guard():
+                if target.exists():
+                    shutil.rmtree(target)
+                shutil.move(str(path), str(target))
+            self.logger.info(f"Retained mirror: {path.name}")
+        except Exception as e:
+            self.logger.error(f"Failed to retain mirror {path}: {e}")
+            self.clear_temp_folder(path)
+
+    @contextmanager
+    def _mirror_guard(self):
+        """镜像目录的互斥锁：任务在 worker 进程中播种镜像，而保留镜像发生在 Web 进程"""
+        with self._mirror_lock:
+            self.mirror_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.mirror_dir / ".lock", 'a') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
     def get_paths(self):
         """返回路径配置，供其他模块使用"""
         return {
             "root": str(self.root),
             "temp": str(self.temp_dir),
-            "zip": str(self.zip_dir)
+            "zip": str(self.zip_dir),
+            "mirror": str(self.mirror_dir),
+            "manifest": str(self.manifest_dir),
+            "checkpoint": str(self.checkpoint_dir),
+            "log": str(self.log_dir)
         }
\ No newline at end of file
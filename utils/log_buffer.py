@@ -0,0 +1,61 @@
+from collections import deque
+from typing import Optional
+
+
+class LogBuffer:
+    """
+    有界日志缓冲
+    界面只显示最近 tail_lines 行，完整日志写入磁盘文件供下载。
+    超出上限时一次性丢弃一批旧行（而不是每行都丢），
+    使大多数更新只是在末尾追加，Gradio 只需向浏览器发送新增部分
+    """
+
+    def __init__(self, tail_lines: int = 500, spool_path: Optional[str] = None):
+        """
+        Args:
+            tail_lines: 界面保留的最少行数；缓冲达到 1.5 倍时裁剪回该行数
+            spool_path: 完整日志的写入路径，None 表示不落盘
+        """
+        self.tail_lines = max(1, tail_lines)
+        self.spool_path = spool_path
+        self.total_lines = 0
+        self._chunks = deque()  # (文本, 行数)
+        self._lines = 0
+        self._hidden = 0
+        self._body = ""
+        self._spool = open(spool_path, 'a', encoding='utf-8') if spool_path else None
+
+    def append(self, text: str):
+        if not text:
+            return
+        if self._spool:
+            self._spool.write(text)
+        count = text.count("\n")
+        self.total_lines += count
+        self._lines += count
+        self._chunks.append((text, count))
+        self._body += text
+        if self._lines > self.tail_lines + self.tail_lines // 2:
+            self._trim()
+
+    def _trim(self):
+        while self._chunks and self._lines - self._chunks[0][1] >= self.tail_lines:
+            _, count = self._chunks.popleft()
+            self._lines -= count
+            self._hidden += count
+        self._body = "".join(text for text, _ in self._chunks)
+
+    def text(self) -> str:
+        """界面显示的内容：被隐藏的行数提示 + 最近的日志"""
+        if self._hidden:
+            return f"… {self._hidden} earlier lines hidden (download the full log) …\n{self._body}"
+        return self._body
+
+    def flush(self):
+        if self._spool:
+            self._spool.flush()
+
+    def close(self):
+        if self._spool:
+            self._spool.close()
+            self._spool = None
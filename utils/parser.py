@@ -1,93 +1,113 @@
-import re
+import os
 from typing import Tuple, Optional
 
+from core.events import BudgetExhausted, CrawlError, CrawlEvent, FileReused, FileSaved, ResponseStatus, UrlPruned
+from utils.throughput import ThroughputMeter
+
 class LogParser:
     """
     日志解析器
-    负责解析 wget 的原始 stderr 输出，提取关键指标（文件计数、状态）
-    并生成适合人类阅读的日志格式。
+    负责把引擎事件渲染为适合人类阅读的日志格式（wget 的原始输出已由引擎内的 WgetEventParser 解析为事件），
+    并统计关键指标（文件计数、错误数、下载字节数、被剪除的陷阱 URL 数）。
     """
 
-    def __init__(self):
+    def __init__(self, meter: Optional[ThroughputMeter] = None):
+        """
+        Args:
+            meter: 吞吐统计，每个保存（或沿用本地副本）的文件都会登记到其中
+        """
         self.downloaded_count = 0
         self.error_count = 0
-        
-        # 预编译正则提高性能
-        # 匹配成功保存：... ‘filename’ saved [size/size]
-        self.saved_pattern = re.compile(r"‘.+’ saved \[\d+/\d+\]")
-        # 匹配 200 OK (另一种成功标志)
-        self.ok_pattern = re.compile(r"\s200 OK$")
-        # 匹配常见错误
-        self.error_pattern = re.compile(r"(ERROR \d+|failed:|Not Found)", re.IGNORECASE)
-
-    def process_line(self, line: str) -> Tuple[str, dict]:
+        self.downloaded_bytes = 0
+        self.pruned_count = 0
+        # 已显示过的陷阱子空间：每个子空间只显示第一条剪除，其余只计数
+        self._pruned_keys = set()
+        self.meter = meter
+
+        # 普通日志行按行首分派格式化（键为行首 4 个字符）
+        self._prefix_handlers = {
+            "Reso": ("Resolving ", self._format_resolving),
+            "Conn": ("Connecting to ", self._format_connecting),
+            "Savi": ("Saving to:", self._format_saving),
+        }
+
+    def _dispatch(self, line: str) -> Optional[str]:
+        handler = self._prefix_handlers.get(line[:4])
+        if handler is not None and line.startswith(handler[0]):
+            return handler[1](line)
+        return None
+
+    def _format_resolving(self, line: str) -> str:
+        return f"🔄 {line}"
+
+    def _format_connecting(self, line: str) -> str:
+        return f"🔗 {line}"
+
+    def _format_saving(self, line: str) -> str:
+        # 简化显示，去掉冗长的路径
+        return f"💾 Saving: {self._extract_filename(line)}..."
+
+    def process_event(self, event: CrawlEvent) -> Tuple[str, dict]:
         """
-        处理一行原始日志
-        
-        Args:
-            line: wget 输出的一行原始文本
-            
+        处理一个结构化事件：直接读取字段，不需要正则匹配
+
         Returns:
-            Tuple[str, dict]: 
-                - clean_log: 清理后适合展示的日志行（如果是无关紧要的空行则为空字符串）
-                - stats: 当前的统计数据字典 {'files': int, 'errors': int}
+            Tuple[str, dict]:
+                - clean_log: 适合展示的日志行（不需要显示的事件为空字符串）
+                - stats: 当前的统计数据字典 {'files': int, 'errors': int, 'bytes': int, 'pruned': int}
         """
-        line = line.strip()
-        if not line:
-            return "", self._get_stats()
-
-        # 1. 检测文件下载成功
-        # wget 输出通常包含 "saved [bytes/bytes]" 表示写入磁盘完成
-        if self.saved_pattern.search(line):
+        if isinstance(event, FileSaved):
             self.downloaded_count += 1
-            # 可以给这行日志加个高亮标记（在 Gradio Markdown 中显示）
-            clean_log = f"✅ FILE SAVED: {self._extract_filename(line)}"
-        
-        # 2. 检测错误
-        elif self.error_pattern.search(line):
+            self._record(event.size)
+            return f"✅ FILE SAVED: {os.path.basename(event.path)}\n", self._get_stats()
+
+        if isinstance(event, CrawlError):
             self.error_count += 1
-            clean_log = f"❌ ERROR: {line}"
-            
-        # 3. 过滤/格式化其他常见状态
-        elif line.startswith("Resolving "):
-            clean_log = f"🔄 {line}"
-        elif line.startswith("Connecting to "):
-            clean_log = f"🔗 {line}"
-        elif "200 OK" in line:
-            # 200 OK 有时出现在 saved 之前，作为进度提示
-            clean_log = f"⬇️  Response: 200 OK" 
-        elif line.startswith("Saving to:"):
-            # 简化显示，去掉冗长的路径
-            filename = self._extract_filename(line)
-            clean_log = f"💾 Saving: {filename}..."
-        else:
-            # 其他日志保持原样，或者选择忽略以减少刷屏
-            # 这里我们选择保留，但缩进一下区分
-            clean_log = f"   {line}"
+            suffix = f" ({event.url})" if event.url and not event.raw else ""
+            return f"❌ ERROR: {event.detail()}{suffix}\n", self._get_stats()
+
+        if isinstance(event, UrlPruned):
+            self.pruned_count += 1
+            if event.key in self._pruned_keys:
+                return "", self._get_stats()
+            self._pruned_keys.add(event.key)
+            return f"✂️ PRUNED: {event.reason} ({event.url})\n", self._get_stats()
+
+        if isinstance(event, BudgetExhausted):
+            return f"⏹️ BUDGET: {event.message}, packaging what was downloaded\n", self._get_stats()
+
+        if isinstance(event, FileReused) and self.meter is not None:
+            # 未变化的文件不产生流量，但计入 ETA 的进度
+            self.meter.record(0)
 
+        if isinstance(event, ResponseStatus) and event.status == 200:
+            return "⬇️  Response: 200 OK\n", self._get_stats()
+
+        line = event.line().strip()
+        if not line:
+            return "", self._get_stats()
+        clean_log = self._dispatch(line) or f"   {line}"
         return f"{clean_log}\n", self._get_stats()
 
+    def _record(self, size: int):
+        self.downloaded_bytes += size
+        if self.meter is not None:
+            self.meter.record(size)
+
     def _extract_filename(self, line: str) -> str:
         """从日志行中尝试提取文件名，仅用于展示"""
-        try:
-            # 尝试查找引号中的内容 ‘path/to/file’
-            start = line.find("‘")
-            end = line.find("’")
-            if start != -1 and end != -1:
-                full_path = line[start+1:end]
-                # 只返回文件名，不显示长路径
-                return full_path.split('/')[-1]
-            return "file"
-        except:
-            return "file"
+        # 查找引号中的内容 ‘path/to/file’
+        start = line.find("‘")
+        end = line.find("’", start + 1)
+        if start != -1 and end != -1:
+            # 只返回文件名，不显示长路径
+            return line[start+1:end].split('/')[-1]
+        return "file"
 
     def _get_stats(self) -> dict:
         return {
             "files": self.downloaded_count,
-            "errors": self.error_count
+            "errors": self.error_count,
+            "bytes": self.downloaded_bytes,
+            "pruned": self.pruned_count,
         }
-
-    def reset(self):
-        """重置统计数据"""
-        self.downloaded_count = 0
-        self.error_count = 0
\ No newline at end of file
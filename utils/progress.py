@@ -0,0 +1,41 @@
+import time
+
+
+class ProgressAggregator:
+    """
+    界面更新节流
+    日志与统计在调用方持续累积，最多每秒发送 max_rate 次更新；
+    状态文字变化（阶段切换）立即发送，最终结果由调用方直接发送，不经过节流
+    """
+
+    def __init__(self, max_rate: float = 4.0):
+        """
+        Args:
+            max_rate: 每秒最多发送的更新次数，<= 0 表示不限制
+        """
+        self.interval = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.pending = False
+        self._last_emit = 0.0
+        self._last_status = None
+
+    def offer(self, status: str) -> bool:
+        """记录一次进度变化，返回是否应该立即发送"""
+        now = time.monotonic()
+        if status != self._last_status or now - self._last_emit >= self.interval:
+            self._mark(now, status)
+            return True
+        self.pending = True
+        return False
+
+    def due(self) -> bool:
+        """没有新进度时调用：有积压且距上次发送已超过间隔时返回 True"""
+        now = time.monotonic()
+        if self.pending and now - self._last_emit >= self.interval:
+            self._mark(now, self._last_status)
+            return True
+        return False
+
+    def _mark(self, now: float, status: str):
+        self._last_emit = now
+        self._last_status = status
+        self.pending = False
@@ -0,0 +1,135 @@
+import re
+import time
+import urllib.request
+from collections import deque
+from typing import Optional
+from urllib.parse import urlparse
+
+# sitemap 中的 <loc> 条目
+SITEMAP_LOC_PATTERN = re.compile(rb"<loc>\s*([^<\s]+)\s*</loc>", re.IGNORECASE)
+
+
+class ThroughputMeter:
+    """
+    吞吐统计
+    累计下载字节，最近 window_seconds 秒内的字节/秒与文件/秒，
+    并根据预期规模（上一次抓取的清单 / 镜像，或 sitemap）估算剩余时间
+    """
+
+    def __init__(self, window_seconds: float = 10.0, expected_bytes: Optional[int] = None,
+                 expected_files: Optional[int] = None):
+        """
+        Args:
+            window_seconds: 计算速率的滑动窗口（秒）
+            expected_bytes: 预期的站点总大小（字节），未知为 None
+            expected_files: 预期的文件数量，未知为 None；已知时优先按文件数估算
+        """
+        self.window = window_seconds
+        self.expected_bytes = expected_bytes
+        self.expected_files = expected_files
+        self.total_bytes = 0
+        # 已完成的文件数，包括未变化而沿用本地副本的文件
+        self.files = 0
+        self.started = time.monotonic()
+        self._last = self.started
+        self._samples = deque()  # (时间, 字节, 文件数)
+        self._window_bytes = 0
+        self._window_files = 0
+
+    def record(self, size: int = 0, files: int = 1, now: Optional[float] = None):
+        """登记一个完成的文件；size 为实际传输的字节数（未变化的文件为 0）"""
+        now = now if now is not None else time.monotonic()
+        self.total_bytes += size
+        self.files += files
+        self._last = now
+        self._samples.append((now, size, files))
+        self._window_bytes += size
+        self._window_files += files
+        self._expire(now)
+
+    def _expire(self, now: float):
+        while self._samples and now - self._samples[0][0] > self.window:
+            _, size, files = self._samples.popleft()
+            self._window_bytes -= size
+            self._window_files -= files
+
+    def snapshot(self, now: Optional[float] = None) -> dict:
+        """当前统计：bytes / bytes_per_sec / files_per_sec / eta（秒，未知为 None）/ idle（秒）"""
+        now = now if now is not None else time.monotonic()
+        self._expire(now)
+        span = max(min(self.window, now - self.started), 1e-6)
+        bytes_per_sec = self._window_bytes / span
+        files_per_sec = self._window_files / span
+
+        # 超出预期规模后估算失效，不再显示 ETA
+        eta = None
+        if self.expected_files and files_per_sec > 0:
+            if self.files < self.expected_files:
+                eta = (self.expected_files - self.files) / files_per_sec
+        elif self.expected_bytes and bytes_per_sec > 0:
+            if self.total_bytes < self.expected_bytes:
+                eta = (self.expected_bytes - self.total_bytes) / bytes_per_sec
+
+        return {
+            "bytes": self.total_bytes,
+            "bytes_per_sec": bytes_per_sec,
+            "files_per_sec": files_per_sec,
+            "eta": eta,
+            "idle": now - self._last,
+        }
+
+
+def format_size(num_bytes: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if num_bytes < 1024:
+            return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60}s"
+    return f"{seconds}s"
+
+
+def format_throughput(metrics: Optional[dict], stall_seconds: float = 30.0) -> str:
+    """仪表盘上显示的吞吐信息"""
+    if not metrics:
+        return "-"
+    text = (f"{format_size(metrics['bytes'])} · {format_size(metrics['bytes_per_sec'])}/s · "
+            f"{metrics['files_per_sec']:.1f} files/s")
+    if metrics["idle"] >= stall_seconds:
+        return f"{text} · ⚠️ stalled ({format_duration(metrics['idle'])} without data)"
+    if metrics["eta"] is not None:
+        return f"{text} · ETA {format_duration(metrics['eta'])}"
+    return text
+
+
+def count_sitemap_urls(url: str, timeout: float = 5.0, max_sitemaps: int = 10) -> Optional[int]:
+    """
+    读取站点根目录的 sitemap.xml 统计 URL 数量（sitemap 索引最多展开 max_sitemaps 个子文件）
+    获取失败时返回 None
+    """
+    parsed = urlparse(url)
+    pending = [f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"]
+    fetched = 0
+    total = 0
+    while pending and fetched < max_sitemaps:
+        try:
+            with urllib.request.urlopen(pending.pop(0), timeout=timeout) as resp:
+                body = resp.read()
+        except Exception:
+            if fetched == 0:
+                return None
+            continue
+        fetched += 1
+        locs = SITEMAP_LOC_PATTERN.findall(body)
+        if b"<sitemapindex" in body:
+            pending.extend(loc.decode('utf-8', errors='replace') for loc in locs)
+        else:
+            total += len(locs)
+    return total or None
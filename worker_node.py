@@ -0,0 +1,34 @@
+import logging
+import os
+from functools import partial
+from core.fleet import FleetWorker, SQLiteJobQueue
+from core.scheduler import check_resources
+from core.settings import MAX_JOBS, MIN_FREE_DISK_MB, MIN_FREE_MEMORY_MB, QUEUE_DB, job_settings
+from utils.file_manager import FileManager
+
+# --- 配置部分 ---
+# 分布式模式下的 worker 节点：与 UI 节点共享 storage 目录（如 NFS 挂载）与其中的任务队列数据库
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("WorkerNode")
+
+# 心跳超过该时间未更新的任务视为 worker 已失联，重新排队
+HEARTBEAT_TIMEOUT = int(os.environ.get("WD_HEARTBEAT_TIMEOUT", 60))
+# 与 UI 节点共用的配置（队列数据库、并发与准入、压缩、请求节奏、爬虫陷阱、抓取前沿、预算上限）见 core/settings.py，
+# 本节点按自己的环境变量生效
+
+
+if __name__ == "__main__":
+    fm = FileManager()
+    fm.initialize()
+    fm.cleanup_stale_checkpoints(max_age_hours=24)
+    fm.cleanup_old_logs(max_age_hours=24)
+
+    worker = FleetWorker(
+        SQLiteJobQueue(QUEUE_DB),
+        settings=job_settings(),
+        workers=MAX_JOBS,
+        heartbeat_interval=max(1, HEARTBEAT_TIMEOUT // 6),
+        stale_timeout=HEARTBEAT_TIMEOUT,
+        resource_check=partial(check_resources, fm.get_paths()['root'], MIN_FREE_DISK_MB, MIN_FREE_MEMORY_MB),
+    )
+    worker.run_forever()